@@ -0,0 +1,518 @@
+# backend/app/analysis_store.py
+
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from app.compact_graph import CompactGraph
+from app.response_format import MAX_PAGE_SIZE
+
+# One SQLite file per analysis ID (the result-cache key), for the drill-down queries
+ANALYSIS_STORE_DIR = os.getenv("ANALYSIS_STORE_DIR", os.path.join(tempfile.gettempdir(), "fintrace-analyses"))
+STORE_VERSION = 2 # Bump when the schema changes
+
+# Ego-network bounds: hops out from the account, and edges returned
+MAX_EGO_DEPTH = 3
+MAX_EGO_EDGES = int(os.getenv("MAX_EGO_EDGES", 10_000))
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE accounts (
+    code INTEGER PRIMARY KEY,       -- compact-graph code (sorted account ID order)
+    account_id TEXT NOT NULL,
+    community INTEGER,
+    is_hub INTEGER NOT NULL,
+    suspicious INTEGER NOT NULL,
+    score REAL NOT NULL,            -- as reported by /analyze: 0-100, rounded
+    confidence REAL NOT NULL,
+    graph_risk REAL NOT NULL,
+    anomaly_score REAL NOT NULL,
+    pattern_risk REAL NOT NULL,
+    velocity_risk REAL NOT NULL,
+    patterns TEXT,                  -- JSON list of ring pattern types, NULL outside rings
+    explanation TEXT
+);
+CREATE TABLE rings (
+    ring_id TEXT PRIMARY KEY,
+    pattern_type TEXT NOT NULL,
+    kind TEXT NOT NULL,             -- "case" (consolidated) or "ring" (one detector ring)
+    ring TEXT NOT NULL
+);
+CREATE TABLE ring_members (ring_id TEXT NOT NULL, code INTEGER NOT NULL, position INTEGER NOT NULL);
+CREATE TABLE edges (
+    edge INTEGER PRIMARY KEY,       -- position in the /analyze graph edges
+    source INTEGER NOT NULL,
+    target INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    txn_count INTEGER NOT NULL
+);
+CREATE TABLE transactions (
+    transaction_id TEXT NOT NULL,
+    sender INTEGER NOT NULL,
+    receiver INTEGER NOT NULL,
+    amount REAL NOT NULL,
+    timestamp INTEGER NOT NULL      -- ns since the epoch
+);
+"""
+
+# Built after the bulk insert: one sorted build per index is far cheaper than row-by-row upkeep
+INDEXES = """
+CREATE UNIQUE INDEX accounts_by_id ON accounts (account_id);
+CREATE INDEX accounts_by_community ON accounts (community);
+CREATE INDEX ring_members_by_ring ON ring_members (ring_id, position);
+CREATE INDEX ring_members_by_account ON ring_members (code);
+CREATE INDEX edges_by_source ON edges (source, target);
+CREATE INDEX edges_by_target ON edges (target, source);
+CREATE INDEX transactions_by_sender ON transactions (sender, timestamp);
+CREATE INDEX transactions_by_receiver ON transactions (receiver, timestamp);
+"""
+
+
+class StoreQueryError(ValueError):
+    """Invalid drill-down query parameters."""
+
+
+def _store_path(key: str, directory: str = None) -> str:
+    return os.path.join(directory or ANALYSIS_STORE_DIR, f"{key}.sqlite")
+
+
+def _account_codes(CG: CompactGraph, values: pd.Series) -> np.ndarray:
+    # Categorical ID columns need one lookup per category, not per row
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return CG.codes(values.cat.categories)[values.cat.codes.to_numpy()]
+    return CG.codes(values)
+
+
+def _timestamp(ns: int) -> str:
+    return pd.Timestamp(ns).isoformat(sep=" ")
+
+
+def _code_list(codes: Iterable[int]) -> str:
+    # Bound as one JSON array and read with json_each: no per-list SQL, no bound-parameter limit
+    return json.dumps(sorted(codes))
+
+
+# -------------------------
+# WRITING
+# -------------------------
+def save_analysis(
+    key: str,
+    df: pd.DataFrame,
+    CG: CompactGraph,
+    graph_intel: Dict,
+    rings: List[Dict],
+    risk_results: Dict,
+    pattern_map: Dict[str, List[str]],
+    report: Dict,
+    directory: str = None,
+    pattern_rings: List[Dict] = None
+):
+    """
+    Writes one finished analysis to its SQLite file: accounts (risk
+    breakdown, community, patterns, explanation), the reported rings /
+    cases and the detector rings behind them (pattern_rings) with their
+    members, the aggregated graph edges and every transaction, each
+    indexed for the drill-down queries. Replaces any earlier copy.
+    """
+    directory = directory or ANALYSIS_STORE_DIR
+    os.makedirs(directory, exist_ok=True)
+
+    # Built aside, then moved in place, so readers never see a partial store
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    try:
+        db = sqlite3.connect(tmp_path)
+        try:
+            # A crash loses only the temporary file, so no journal or fsync while building
+            db.executescript("PRAGMA journal_mode = OFF; PRAGMA synchronous = OFF;" + SCHEMA)
+            _insert_all(db, df, CG, graph_intel, rings, pattern_rings or [], risk_results, pattern_map, report)
+            db.executescript(INDEXES)
+            db.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ("version", str(STORE_VERSION)),
+                ("analysis_id", key),
+                ("created_at", str(time.time()))
+            ])
+            db.commit()
+        finally:
+            db.close()
+        os.replace(tmp_path, _store_path(key, directory))
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _insert_all(db, df, CG, graph_intel, rings, pattern_rings, risk_results, pattern_map, report):
+    # 1. Accounts, with what the report said about them
+    explanations = {item["account_id"]: item["text"] for item in report["explanations"]}
+    suspicious = {item["account_id"] for item in report["suspicious_accounts"]}
+    hubs = set(graph_intel["hubs"])
+    communities = graph_intel["communities"]
+    accounts = list(risk_results)
+    codes = CG.codes(accounts).tolist()
+    db.executemany("INSERT INTO accounts VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+        (
+            code, acc, communities.get(acc), acc in hubs, acc in suspicious,
+            data["score"], data["confidence"],
+            data["breakdown"]["graph_risk"], data["breakdown"]["anomaly_score"],
+            data["breakdown"]["pattern_risk"], data["breakdown"]["velocity_risk"],
+            json.dumps(pattern_map[acc]) if acc in pattern_map else None,
+            explanations.get(acc)
+        )
+        for code, acc, data in zip(codes, accounts, risk_results.values())
+    ))
+
+    # 2. Rings and their members: the report's cases, then the detector rings with the case they are in
+    # (with RING_CONSOLIDATION=off the report already lists the detector rings)
+    code_of = dict(zip(accounts, codes))
+    reported = {ring["ring_id"] for ring in rings}
+    case_of = {source["ring_id"]: ring["ring_id"] for ring in rings for source in ring.get("rings", ())}
+    stored = [("case" if "rings" in ring else "ring", ring) for ring in rings] + [
+        ("ring", {**ring, "case_id": case_of.get(ring["ring_id"])})
+        for ring in pattern_rings if ring["ring_id"] not in reported
+    ]
+    db.executemany("INSERT INTO rings VALUES (?, ?, ?, ?)", (
+        (ring["ring_id"], ring["pattern_type"], kind, json.dumps(ring)) for kind, ring in stored
+    ))
+    db.executemany("INSERT INTO ring_members VALUES (?, ?, ?)", (
+        (ring["ring_id"], code_of[acc], position)
+        for _, ring in stored for position, acc in enumerate(ring["member_accounts"])
+    ))
+
+    # 3. Aggregated edges, numbered in the /analyze edge order
+    edges = CG.edge_order()
+    db.executemany("INSERT INTO edges VALUES (?, ?, ?, ?, ?)", zip(
+        range(len(edges)),
+        CG.edge_sources()[edges].tolist(),
+        CG.out_dst[edges].tolist(),
+        CG.amount[edges].tolist(),
+        CG.count[edges].tolist()
+    ))
+
+    # 4. Transactions
+    db.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?)", zip(
+        df["transaction_id"].astype(str).tolist(),
+        _account_codes(CG, df["sender_id"]).tolist(),
+        _account_codes(CG, df["receiver_id"]).tolist(),
+        df["amount"].to_numpy(dtype=float).tolist(),
+        df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64).tolist()
+    ))
+
+
+# -------------------------
+# QUERIES
+# -------------------------
+class AnalysisStore:
+    """Read-only handle on one stored analysis; close it (or use it as a context manager) when done."""
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self.meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        self.analysis_id = self.meta["analysis_id"]
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self) -> "AnalysisStore":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _code(self, account_id: str) -> Optional[int]:
+        row = self._db.execute("SELECT code FROM accounts WHERE account_id = ?", (account_id,)).fetchone()
+        return None if row is None else row[0]
+
+    def account(self, account_id: str, offset: int = 0, limit: int = 100) -> Optional[Dict]:
+        """
+        One account's risk breakdown, explanation, community and rings, plus
+        a page of its transactions (sent and received, oldest first). None
+        if the analysis has no such account.
+        """
+        row = self._db.execute(
+            "SELECT code, community, is_hub, suspicious, score, confidence, graph_risk, anomaly_score, "
+            "pattern_risk, velocity_risk, patterns, explanation FROM accounts WHERE account_id = ?",
+            (account_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        code, community, is_hub, suspicious, score, confidence, g_risk, a_risk, p_risk, v_risk, patterns, text = row
+        patterns = json.loads(patterns) if patterns is not None else []
+
+        rings = self._db.execute(
+            "SELECT DISTINCT r.ring_id, r.pattern_type, r.kind FROM ring_members m JOIN rings r ON r.ring_id = m.ring_id "
+            "WHERE m.code = ? ORDER BY r.rowid",
+            (code,)
+        ).fetchall()
+
+        return {
+            "analysis_id": self.analysis_id,
+            "account_id": account_id,
+            "community": community,
+            "is_hub": bool(is_hub),
+            "suspicious": bool(suspicious),
+            "risk": {
+                "score": score,
+                "confidence": confidence,
+                "breakdown": {
+                    "graph_risk": g_risk,
+                    "anomaly_score": a_risk,
+                    "pattern_risk": p_risk,
+                    "velocity_risk": v_risk
+                }
+            },
+            # Same fallback as suspicious_accounts in the report
+            "detected_patterns": patterns or (["anomaly"] if suspicious else []),
+            "explanation": text,
+            "rings": [
+                {"ring_id": ring_id, "pattern_type": pattern_type, "kind": kind} for ring_id, pattern_type, kind in rings
+            ],
+            "transactions": self._transactions(code, offset, limit)
+        }
+
+    def _transactions(self, code: int, offset: int, limit: int) -> Dict:
+        limit = min(limit, MAX_PAGE_SIZE)
+        (total,) = self._db.execute(
+            "SELECT (SELECT count(*) FROM transactions WHERE sender = ?1) "
+            "+ (SELECT count(*) FROM transactions WHERE receiver = ?1 AND sender != ?1)",
+            (code,)
+        ).fetchone()
+
+        # Both arms come off an (account, timestamp) index in order, so SQLite merges them instead of sorting
+        rows = self._db.execute(
+            "SELECT transaction_id, sender, receiver, amount, timestamp, rowid FROM transactions WHERE sender = ?1 "
+            "UNION ALL "
+            "SELECT transaction_id, sender, receiver, amount, timestamp, rowid FROM transactions "
+            "WHERE receiver = ?1 AND sender != ?1 "
+            "ORDER BY 5, 6 LIMIT ?2 OFFSET ?3",
+            (code, limit, offset)
+        ).fetchall()
+        names = self._account_ids({code for row in rows for code in row[1:3]})
+
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if offset + limit < total else None,
+            "items": [
+                {
+                    "transaction_id": transaction_id,
+                    "sender_id": names[sender],
+                    "receiver_id": names[receiver],
+                    "amount": amount,
+                    "timestamp": _timestamp(timestamp),
+                    "direction": "out" if sender == code else "in"
+                }
+                for transaction_id, sender, receiver, amount, timestamp, _ in rows
+            ]
+        }
+
+    def _account_ids(self, codes) -> Dict[int, str]:
+        return dict(self._account_rows(codes, "account_id"))
+
+    def _account_rows(self, codes, columns: str) -> List:
+        return self._db.execute(
+            f"SELECT code, {columns} FROM accounts WHERE code IN (SELECT value FROM json_each(?))", (_code_list(codes),)
+        ).fetchall()
+
+    # -------------------------
+    # EGO NETWORK
+    # -------------------------
+    def _touching(self, codes: List[int]) -> Iterator:
+        # Rows are stepped lazily, so stopping at the edge cap stops the index scans too
+        return self._db.execute(
+            "SELECT edge, source, target, amount FROM edges WHERE source IN (SELECT value FROM json_each(?1)) "
+            "UNION ALL SELECT edge, source, target, amount FROM edges WHERE target IN (SELECT value FROM json_each(?1))",
+            (_code_list(codes),)
+        )
+
+    def _between(self, codes: List[int]) -> Iterator:
+        # Scans each account's out-edges on the (source, target) index and filters the target there;
+        # the unary + keeps SQLite from probing every (target, source) pair instead
+        return self._db.execute(
+            "SELECT edge, source, target, amount FROM edges WHERE source IN (SELECT value FROM json_each(?1)) "
+            "AND +target IN (SELECT value FROM json_each(?1))",
+            (_code_list(codes),)
+        )
+
+    def ego_network(self, account_id: str, depth: int = 1, edge_limit: int = 1000) -> Optional[Dict]:
+        """
+        The subgraph induced by the accounts within depth hops of account_id
+        (either direction), breadth first. At most edge_limit edges
+        (capped at MAX_EGO_EDGES) are returned; truncated says whether the
+        search stopped at the cap. None if the analysis has no such account.
+        """
+        if not 0 <= depth <= MAX_EGO_DEPTH:
+            raise StoreQueryError(f"depth must be between 0 and {MAX_EGO_DEPTH}")
+        if edge_limit < 1:
+            raise StoreQueryError("edge_limit must be positive")
+        edge_limit = min(edge_limit, MAX_EGO_EDGES)
+
+        start = self._code(account_id)
+        if start is None:
+            return None
+
+        hop = {start: 0}
+        edges = {}
+        truncated = False
+
+        def add(found) -> bool:
+            """Adds the new edges among found; False once the cap is hit."""
+            nonlocal truncated
+            try:
+                for edge, source, target, amount in found:
+                    if edge in edges:
+                        continue
+                    if len(edges) == edge_limit:
+                        truncated = True
+                        return False
+                    edges[edge] = (source, target, amount)
+                    # One end is already placed; a new other end is one hop further out
+                    if source not in hop:
+                        hop[source] = hop[target] + 1
+                    elif target not in hop:
+                        hop[target] = hop[source] + 1
+                return True
+            finally:
+                # Ends the scan here, in the connection's thread
+                found.close()
+
+        # 1. Breadth-first: each level adds every edge touching the previous one
+        frontier = [start]
+        for level in range(1, depth + 1):
+            if not add(self._touching(frontier)):
+                break
+            frontier = [node for node, at in hop.items() if at == level]
+            if not frontier:
+                break
+
+        # 2. Edges between two accounts of the outermost level complete the induced subgraph
+        if not truncated and depth > 0 and frontier and hop[frontier[0]] == depth:
+            add(self._between(frontier))
+
+        accounts = {
+            code: (acc, community, score)
+            for code, acc, community, score in self._account_rows(hop, "account_id, community, score")
+        }
+        nodes = sorted(hop, key=lambda node: (hop[node], node))
+        return {
+            "analysis_id": self.analysis_id,
+            "account_id": account_id,
+            "depth": depth,
+            "edge_limit": edge_limit,
+            "truncated": truncated,
+            "nodes": [
+                {"id": accounts[node][0], "community": accounts[node][1], "score": accounts[node][2], "hop": hop[node]}
+                for node in nodes
+            ],
+            "edges": [
+                {"source": accounts[source][0], "target": accounts[target][0], "amount": amount}
+                for _, (source, target, amount) in sorted(edges.items())
+            ]
+        }
+
+    # -------------------------
+    # RINGS / COMMUNITIES
+    # -------------------------
+    def ring(self, ring_id: str) -> Optional[Dict]:
+        """
+        A reported ring / case, or a detector ring with the case_id it was
+        merged into, with its members' scores. None if there is no such ring.
+        """
+        row = self._db.execute("SELECT ring FROM rings WHERE ring_id = ?", (ring_id,)).fetchone()
+        if row is None:
+            return None
+        members = self._db.execute(
+            "SELECT a.account_id, a.community, a.score, a.suspicious FROM ring_members m "
+            "JOIN accounts a ON a.code = m.code WHERE m.ring_id = ? ORDER BY m.position",
+            (ring_id,)
+        ).fetchall()
+        return {
+            "analysis_id": self.analysis_id,
+            "ring": json.loads(row[0]),
+            "members": [
+                {"account_id": acc, "community": community, "score": score, "suspicious": bool(suspicious)}
+                for acc, community, score, suspicious in members
+            ]
+        }
+
+    def community(self, community_id: int, offset: int = 0, limit: int = 1000) -> Optional[Dict]:
+        """A page of one community's accounts (account ID order). None if there is no such community."""
+        limit = min(limit, MAX_PAGE_SIZE)
+        (total,) = self._db.execute("SELECT count(*) FROM accounts WHERE community = ?", (community_id,)).fetchone()
+        if total == 0:
+            return None
+        members = self._db.execute(
+            "SELECT account_id, score, suspicious FROM accounts WHERE community = ? ORDER BY code LIMIT ? OFFSET ?",
+            (community_id, limit, offset)
+        ).fetchall()
+        return {
+            "analysis_id": self.analysis_id,
+            "community_id": community_id,
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": offset + limit if offset + limit < total else None,
+            "members": [
+                {"account_id": acc, "score": score, "suspicious": bool(suspicious)}
+                for acc, score, suspicious in members
+            ]
+        }
+
+
+def open_analysis(key: str, directory: str = None) -> Optional[AnalysisStore]:
+    """The stored analysis, or None if missing or written with another schema version."""
+    path = _store_path(key, directory)
+    if not os.path.isfile(path):
+        return None
+    try:
+        store = AnalysisStore(path)
+    except (sqlite3.Error, KeyError):
+        return None
+    if store.meta.get("version") != str(STORE_VERSION):
+        store.close()
+        return None
+    return store
+
+
+# -------------------------
+# HOUSEKEEPING
+# -------------------------
+def store_bytes(key: str, directory: str = None) -> int:
+    try:
+        return os.path.getsize(_store_path(key, directory))
+    except OSError:
+        return 0
+
+
+def remove_analyses(key: Optional[str] = None, older_than: float = None, directory: str = None) -> int:
+    """
+    Removes one stored analysis, or (key None) every one, optionally only
+    those written more than older_than seconds ago. Returns the analyses removed.
+    """
+    directory = directory or ANALYSIS_STORE_DIR
+    if not os.path.isdir(directory):
+        return 0
+    if key is not None:
+        paths = [_store_path(key, directory)]
+    else:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".sqlite")]
+    now = time.time()
+    removed = 0
+    for path in paths:
+        try:
+            if older_than is not None and now - os.path.getmtime(path) <= older_than:
+                continue
+            os.remove(path)
+            removed += 1
+        except OSError:
+            continue
+    return removed
@@ -1,57 +1,216 @@
+import os
+import tempfile
+
+import joblib
 import pandas as pd
 import numpy as np
+import sklearn
 from sklearn.ensemble import IsolationForest
 from sklearn.preprocessing import StandardScaler
 
-def detect_anomalies(df: pd.DataFrame, G) -> pd.DataFrame:
+from app.compact_graph import node_degrees
+from app.context import AnalysisContext
+from app.utils import APP_STATE_DIR, private_dir
+
+FEATURE_COLUMNS = ["out_count", "out_avg", "out_std", "out_sum", "in_count", "in_avg", "in_std", "in_sum"]
+MODEL_COLUMNS = FEATURE_COLUMNS + ["in_out_ratio", "degree"]
+
+# "fit": fit a fresh model per request | "persistent": score against the saved model
+ANOMALY_MODE = os.getenv("ANOMALY_MODE", "fit")
+ANOMALY_MODEL_PATH = os.getenv("ANOMALY_MODEL_PATH", os.path.join(APP_STATE_DIR, "anomaly-model.joblib"))
+MODEL_VERSION = 1             # Bump when the features or the model change
+
+CONTAMINATION = 0.08          # Estimated share of outliers
+RANDOM_STATE = 42
+FIT_SAMPLE_SIZE = 100_000     # Accounts the scaler / forest are fitted on (random sample above this)
+SCORE_CHUNK_ROWS = 50_000     # Accounts scored per decision_function call
+# Tree-building threads per fit. The fit overlaps the other detector stages of its analysis,
+# so by default it takes half the cores rather than all of them
+ANOMALY_N_JOBS = int(os.getenv("ANOMALY_N_JOBS", max((os.cpu_count() or 1) // 2, 1)))
+
+_loaded_model = None
+
+
+def account_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Per-account send / receive statistics (FEATURE_COLUMNS) from one grouped
+    pass over both sides of every transaction.
+    """
+    n = len(df)
+    codes, accounts = pd.factorize(
+        np.concatenate([df["sender_id"].to_numpy(dtype=object), df["receiver_id"].to_numpy(dtype=object)]),
+        sort=True
+    )
+    # Group key = account * 2 + side (0 = sent, 1 = received)
+    keys = codes.astype(np.int64) * 2 + np.repeat([0, 1], n)
+    stats = pd.Series(np.tile(df["amount"].to_numpy(dtype=float), 2)).groupby(keys).agg(["count", "mean", "std", "sum"])
+
+    # (account, side) rows reshape straight into the out_* / in_* column layout
+    table = np.zeros((len(accounts) * 2, 4))
+    table[stats.index.to_numpy()] = stats.fillna(0).to_numpy()
+    return pd.DataFrame(table.reshape(len(accounts), 8), index=pd.Index(accounts), columns=FEATURE_COLUMNS)
+
+
+def detect_anomalies(df: pd.DataFrame = None, G=None, mode: str = None, context: AnalysisContext = None) -> pd.DataFrame:
     """
     Uses Isolation Forest to detect statistical outliers in transaction behavior.
     Features: Frequency, Avg Amount, In/Out Ratio, Connectivity.
+    A context supplies the graph and the (shared) account features instead of df / G.
     """
+    context = (context or AnalysisContext()).setdefault(df=df, graph=G)
+
     # 1. Feature Engineering per Account
-    send_stats = df.groupby("sender_id").agg({
-        "amount": ["count", "mean", "std", "sum"],
-    })
-    send_stats.columns = ["out_count", "out_avg", "out_std", "out_sum"]
-    
-    recv_stats = df.groupby("receiver_id").agg({
-        "amount": ["count", "mean", "std", "sum"],
-    })
-    recv_stats.columns = ["in_count", "in_avg", "in_std", "in_sum"]
-    
-    # Merge stats
-    accounts = list(set(df["sender_id"]) | set(df["receiver_id"]))
-    features = pd.DataFrame(index=accounts)
-    features = features.join(send_stats).join(recv_stats).fillna(0)
-    
+    return score_accounts(context.account_features, context.graph, mode=mode)
+
+
+def _model_inputs(features: pd.DataFrame, G) -> pd.DataFrame:
+    features = features[FEATURE_COLUMNS].copy()
+
     # Add engineered features
     features["in_out_ratio"] = (features["in_sum"] + 1) / (features["out_sum"] + 1)
-    
+
     # Add graph features (degree)
-    features["degree"] = [G.degree(acc) if acc in G else 0 for acc in features.index]
-    
-    # 2. Preprocessing
+    features["degree"] = node_degrees(G, features.index)
+
     # Handle NaN and Infinity
-    features = features.replace([np.inf, -np.inf], np.nan).fillna(0)
-    
-    scaler = StandardScaler()
-    scaled_features = scaler.fit_transform(features)
-    
-    # 3. Isolation Forest
-    # contamination is estimated % of outliers
-    iso = IsolationForest(contamination=0.08, random_state=42)
-    predictions = iso.fit_predict(scaled_features)
-    # Convert predictions: -1 is outlier, 1 is normal -> convert to score 0-1
+    return features.replace([np.inf, -np.inf], np.nan).fillna(0)
+
+
+def _decision_scores(model: dict, X: np.ndarray, chunk_rows: int = SCORE_CHUNK_ROWS) -> np.ndarray:
+    # Chunked so large account sets never materialize a full scaled copy.
     # decision_function gives score (lower is more anomalous)
-    anomaly_scores = iso.decision_function(scaled_features)
-    
+    scores = np.empty(len(X))
+    for start in range(0, len(X), chunk_rows):
+        chunk = model["scaler"].transform(X[start:start + chunk_rows])
+        scores[start:start + chunk_rows] = model["forest"].decision_function(chunk)
+    return scores
+
+
+def _version_tag() -> str:
+    return f"v{MODEL_VERSION}-sklearn{sklearn.__version__}-{','.join(MODEL_COLUMNS)}"
+
+
+def fit_model(X: np.ndarray, sample_size: int = FIT_SAMPLE_SIZE, reference: bool = False) -> dict:
+    """
+    Fits the scaler and forest on at most sample_size rows, building the
+    trees in parallel. With reference=True the training sample's score range
+    is kept so later batches can be normalized against it.
+    """
+    if len(X) > sample_size:
+        rows = np.random.default_rng(RANDOM_STATE).choice(len(X), sample_size, replace=False)
+        X = X[np.sort(rows)]
+
+    scaler = StandardScaler().fit(X)
+    forest = IsolationForest(contamination=CONTAMINATION, random_state=RANDOM_STATE, n_jobs=ANOMALY_N_JOBS)
+    forest.fit(scaler.transform(X))
+
+    model = {
+        "version": _version_tag(),
+        "scaler": scaler,
+        "forest": forest,
+        "n_samples": len(X)
+    }
+    if reference:
+        scores = _decision_scores(model, X)
+        model["score_min"], model["score_max"] = float(scores.min()), float(scores.max())
+    return model
+
+
+def save_model(model: dict, path: str = None):
+    path = path or ANOMALY_MODEL_PATH
+    directory = private_dir(os.path.dirname(path) or ".")
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    os.close(fd)
+    joblib.dump(model, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_model(path: str = None):
+    """The saved model, or None if it is missing or carries another version tag."""
+    global _loaded_model
+    path = path or ANOMALY_MODEL_PATH
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+
+    # Reuse the copy already loaded in this process while the file is unchanged
+    if _loaded_model is not None and _loaded_model[:2] == (path, mtime):
+        return _loaded_model[2]
+
+    # Unpickling runs code: only from a directory no other user can write to
+    private_dir(os.path.dirname(path) or ".")
+    model = joblib.load(path)
+    if model.get("version") != _version_tag():
+        return None
+    _loaded_model = (path, mtime, model)
+    return model
+
+
+def _normalize(scores: np.ndarray, min_score: float, max_score: float) -> np.ndarray:
     # Normalize anomaly score to 0-1 range (1 = most anomalous)
-    min_score = anomaly_scores.min()
-    max_score = anomaly_scores.max()
-    normalized_scores = (anomaly_scores - max_score) / (min_score - max_score) if max_score != min_score else np.zeros_like(anomaly_scores)
-    
+    if max_score == min_score:
+        return np.zeros_like(scores)
+    return np.clip((scores - max_score) / (min_score - max_score), 0, 1)
+
+
+def _saved_model(X: np.ndarray) -> dict:
+    model = load_model()
+    if model is None:
+        model = fit_model(X, reference=True)
+        save_model(model)
+    return model
+
+
+def reference_model(features: pd.DataFrame, G, mode: str = None) -> dict:
+    """
+    A model that later batches can be scored against without refitting:
+    the saved one in "persistent" mode (fitted on these accounts and saved
+    on first use), otherwise one fitted on these accounts with its training
+    score range kept.
+    """
+    X = _model_inputs(features, G)[MODEL_COLUMNS].to_numpy(dtype=float)
+    mode = mode or ANOMALY_MODE
+    if mode == "persistent":
+        return _saved_model(X)
+    if mode == "fit":
+        return fit_model(X, reference=True)
+    raise ValueError(f"Unknown anomaly mode: {mode}")
+
+
+def score_against(model: dict, features: pd.DataFrame, G) -> pd.DataFrame:
+    """Scores (0-1) for a FEATURE_COLUMNS table, normalized against a reference model's training range."""
+    X = _model_inputs(features, G)[MODEL_COLUMNS].to_numpy(dtype=float)
+    scores = _decision_scores(model, X) if len(X) else np.zeros(0)
+    return pd.DataFrame({
+        "anomaly_score": _normalize(scores, model["score_min"], model["score_max"])
+    }, index=features.index)
+
+
+def score_accounts(features: pd.DataFrame, G, mode: str = None) -> pd.DataFrame:
+    """
+    Isolation Forest scores (0-1, 1 = most anomalous) for a FEATURE_COLUMNS table.
+    "fit" mode fits on this batch and normalizes over it; "persistent" mode
+    scores against the saved model (fitting and saving it on first use) and
+    normalizes against its training score range.
+    """
+    X = _model_inputs(features, G)[MODEL_COLUMNS].to_numpy(dtype=float)
+    mode = mode or ANOMALY_MODE
+    if len(X) == 0:
+        return pd.DataFrame({"anomaly_score": np.zeros(0)}, index=features.index)
+
+    if mode == "persistent":
+        model = _saved_model(X)
+        anomaly_scores = _decision_scores(model, X)
+        normalized_scores = _normalize(anomaly_scores, model["score_min"], model["score_max"])
+    elif mode == "fit":
+        anomaly_scores = _decision_scores(fit_model(X), X)
+        normalized_scores = _normalize(anomaly_scores, anomaly_scores.min(), anomaly_scores.max())
+    else:
+        raise ValueError(f"Unknown anomaly mode: {mode}")
+
     results = pd.DataFrame({
         "anomaly_score": normalized_scores
     }, index=features.index)
-    
+
     return results
@@ -0,0 +1,364 @@
+from heapq import heappush, heappop
+from itertools import count
+from typing import Dict, List
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from app.temporal_graph import TemporalEdges
+
+
+class CompactGraph:
+    """
+    Directed transaction graph with dictionary-encoded accounts.
+
+    Account IDs map to int32 codes (sorted ID order). Aggregated edges are
+    kept in CSR (by sender) and CSC (by receiver) arrays carrying the summed
+    amount, the transaction count and the earliest timestamp of each edge.
+    Graphs built from transactions also keep every edge's individual
+    transactions (temporal) for time-respecting searches.
+    """
+
+    def __init__(self, ids, src, dst, amount, count, first_time=None, node_order=None, temporal: TemporalEdges = None):
+        # Edges must be grouped by src (ascending), with no duplicates
+        self.ids = np.asarray(ids, dtype=object)
+        n = len(self.ids)
+
+        self.out_ptr = _offsets(src, n)
+        self.out_dst = np.asarray(dst, dtype=np.int32)
+        self.amount = np.asarray(amount, dtype=float)
+        self.count = np.asarray(count, dtype=np.int64)
+        self.first_time = first_time
+        self.temporal = temporal
+
+        in_order = np.argsort(self.out_dst, kind="stable")
+        self.in_ptr = _offsets(self.out_dst[in_order], n)
+        self.in_src = np.asarray(src, dtype=np.int32)[in_order]
+        self.in_edge = in_order # CSC slot -> CSR edge id
+
+        # Order networkx would list the nodes in (first appearance over the edges)
+        self.node_order = np.arange(n) if node_order is None else np.asarray(node_order)
+        self._lookup = None
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.ids)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.out_dst)
+
+    def __len__(self):
+        return self.n_nodes
+
+    def codes(self, accounts) -> np.ndarray:
+        """Codes for account IDs (-1 for unknown accounts)."""
+        if self._lookup is None:
+            self._lookup = pd.Index(self.ids)
+        return self._lookup.get_indexer(pd.Index(accounts, dtype=object))
+
+    def edge_sources(self) -> np.ndarray:
+        return np.repeat(np.arange(self.n_nodes, dtype=np.int32), np.diff(self.out_ptr))
+
+    def edge_order(self) -> np.ndarray:
+        """CSR edge ids in the order nx.DiGraph.edges() would list them."""
+        rank = np.empty(self.n_nodes, dtype=np.int64)
+        rank[self.node_order] = np.arange(self.n_nodes)
+        return np.argsort(rank[self.edge_sources()], kind="stable")
+
+    def out_degree(self) -> np.ndarray:
+        return np.diff(self.out_ptr)
+
+    def in_degree(self) -> np.ndarray:
+        return np.diff(self.in_ptr)
+
+    def degree(self) -> np.ndarray:
+        # Same convention as nx.DiGraph.degree (self-loops count twice)
+        return self.out_degree() + self.in_degree()
+
+    def successors(self, u: int) -> np.ndarray:
+        return self.out_dst[self.out_ptr[u]:self.out_ptr[u + 1]]
+
+    def predecessors(self, u: int) -> np.ndarray:
+        return self.in_src[self.in_ptr[u]:self.in_ptr[u + 1]]
+
+    def adjacency(self) -> List[List[int]]:
+        """Successor lists as plain Python lists (fast to iterate in DFS loops)."""
+        dst = self.out_dst.tolist()
+        ptr = self.out_ptr.tolist()
+        return [dst[ptr[u]:ptr[u + 1]] for u in range(self.n_nodes)]
+
+    def to_networkx(self) -> nx.DiGraph:
+        """
+        Equivalent nx.DiGraph (amount / weight edge attributes, plus first_time
+        when known) for unported code.
+        """
+        G = nx.DiGraph()
+        ids = self.ids
+        G.add_nodes_from(ids[self.node_order].tolist())
+        edges = zip(
+            ids[self.edge_sources()].tolist(),
+            ids[self.out_dst].tolist(),
+            self.amount.tolist(),
+            self.count.tolist()
+        )
+        if self.first_time is None:
+            G.add_edges_from((u, v, {"amount": a, "weight": w}) for u, v, a, w in edges)
+        else:
+            G.add_edges_from(
+                (u, v, {"amount": a, "weight": w, "first_time": t})
+                for (u, v, a, w), t in zip(edges, self.first_time.tolist())
+            )
+        return G
+
+    @classmethod
+    def from_networkx(cls, G: nx.DiGraph) -> "CompactGraph":
+        ids = np.asarray(list(G.nodes()), dtype=object)
+        code = {node: i for i, node in enumerate(ids)}
+
+        edges = list(G.edges(data=True))
+        src = np.array([code[u] for u, _, _ in edges], dtype=np.int64)
+        dst = np.array([code[v] for _, v, _ in edges], dtype=np.int64)
+        amount = np.array([d.get("amount", 0.0) for _, _, d in edges], dtype=float)
+        weight = np.array([d.get("weight", 1) for _, _, d in edges], dtype=np.int64)
+        first_time = None
+        if edges and all("first_time" in d for _, _, d in edges):
+            first_time = np.array([d["first_time"] for _, _, d in edges], dtype=np.int64)
+
+        # G.edges() is already grouped by source in node order; keeping the
+        # adjacency order keeps results bit-identical to networkx
+        order = np.argsort(src, kind="stable")
+        return cls(
+            ids, src[order], dst[order], amount[order], weight[order],
+            first_time=None if first_time is None else first_time[order]
+        )
+
+
+def build_compact_graph(df: pd.DataFrame) -> CompactGraph:
+    """
+    Builds the compact graph straight from the transaction columns:
+    one factorize for the account codes, one sort for the edges.
+    """
+    n = len(df)
+    codes, ids = pd.factorize(
+        np.concatenate([df["sender_id"].to_numpy(dtype=object), df["receiver_id"].to_numpy(dtype=object)]),
+        sort=True
+    )
+    n_ids = len(ids)
+
+    edge_keys, edge_of_txn = np.unique(
+        codes[:n].astype(np.int64) * n_ids + codes[n:],
+        return_inverse=True
+    )
+    src = edge_keys // n_ids
+    dst = edge_keys % n_ids
+
+    # Aggregating transactions between same pairs (same sums as a groupby)
+    amounts = df["amount"].to_numpy(dtype=float)
+    amount = pd.Series(amounts).groupby(edge_of_txn).sum().to_numpy()
+    txn_count = np.bincount(edge_of_txn, minlength=len(edge_keys))
+
+    # Every edge's transactions, oldest first; the earliest is the edge's first time
+    temporal = TemporalEdges.from_edge_ids(
+        edge_of_txn,
+        df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+        amounts,
+        len(edge_keys)
+    )
+
+    # Node order of an nx.DiGraph fed these edges in (sender, receiver) order
+    endpoints = np.column_stack([src, dst]).ravel()
+    _, first_seen = np.unique(endpoints, return_index=True)
+    node_order = endpoints[np.sort(first_seen)]
+
+    return CompactGraph(
+        ids, src, dst, amount, txn_count,
+        first_time=temporal.first_times(), node_order=node_order, temporal=temporal
+    )
+
+
+def as_compact(G) -> CompactGraph:
+    return G if isinstance(G, CompactGraph) else CompactGraph.from_networkx(G)
+
+
+def node_degrees(G, accounts) -> np.ndarray:
+    """Total degree per account for an nx.DiGraph or CompactGraph (0 if absent)."""
+    if isinstance(G, CompactGraph):
+        codes = G.codes(accounts)
+        degrees = G.degree()
+        return np.where(codes >= 0, degrees[np.maximum(codes, 0)] if len(degrees) else 0, 0)
+    return np.array([G.degree(acc) if acc in G else 0 for acc in accounts], dtype=np.int64)
+
+
+def _offsets(keys: np.ndarray, n: int) -> np.ndarray:
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(np.asarray(keys, dtype=np.int64), minlength=n), out=ptr[1:])
+    return ptr
+
+
+# -------------------------
+# ALGORITHMS
+# -------------------------
+def strongly_connected_components(cg: CompactGraph, min_size: int = 2) -> List[np.ndarray]:
+    """Iterative Kosaraju over the CSR/CSC arrays. Returns code arrays."""
+    n = cg.n_nodes
+    out_ptr, out_dst = cg.out_ptr.tolist(), cg.out_dst.tolist()
+    in_ptr, in_src = cg.in_ptr.tolist(), cg.in_src.tolist()
+
+    # 1. Post-order on the forward graph
+    visited = [False] * n
+    finish = []
+    for root in range(n):
+        if visited[root]:
+            continue
+        visited[root] = True
+        stack = [(root, out_ptr[root])]
+        while stack:
+            u, i = stack[-1]
+            if i < out_ptr[u + 1]:
+                stack[-1] = (u, i + 1)
+                w = out_dst[i]
+                if not visited[w]:
+                    visited[w] = True
+                    stack.append((w, out_ptr[w]))
+            else:
+                stack.pop()
+                finish.append(u)
+
+    # 2. Components on the reverse graph in reverse finish order
+    comp = [-1] * n
+    components = []
+    for root in reversed(finish):
+        if comp[root] >= 0:
+            continue
+        label = len(components)
+        comp[root] = label
+        members = [root]
+        stack = [root]
+        while stack:
+            u = stack.pop()
+            for w in in_src[in_ptr[u]:in_ptr[u + 1]]:
+                if comp[w] < 0:
+                    comp[w] = label
+                    members.append(w)
+                    stack.append(w)
+        components.append(np.array(members, dtype=np.int64))
+
+    return [c for c in components if len(c) >= min_size]
+
+
+def bounded_cycles(cg: CompactGraph, component, max_length: int, adjacency=None):
+    """
+    Lazily yields simple cycles (as code lists) of at most max_length hops
+    inside one strongly connected component. Each cycle is rooted at its
+    smallest code and the walk never leaves nodes that can still get back
+    to the root within the remaining hops.
+    """
+    adjacency = adjacency if adjacency is not None else cg.adjacency()
+    in_ptr, in_src = cg.in_ptr, cg.in_src
+    members = sorted(int(c) for c in component)
+    in_component = set(members)
+
+    for root in members:
+        # Hops needed to get back to root, over nodes > root only
+        back = {root: 0}
+        frontier = [root]
+        for depth in range(1, max_length):
+            nxt = []
+            for u in frontier:
+                for w in in_src[in_ptr[u]:in_ptr[u + 1]].tolist():
+                    if w > root and w in in_component and w not in back:
+                        back[w] = depth
+                        nxt.append(w)
+            frontier = nxt
+
+        path = [root]
+        on_path = {root}
+        stack = [iter(adjacency[root])]
+        while stack:
+            for w in stack[-1]:
+                if w == root:
+                    yield list(path)
+                    continue
+                dist = back.get(w)
+                if dist is None or w in on_path or len(path) + dist > max_length:
+                    continue
+                path.append(w)
+                on_path.add(w)
+                stack.append(iter(adjacency[w]))
+                break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+
+
+def _dijkstra_paths(adjacency, weights, s, n):
+    # Mirrors networkx' _single_source_dijkstra_path_basic on int codes
+    S = []
+    P = [[] for _ in range(n)]
+    sigma = [0.0] * n
+    D = {}
+    sigma[s] = 1.0
+    seen = {s: 0}
+    c = count()
+    Q = []
+    heappush(Q, (0, next(c), s, s))
+    while Q:
+        (dist, _, pred, v) = heappop(Q)
+        if v in D:
+            continue
+        sigma[v] += sigma[pred]
+        S.append(v)
+        D[v] = dist
+        for w, wt in zip(adjacency[v], weights[v]):
+            vw_dist = dist + wt
+            if w not in D and (w not in seen or vw_dist < seen[w]):
+                seen[w] = vw_dist
+                heappush(Q, (vw_dist, next(c), v, w))
+                sigma[w] = 0.0
+                P[w] = [v]
+            elif vw_dist == seen[w]:
+                sigma[w] += sigma[v]
+                P[w].append(v)
+    return S, P, sigma
+
+
+def betweenness_sums(cg: CompactGraph, sources) -> np.ndarray:
+    """
+    Unnormalized Brandes dependency sums from the given source codes,
+    using the transaction count of each edge as its weight.
+    """
+    return csr_betweenness_sums(cg.out_ptr, cg.out_dst, cg.count, sources)
+
+
+def csr_betweenness_sums(out_ptr: np.ndarray, out_dst: np.ndarray, count: np.ndarray, sources) -> np.ndarray:
+    """
+    betweenness_sums on the bare CSR arrays, which are far cheaper to send
+    to a worker process than the whole graph.
+    """
+    n = len(out_ptr) - 1
+    ptr = out_ptr.tolist()
+    dst = out_dst.tolist()
+    counts = count.tolist()
+    adjacency = [dst[ptr[u]:ptr[u + 1]] for u in range(n)]
+    weights = [counts[ptr[u]:ptr[u + 1]] for u in range(n)]
+
+    betweenness = np.zeros(n)
+    for s in sources:
+        S, P, sigma = _dijkstra_paths(adjacency, weights, int(s), n)
+        delta = dict.fromkeys(S, 0)
+        while S:
+            w = S.pop()
+            coeff = (1 + delta[w]) / sigma[w]
+            for v in P[w]:
+                delta[v] += sigma[v] * coeff
+            if w != s:
+                betweenness[w] += delta[w]
+    return betweenness
+
+
+def to_node_dict(cg: CompactGraph, values: np.ndarray) -> Dict:
+    """Account-keyed dict in networkx node order."""
+    order = cg.node_order
+    return dict(zip(cg.ids[order].tolist(), np.asarray(values)[order].tolist()))
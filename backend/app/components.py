@@ -0,0 +1,195 @@
+# backend/app/components.py
+
+import math
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.compact_graph import CompactGraph
+
+# "auto" analyses independent subgraphs in batches across the pool; "off" always runs the whole graph
+COMPONENT_SPLIT = os.getenv("COMPONENT_SPLIT", "auto").lower()
+# Components this small (single edges, reciprocal pairs) hold no cycle, chain or bridge account
+MIN_COMPONENT_NODES = 3
+# Smallest batch worth a round trip to a worker
+MIN_BATCH_EDGES = int(os.getenv("COMPONENT_BATCH_EDGES", 20_000))
+
+
+class ComponentBatch:
+    """
+    Several weakly connected components analysed together: their accounts'
+    global codes (ascending) and the induced subgraph, in which local code i
+    is global code codes[i]. A giant batch holds one component that is
+    large enough for the whole-graph code path (e.g. parallel betweenness).
+    """
+
+    def __init__(self, codes: np.ndarray, graph: CompactGraph, components: int, giant: bool = False):
+        self.codes = codes
+        self.graph = graph
+        self.components = components
+        self.giant = giant
+
+    def local(self, codes) -> np.ndarray:
+        """Local codes for global codes (-1 for codes outside the batch)."""
+        codes = np.asarray(codes, dtype=np.int64)
+        if len(self.codes) == 0:
+            return np.full(len(codes), -1, dtype=np.int64)
+        pos = np.searchsorted(self.codes, codes).clip(max=len(self.codes) - 1)
+        return np.where(self.codes[pos] == codes, pos, -1)
+
+
+class ComponentPlan:
+    """Batches covering every non-trivial component, plus the node -> batch map."""
+
+    def __init__(self, batches: List[ComponentBatch], node_batch: np.ndarray, stats: Dict):
+        self.batches = batches
+        self.node_batch = node_batch  # -1 for accounts in skipped components
+        self.stats = stats
+
+    def split_codes(self, codes) -> List[np.ndarray]:
+        """Global codes as local codes per batch, in their original order; skipped accounts drop out."""
+        codes = np.asarray(codes, dtype=np.int64)
+        owner = self.node_batch[codes]
+        return [batch.local(codes[owner == b]) for b, batch in enumerate(self.batches)]
+
+
+def connected_labels(n: int, src: np.ndarray, dst: np.ndarray) -> np.ndarray:
+    """
+    Component label per node 0..n-1 of the undirected graph given by the
+    src / dst edge arrays: the smallest node in its component. A vectorized
+    union-find: min-label hooking with pointer jumping, each round one pass
+    over the edges.
+    """
+    labels = np.arange(n, dtype=np.int64)
+    src = np.asarray(src, dtype=np.int64)
+    dst = np.asarray(dst, dtype=np.int64)
+
+    while True:
+        lu, lv = labels[src], labels[dst]
+        low = np.minimum(lu, lv)
+        hooked = labels.copy()
+        # Hook the root of each endpoint onto the smaller root
+        np.minimum.at(hooked, lu, low)
+        np.minimum.at(hooked, lv, low)
+        while True:
+            jumped = hooked[hooked]
+            if np.array_equal(jumped, hooked):
+                break
+            hooked = jumped
+        if np.array_equal(hooked, labels):
+            return labels
+        labels = hooked
+
+
+def weakly_connected_components(cg: CompactGraph) -> np.ndarray:
+    """Component label per account code: the smallest code in its weakly connected component."""
+    return connected_labels(cg.n_nodes, cg.edge_sources(), cg.out_dst)
+
+
+def _assign_batches(
+    comp_nodes: np.ndarray, comp_edges: np.ndarray, workers: int, min_batch_edges: int, wanted: np.ndarray = None
+):
+    """Batch id per component (-1 when skipped or not wanted) and which batches are giants."""
+    batch_of = np.full(len(comp_nodes), -1, dtype=np.int64)
+    kept = comp_nodes >= MIN_COMPONENT_NODES
+    if wanted is not None:
+        kept &= wanted
+    kept = np.flatnonzero(kept)
+    if len(kept) == 0:
+        return batch_of, []
+
+    # Roughly one batch per worker, largest components first
+    target = max(math.ceil(comp_edges[kept].sum() / max(workers, 1)), min_batch_edges)
+    order = kept[np.lexsort((kept, -comp_edges[kept]))]
+
+    giants = []
+    current, filled, n_batches = None, 0, 0
+    for c in order.tolist():
+        if comp_edges[c] >= target:
+            # Big enough on its own: keeps the single-graph fast path
+            batch_of[c] = n_batches
+            giants.append(n_batches)
+            n_batches += 1
+            continue
+        if current is None or filled >= target:
+            current, filled = n_batches, 0
+            n_batches += 1
+        batch_of[c] = current
+        filled += comp_edges[c]
+    return batch_of, giants
+
+
+def plan_components(
+    cg: CompactGraph,
+    workers: int = 1,
+    min_batch_edges: int = MIN_BATCH_EDGES,
+    mode: str = None,
+    dirty: np.ndarray = None
+) -> Optional[ComponentPlan]:
+    """
+    Splits the graph into batches of weakly connected components, skipping
+    trivial ones. Returns None when the graph should be analysed whole
+    (splitting is off, or the graph is a single component). With dirty (a
+    flag per account code), only components holding a flagged account are
+    batched; the caller already has the results of the others.
+    """
+    mode = mode or COMPONENT_SPLIT
+    if mode == "off" or cg.n_nodes == 0:
+        return None
+    if mode != "auto":
+        raise ValueError(f"Unknown component split mode: {mode}")
+
+    labels = weakly_connected_components(cg)
+    roots, comp_of_node = np.unique(labels, return_inverse=True)
+    if len(roots) == 1:
+        return None
+
+    src = cg.edge_sources()
+    comp_nodes = np.bincount(comp_of_node, minlength=len(roots))
+    comp_edges = np.bincount(comp_of_node[src], minlength=len(roots))
+    wanted = None if dirty is None else np.bincount(comp_of_node, weights=dirty, minlength=len(roots)) > 0
+    batch_of, giants = _assign_batches(comp_nodes, comp_edges, workers, min_batch_edges, wanted)
+    n_batches = int(batch_of.max()) + 1 if len(batch_of) else 0
+
+    # One stable sort per array groups nodes, edges and node order by batch,
+    # keeping code order and CSR edge order inside every batch
+    node_batch = batch_of[comp_of_node]
+    group = np.where(node_batch >= 0, node_batch, n_batches)
+    nodes = np.argsort(group, kind="stable")
+    node_ptr = np.searchsorted(group[nodes], np.arange(n_batches + 2))
+    local = np.empty(cg.n_nodes, dtype=np.int64)
+    local[nodes] = np.arange(cg.n_nodes) - node_ptr[group[nodes]]
+
+    edges = np.argsort(group[src], kind="stable")
+    edge_ptr = np.searchsorted(group[src][edges], np.arange(n_batches + 1))
+
+    order = cg.node_order[np.argsort(group[cg.node_order], kind="stable")]
+    order_ptr = np.searchsorted(group[order], np.arange(n_batches + 1))
+
+    comps_per_batch = np.bincount(batch_of[batch_of >= 0], minlength=n_batches)
+    batches = []
+    for b in range(n_batches):
+        codes = nodes[node_ptr[b]:node_ptr[b + 1]]
+        e = edges[edge_ptr[b]:edge_ptr[b + 1]]
+        graph = CompactGraph(
+            cg.ids[codes],
+            local[src[e]],
+            local[cg.out_dst[e]],
+            cg.amount[e],
+            cg.count[e],
+            first_time=None if cg.first_time is None else cg.first_time[e],
+            node_order=local[order[order_ptr[b]:order_ptr[b + 1]]],
+            temporal=None if cg.temporal is None else cg.temporal.take(e)
+        )
+        batches.append(ComponentBatch(codes, graph, int(comps_per_batch[b]), giant=b in giants))
+
+    stats = {
+        "components": len(roots),
+        "skipped_components": int((comp_nodes < MIN_COMPONENT_NODES).sum()),
+        "batches": n_batches,
+        "largest_component_nodes": int(comp_nodes.max())
+    }
+    if wanted is not None:
+        stats["unchanged_components"] = int((~wanted & (comp_nodes >= MIN_COMPONENT_NODES)).sum())
+    return ComponentPlan(batches, node_batch, stats)
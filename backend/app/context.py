@@ -0,0 +1,114 @@
+# backend/app/context.py
+
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from app.compact_graph import CompactGraph, build_compact_graph
+from app.transaction_index import TransactionIndex
+
+
+class AnalysisContext:
+    """
+    Everything derived from one analysis' transactions, each artifact built
+    on first use and kept, so no engine recomputes what another already
+    has. Artifacts: df, graph, index (the time-sorted transactions),
+    account_features, txn_counts, graph_intel, centrality, rings and
+    pattern_map. Inputs (df, rings, or any precomputed artifact) are
+    passed in or added; a missing artifact that cannot be derived raises.
+
+    Pool stages get only(...) copies holding just what they read, so a
+    stage never pickles artifacts it does not need.
+    """
+
+    def __init__(self, df: pd.DataFrame = None, **artifacts):
+        self._memo: Dict = {name: value for name, value in artifacts.items() if value is not None}
+        if df is not None:
+            self._memo["df"] = df
+
+    def _get(self, name: str, build: Callable = None):
+        if name not in self._memo:
+            if build is None:
+                raise ValueError(f"Analysis context has no '{name}'")
+            self._memo[name] = build()
+        return self._memo[name]
+
+    def has(self, name: str) -> bool:
+        return name in self._memo
+
+    def add(self, **artifacts) -> "AnalysisContext":
+        """Adds inputs or precomputed artifacts; rings replace the pattern map built from old ones."""
+        if "rings" in artifacts:
+            self._memo.pop("pattern_map", None)
+        self._memo.update((name, value) for name, value in artifacts.items() if value is not None)
+        return self
+
+    def setdefault(self, **artifacts) -> "AnalysisContext":
+        """Adds the inputs / artifacts this context does not hold yet (e.g. an engine's own arguments)."""
+        for name, value in artifacts.items():
+            if value is not None:
+                self._memo.setdefault(name, value)
+        return self
+
+    def only(self, *names: str) -> "AnalysisContext":
+        """A context holding just these artifacts (built here first if needed)."""
+        return AnalysisContext(**{name: getattr(self, name) for name in names})
+
+    # -------------------------
+    # ARTIFACTS
+    # -------------------------
+    @property
+    def df(self) -> pd.DataFrame:
+        return self._get("df")
+
+    @property
+    def graph(self) -> CompactGraph:
+        return self._get("graph", lambda: build_compact_graph(self.df))
+
+    @property
+    def index(self) -> TransactionIndex:
+        return self._get("index", lambda: TransactionIndex(self.df))
+
+    @property
+    def account_features(self) -> pd.DataFrame:
+        """Per-account send / receive count, mean, std and sum (sorted account index)."""
+        def build():
+            # anomaly_engine imports this module; imported here to keep that one-way
+            from app.anomaly_engine import account_features
+            return account_features(self.df)
+        return self._get("account_features", build)
+
+    @property
+    def txn_counts(self) -> pd.Series:
+        """Transactions touching each account (self-transfers counted once)."""
+        def build():
+            accounts = self.index.accounts
+            return pd.Series(self.index.txn_counts(accounts), index=pd.Index(accounts))
+        return self._get("txn_counts", build)
+
+    @property
+    def graph_intel(self) -> Dict:
+        def build():
+            from app.graph_engine import analyze_graph_intelligence
+            return analyze_graph_intelligence(self.graph.to_networkx(), compact=self.graph)
+        return self._get("graph_intel", build)
+
+    @property
+    def centrality(self) -> Dict:
+        """Account-keyed pagerank / betweenness (plus the strategy used)."""
+        return self._get("centrality", lambda: self.graph_intel["centrality"])
+
+    @property
+    def rings(self) -> List[Dict]:
+        return self._get("rings")
+
+    @property
+    def pattern_map(self) -> Dict[str, List[str]]:
+        """Pattern types per ring member, in ring order (an account may repeat a type)."""
+        def build():
+            patterns = {}
+            for ring in self.rings:
+                for acc in ring["member_accounts"]:
+                    patterns.setdefault(acc, []).append(ring["pattern_type"])
+            return patterns
+        return self._get("pattern_map", build)
@@ -1,20 +1,96 @@
 # backend/app/cycle_detector.py
 
-import networkx as nx
+import os
+from itertools import islice
+from typing import Dict, List, Tuple
 
-def detect_cycles(G):
-    raw_cycles = list(nx.simple_cycles(G))
+from app.compact_graph import as_compact, bounded_cycles, strongly_connected_components
+from app.temporal_graph import TemporalEdges, TemporalSearch
+from app.transaction_index import TransactionIndex, NS_PER_SECOND
 
-    # Filter cycles length 3–5 only
-    filtered_cycles = [
-        cycle for cycle in raw_cycles
-        if 3 <= len(cycle) <= 5
-    ]
+MIN_CYCLE_LENGTH = 3
+MAX_CYCLE_LENGTH = 5
+MAX_CYCLE_RINGS = 10000
+# Round-tripping mode: only keep cycles the money can actually go round in time
+REQUIRE_TIME_ORDER = os.getenv("CYCLE_TIME_ORDER", "false").lower() in ("1", "true", "yes")
+# A time-ordered cycle must close within this window of its first hop (0 = no limit)
+CYCLE_WINDOW_SECONDS = float(os.getenv("CYCLE_WINDOW_HOURS", 7 * 24)) * 3600
+# ... and every hop must pass on at least this share of what the previous hop brought in
+CYCLE_MIN_PASS_THROUGH = float(os.getenv("CYCLE_MIN_PASS_THROUGH", 0.5))
 
+
+def cycle_search(cg, index: TransactionIndex = None) -> TemporalSearch:
+    """
+    Time-respecting cycle search over a CompactGraph: its own transactions
+    when it carries them, otherwise the index's.
+    """
+    temporal = cg.temporal
+    if temporal is None:
+        if index is None:
+            raise ValueError("Time-ordered cycle detection requires a TransactionIndex")
+        temporal = TemporalEdges.from_index(cg, index)
+    window = int(CYCLE_WINDOW_SECONDS * NS_PER_SECOND) if CYCLE_WINDOW_SECONDS > 0 else None
+    return TemporalSearch(cg, window, CYCLE_MIN_PASS_THROUGH, temporal=temporal)
+
+
+def iter_cycles(G, scc=None, max_length=MAX_CYCLE_LENGTH, temporal=False, index=None, search: TemporalSearch = None):
+    """
+    Lazily yields simple cycles of MIN_CYCLE_LENGTH..max_length hops,
+    one strongly connected component at a time. G may be an nx.DiGraph or
+    a CompactGraph; scc is a list of account lists. With temporal=True
+    only time-ordered cycles are searched (see cycle_search; callers
+    walking many SCCs of one graph can pass the search in).
+    """
+    cg = as_compact(G)
+    if temporal and search is None:
+        search = cycle_search(cg, index)
+
+    if scc is None:
+        components = strongly_connected_components(cg)
+    else:
+        components = [cg.codes(list(c)) for c in scc]
+
+    adjacency = cg.adjacency()
+    for component in components:
+        yield from _component_cycles(cg, component, adjacency, max_length, search if temporal else None)
+
+
+def _component_cycles(cg, component, adjacency, max_length, search):
+    # A cycle can never leave its SCC
+    if len(component) < MIN_CYCLE_LENGTH:
+        return
+
+    if search is not None:
+        # Hops out of time order, past the window or below the
+        # pass-through ratio are pruned while walking
+        cycles = search.cycles(component, max_length, MIN_CYCLE_LENGTH)
+    else:
+        cycles = bounded_cycles(cg, component, max_length, adjacency=adjacency)
+
+    for codes in cycles:
+        if len(codes) < MIN_CYCLE_LENGTH:
+            continue
+        yield cg.ids[codes].tolist()
+
+
+def detect_cycles(
+    G,
+    scc=None,
+    max_length=MAX_CYCLE_LENGTH,
+    max_rings=MAX_CYCLE_RINGS,
+    temporal=REQUIRE_TIME_ORDER,
+    index: TransactionIndex = None
+):
+    cycles = iter_cycles(G, scc=scc, max_length=max_length, temporal=temporal, index=index)
+    return cycle_rings(cycles, max_rings)
+
+
+def cycle_rings(cycles, max_rings=MAX_CYCLE_RINGS):
+    """Numbers the first max_rings cycles as RING_### rings."""
     rings = []
     ring_counter = 1
 
-    for cycle in filtered_cycles:
+    for cycle in islice(cycles, max_rings):
         ring_id = f"RING_{ring_counter:03d}"
 
         rings.append({
@@ -26,3 +102,56 @@ def detect_cycles(G):
         ring_counter += 1
 
     return rings
+
+
+# -------------------------
+# PER-COMPONENT BATCHES
+# -------------------------
+def scc_batches(cg, plan, scc: List[List]) -> List[List[Tuple[int, List]]]:
+    """The SCCs that can hold a cycle, as (position, accounts) lists per ComponentPlan batch."""
+    by_batch = [[] for _ in plan.batches]
+    if not scc:
+        return by_batch
+    owners = plan.node_batch[cg.codes([component[0] for component in scc])]
+    for position, (component, owner) in enumerate(zip(scc, owners.tolist())):
+        if len(component) >= MIN_CYCLE_LENGTH and owner >= 0:
+            by_batch[owner].append((position, component))
+    return by_batch
+
+
+def batch_cycles(
+    batch,
+    scc: List[Tuple[int, List]],
+    max_length=MAX_CYCLE_LENGTH,
+    max_rings=MAX_CYCLE_RINGS,
+    temporal=REQUIRE_TIME_ORDER,
+    index: TransactionIndex = None
+) -> List[Tuple[int, List[List]]]:
+    """
+    Cycles of the SCCs inside one ComponentBatch. scc holds (position in
+    the whole-graph SCC list, accounts) in that list's order; returns
+    (position, cycles) pairs. Enumeration stops after max_rings cycles in
+    all: whatever this batch would find after that is ranked behind them
+    in the whole-graph order, so it could not make the cut either.
+    """
+    cg = batch.graph
+    search = cycle_search(cg, index) if temporal else None
+    adjacency = cg.adjacency()
+    found = []
+    remaining = max_rings
+    for position, accounts in scc:
+        if remaining <= 0:
+            break
+        cycles = list(islice(
+            _component_cycles(cg, cg.codes(list(accounts)), adjacency, max_length, search), remaining
+        ))
+        remaining -= len(cycles)
+        found.append((position, cycles))
+    return found
+
+
+def merge_cycle_batches(results: List[List[Tuple[int, List[List]]]], max_rings=MAX_CYCLE_RINGS) -> List[Dict]:
+    """Rings numbered exactly as a whole-graph detect_cycles run numbers them."""
+    by_position = {position: cycles for found in results for position, cycles in found}
+    ordered = (cycle for position in sorted(by_position) for cycle in by_position[position])
+    return cycle_rings(ordered, max_rings)
@@ -1,5 +1,8 @@
 from typing import Dict, List
 
+# Only accounts scoring above this (0-100) get an explanation
+EXPLAIN_SCORE_THRESHOLD = 20
+
 def generate_explanation(acc: str, risk_data: Dict, patterns: List[str], graph_intelligence: Dict) -> str:
     """
     Generates a concise, audit-ready explanation for why an account was flagged.
@@ -32,10 +35,12 @@ def generate_explanation(acc: str, risk_data: Dict, patterns: List[str], graph_i
         
     return explanation
 
-def batch_explain(final_scores: Dict, account_patterns: Dict, graph_intelligence: Dict) -> Dict:
+def batch_explain(
+    final_scores: Dict, account_patterns: Dict, graph_intelligence: Dict, min_score: float = EXPLAIN_SCORE_THRESHOLD
+) -> Dict:
     explanations = {}
     for acc, data in final_scores.items():
-        if data["score"] > 20: # Only explain accounts with meaningful risk
+        if data["score"] > min_score: # Only explain accounts with meaningful risk
             patterns = account_patterns.get(acc, ["general anomaly"])
             explanations[acc] = generate_explanation(acc, data, patterns, graph_intelligence)
     return explanations
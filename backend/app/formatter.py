@@ -2,6 +2,7 @@
 
 def format_output(suspicious_accounts, rings, total_accounts, processing_time):
     fraud_rings = []
+    account_scores = {acc["account_id"]: acc["suspicion_score"] for acc in suspicious_accounts}
 
     for ring in rings:
         members = ring["member_accounts"]
@@ -20,11 +21,7 @@ def format_output(suspicious_accounts, rings, total_accounts, processing_time):
             clean_pattern = pattern
 
         # Calculate average risk score
-        member_scores = [
-            acc["suspicion_score"]
-            for acc in suspicious_accounts
-            if acc["account_id"] in members
-        ]
+        member_scores = [account_scores[acc] for acc in dict.fromkeys(members) if acc in account_scores]
 
         avg_score = sum(member_scores) / len(member_scores) if member_scores else 0.0
 
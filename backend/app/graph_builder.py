@@ -1,20 +1,39 @@
 # backend/app/graph_builder.py
 
 import networkx as nx
+import numpy as np
+import pandas as pd
 
 def build_transaction_graph(df):
+    """
+    One edge per sender/receiver pair carrying the attributes of the pair's
+    latest transaction (what re-adding every row would leave behind), built
+    from column arrays instead of iterrows. For large frames prefer
+    app.compact_graph.build_compact_graph.
+    """
     G = nx.DiGraph()
 
-    for _, row in df.iterrows():
-        sender = row["sender_id"]
-        receiver = row["receiver_id"]
+    senders = df["sender_id"].to_numpy(dtype=object)
+    receivers = df["receiver_id"].to_numpy(dtype=object)
 
-        G.add_edge(
-            sender,
-            receiver,
-            transaction_id=row["transaction_id"],
-            amount=row["amount"],
-            timestamp=row["timestamp"]
+    # Nodes in first-appearance order, as add_edge would create them
+    G.add_nodes_from(pd.unique(np.column_stack([senders, receivers]).ravel()).tolist())
+
+    # Last row per pair, listed in the order the pairs first appear
+    pair_id = df.groupby(["sender_id", "receiver_id"], sort=False, observed=True).ngroup().to_numpy()
+    is_last = ~pd.Series(pair_id).duplicated(keep="last").to_numpy()
+    rows = np.flatnonzero(is_last)
+    rows = rows[np.argsort(pair_id[rows], kind="stable")]
+
+    G.add_edges_from(
+        (sender, receiver, {"transaction_id": txn_id, "amount": amount, "timestamp": timestamp})
+        for sender, receiver, txn_id, amount, timestamp in zip(
+            senders[rows].tolist(),
+            receivers[rows].tolist(),
+            df["transaction_id"].iloc[rows].tolist(),
+            df["amount"].iloc[rows].tolist(),
+            df["timestamp"].iloc[rows].tolist()
         )
+    )
 
     return G
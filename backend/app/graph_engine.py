@@ -1,59 +1,222 @@
+import os
+import random
+from typing import List
+
 import networkx as nx
 import community as community_louvain
+import numpy as np
 import pandas as pd
 
+from app.compact_graph import (
+    CompactGraph, as_compact, betweenness_sums, build_compact_graph, csr_betweenness_sums, to_node_dict
+)
+
+# Betweenness strategy: "auto" | "exact" | "sampled" | "parallel"
+CENTRALITY_STRATEGY = os.getenv("CENTRALITY_STRATEGY", "auto")
+# Pivot chunks a "parallel" betweenness is split into (pool tasks of the analysis pipeline)
+CENTRALITY_WORKERS = int(os.getenv("CENTRALITY_WORKERS", os.cpu_count() or 1))
+EXACT_MAX_NODES = 2000        # Exact single-process betweenness up to this size
+PARALLEL_EXACT_MAX_NODES = 20000  # Exact pivots split across workers up to this size
+BETWEENNESS_PIVOTS = 512      # Sampled pivot sources above that
+BETWEENNESS_SEED = 42
+
 def build_graph(df: pd.DataFrame) -> nx.DiGraph:
     """
     Builds a directed graph from transaction data.
-    Uses vectorized operations for speed.
+    Edges are aggregated per sender/receiver pair on the compact graph
+    (amount = sum, weight = transaction count for centrality).
     """
-    G = nx.DiGraph()
-    
-    # Aggregating transactions between same pairs for performance
-    edges_df = df.groupby(["sender_id", "receiver_id"]).agg({
-        "amount": "sum",
-        "transaction_id": "count"
-    }).reset_index()
-    
-    for _, row in edges_df.iterrows():
-        G.add_edge(
-            row["sender_id"],
-            row["receiver_id"],
-            amount=row["amount"],
-            weight=row["transaction_id"] # Use count as weight for centrality
-        )
-    return G
+    return build_compact_graph(df).to_networkx()
+
+def choose_centrality_strategy(G: nx.DiGraph, mode: str = None) -> dict:
+    """
+    Picks how betweenness is computed. In "auto" mode the choice follows graph
+    size: exact for small graphs, exact pivots across worker processes for
+    medium ones, and k sampled pivots (split across workers when available)
+    for large ones.
+    """
+    mode = mode or CENTRALITY_STRATEGY
+    n = len(G)
+    workers = max(CENTRALITY_WORKERS, 1)
+
+    if mode == "auto":
+        if n <= EXACT_MAX_NODES:
+            mode, pivots = "exact", None
+        elif n <= PARALLEL_EXACT_MAX_NODES and workers > 1:
+            mode, pivots = "parallel", None
+        else:
+            mode, pivots = ("parallel" if workers > 1 else "sampled"), BETWEENNESS_PIVOTS
+    elif mode == "exact":
+        pivots = None
+    elif mode in ("sampled", "parallel"):
+        pivots = BETWEENNESS_PIVOTS if mode == "sampled" else None
+    else:
+        raise ValueError(f"Unknown centrality strategy: {mode}")
+
+    # Sampling every node is just the exact computation
+    if pivots is not None and pivots >= n:
+        pivots = None
+        if mode == "sampled":
+            mode = "exact"
+
+    return {
+        "mode": mode,
+        "pivots": pivots,
+        "seed": BETWEENNESS_SEED if pivots is not None else None,
+        "workers": workers if mode == "parallel" else 1
+    }
 
-def analyze_graph_intelligence(G: nx.DiGraph):
+
+def _rescale_betweenness(raw: np.ndarray, pivots: np.ndarray = None) -> np.ndarray:
+    """
+    Same normalization as nx.betweenness_centrality (directed, no endpoints),
+    including its correction for sampled pivot sources.
+    """
+    N = len(raw) - 1
+    if N < 2:
+        return raw
+    if pivots is None:
+        return raw * (1 / (N * (N - 1)))
+
+    k = len(pivots)
+    scale = np.full(len(raw), 1 / (k * (N - 1)))
+    scale[pivots] = 1 / ((k - 1) * (N - 1)) if k > 1 else np.nan
+    return raw * scale
+
+
+def betweenness_pivots(cg: CompactGraph, strategy: dict) -> np.ndarray:
+    """Pivot source codes in networkx node order (every node unless sampled)."""
+    if strategy["pivots"] is None:
+        return cg.node_order
+    # Same pivot draw as nx.betweenness_centrality(k=..., seed=...)
+    drawn = random.Random(strategy["seed"]).sample(cg.ids[cg.node_order].tolist(), strategy["pivots"])
+    return cg.codes(drawn)
+
+
+def betweenness_chunks(pivots: np.ndarray, strategy: dict) -> List[np.ndarray]:
+    """
+    The pivot sources split into strategy["workers"] interleaved chunks
+    (one chunk unless the strategy is "parallel"). Their betweenness sums
+    add up to the sums over all pivots.
+    """
+    workers = strategy["workers"] if strategy["mode"] == "parallel" else 1
+    chunks = [pivots[i::workers] for i in range(workers)]
+    return [chunk for chunk in chunks if len(chunk)] or [pivots]
+
+
+def betweenness_task(cg: CompactGraph, sources: np.ndarray) -> tuple:
+    """(fn, args) computing betweenness_sums(cg, sources), with only the CSR arrays to pickle."""
+    return csr_betweenness_sums, (cg.out_ptr, cg.out_dst, cg.count, sources)
+
+
+def scale_betweenness(cg: CompactGraph, raw: np.ndarray, pivots: np.ndarray, strategy: dict) -> dict:
+    scaled = _rescale_betweenness(raw, None if strategy["pivots"] is None else pivots)
+    return to_node_dict(cg, scaled)
+
+
+def compute_betweenness(G, strategy: dict) -> dict:
+    """
+    Weighted (transaction count) betweenness on the compact graph, in this
+    process. Accepts a CompactGraph or an nx.DiGraph. The analysis pipeline
+    spreads "parallel" strategies over its own pool instead (see
+    betweenness_chunks).
+    """
+    cg = as_compact(G)
+    pivots = betweenness_pivots(cg, strategy)
+    return scale_betweenness(cg, betweenness_sums(cg, pivots), pivots, strategy)
+
+
+def merge_betweenness_sums(cg: CompactGraph, batches, sums, known: np.ndarray = None) -> np.ndarray:
+    """
+    Unscaled betweenness sums for the whole graph from each batch's list
+    of partial sums (one per pivot chunk). Accounts outside every batch
+    keep their known sums (0 unless given).
+    """
+    raw = np.zeros(cg.n_nodes) if known is None else known.copy()
+    for batch, partials in zip(batches, sums):
+        raw[batch.codes] = np.sum(partials, axis=0)
+    return raw
+
+
+def find_hubs(betweenness: dict) -> list:
+    # Hub Detection (Nodes significantly above average centrality)
+    # Relative to the mean, so the cut-off is comparable across strategies
+    avg_bt = sum(betweenness.values()) / len(betweenness) if betweenness else 0
+    return [node for node, bt in betweenness.items() if bt > avg_bt * 5]
+
+
+def with_betweenness(graph_intel: dict, betweenness: dict) -> dict:
+    """Fills in betweenness (and the hubs derived from it) computed outside analyze_graph_intelligence."""
+    return {
+        **graph_intel,
+        "centrality": {**graph_intel["centrality"], "betweenness": betweenness},
+        "hubs": find_hubs(betweenness)
+    }
+
+
+def _cover_partition(partition: dict, G: nx.DiGraph):
+    # Louvain needs a community for every node; new nodes start alone
+    if not partition:
+        return None
+    next_id = max(partition.values(), default=-1) + 1
+    covered = {}
+    for node in G.nodes():
+        if node in partition:
+            covered[node] = partition[node]
+        else:
+            covered[node] = next_id
+            next_id += 1
+    return covered
+
+
+def _cover_pagerank(pagerank: dict, G: nx.DiGraph):
+    if not pagerank:
+        return None
+    default = 1 / len(G)
+    return {node: pagerank.get(node, default) for node in G.nodes()}
+
+
+def analyze_graph_intelligence(
+    G: nx.DiGraph,
+    centrality_strategy: str = None,
+    compact: CompactGraph = None,
+    partition: dict = None,
+    pagerank_start: dict = None,
+    betweenness: bool = True
+):
     """
     Performs advanced graph analysis: Louvain communities, SCC, and Centrality.
+    Betweenness runs on the compact graph when one is passed in. A previous
+    partition / PageRank vector warm-starts Louvain and PageRank.
+    betweenness=False leaves betweenness and hubs empty for the caller to
+    fill in (see with_betweenness).
     """
     if len(G) == 0:
-        return {"communities": {}, "scc": [], "centrality": {"betweenness": {}, "pagerank": {}}, "hubs": []}
+        return {"communities": {}, "scc": [], "centrality": {"betweenness": {}, "pagerank": {}, "strategy": choose_centrality_strategy(G, centrality_strategy)}, "hubs": []}
 
     # 1. Community Detection (Louvain) - Requires undirected graph
     undirected_G = G.to_undirected()
-    communities = community_louvain.best_partition(undirected_G)
+    communities = community_louvain.best_partition(undirected_G, partition=_cover_partition(partition, G))
     
     # 2. Strongly Connected Components (DiGraph) - Finds cycles/loops
     scc = [list(c) for c in nx.strongly_connected_components(G) if len(c) > 1]
     
     # 3. Centrality Metrics
     # Betweenness finds "bridges" between communities
-    betweenness = nx.betweenness_centrality(G, weight='weight')
+    strategy = choose_centrality_strategy(G, centrality_strategy)
+    scores = compute_betweenness(compact if compact is not None else G, strategy) if betweenness else {}
     # PageRank finds influential/hub accounts
-    pagerank = nx.pagerank(G, weight='amount')
+    pagerank = nx.pagerank(G, weight='amount', nstart=_cover_pagerank(pagerank_start, G))
     
-    # Hub Detection (Nodes significantly above average centrality)
-    avg_bt = sum(betweenness.values()) / len(betweenness) if betweenness else 0
-    hubs = [node for node, bt in betweenness.items() if bt > avg_bt * 5]
+    hubs = find_hubs(scores)
 
     return {
         "communities": communities,
         "scc": scc,
         "centrality": {
-            "betweenness": betweenness,
-            "pagerank": pagerank
+            "betweenness": scores,
+            "pagerank": pagerank,
+            "strategy": strategy
         },
         "hubs": hubs
     }
@@ -0,0 +1,778 @@
+# backend/app/incremental.py
+
+import asyncio
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.anomaly_engine import FEATURE_COLUMNS, reference_model, score_against
+from app.compact_graph import CompactGraph
+from app.components import plan_components
+from app.graph_engine import betweenness_pivots, choose_centrality_strategy
+from app.context import AnalysisContext
+from app.cycle_detector import (
+    MAX_CYCLE_LENGTH, MAX_CYCLE_RINGS, REQUIRE_TIME_ORDER, cycle_rings, cycle_search, iter_cycles
+)
+from app.metrics import ANALYSIS_SECONDS
+from app.pipeline import ANALYZE_WORKERS, finish_report, intelligence_work, stage_runners
+from app.ring_cases import consolidate_rings
+from app.risk_engine import build_score_table
+from app.shell_detector import (
+    MAX_HOPS, MAX_PATHS_PER_SOURCE, MIN_HOPS, chain_search, find_pass_through_accounts, number_shell_rings
+)
+from app.smurf_detector import (
+    MAX_AMOUNT_STD, MIN_TOTAL_AMOUNT, MIN_UNIQUE_ACCOUNTS, WINDOW_HOURS, _first_bursts, smurf_rings
+)
+from app.temporal_graph import TemporalEdges, gather_segments
+from app.transaction_index import NS_PER_SECOND
+from app.utils import APP_STATE_DIR, private_dir
+
+# Snapshots are unpickled on load, so they live in the app's private state dir
+DATASET_STATE_DIR = os.getenv("DATASET_STATE_DIR", os.path.join(APP_STATE_DIR, "datasets"))
+DATASET_CACHE_ENTRIES = int(os.getenv("DATASET_CACHE_ENTRIES", 4))
+DATASET_DISK_MB = float(os.getenv("DATASET_DISK_MB", 2048))
+DATASET_TTL_SECONDS = float(os.getenv("DATASET_TTL_SECONDS", 7 * 24 * 3600))
+# Appends are kept as a journal of deltas; a full snapshot is written every this many uploads
+DATASET_SNAPSHOT_EVERY = int(os.getenv("DATASET_SNAPSHOT_EVERY", 8))
+
+# Running per-account sums the anomaly features are derived from
+STAT_COLUMNS = ["out_count", "out_sum", "out_sumsq", "in_count", "in_sum", "in_sumsq", "self_count"]
+# risk_engine's velocity component only looks at the last 24h of transactions
+VELOCITY_WINDOW_NS = 24 * 3600 * NS_PER_SECOND
+
+_memory: "OrderedDict[str, DatasetState]" = OrderedDict()
+_lock = threading.Lock()
+_locks: Dict[str, asyncio.Lock] = {}
+
+
+class DatasetState:
+    """
+    Everything a dataset's next append needs, without its raw frame: the
+    compact graph with every edge's transactions (plus each transaction's
+    upload position), per-account running sums, the first fan-in / fan-out
+    burst of every account, cycles per SCC, shell chains per source, the
+    pass-through accounts, the anomaly model frozen at creation with the
+    scores it gave, the last communities / PageRank, and the unscaled
+    betweenness sums with the pivot sources they were summed over.
+    """
+
+    def __init__(self, dataset_id: str = None):
+        self.dataset_id = dataset_id or uuid.uuid4().hex
+        self.uploads = 0  # the creating upload and every append
+        self.graph = _empty_graph()
+        self.upload_order = np.zeros(0, dtype=np.int64)  # aligned with graph.temporal
+        self.account_stats = pd.DataFrame(columns=STAT_COLUMNS, dtype=float)
+        self.fan_in: Dict[str, List[str]] = {}
+        self.fan_out: Dict[str, List[str]] = {}
+        self.cycles_by_scc: Dict[frozenset, List[List[str]]] = {}
+        self.shell_paths: Dict[str, List[List[str]]] = {}  # source -> chains, in search order
+        self.pass_through: frozenset = frozenset()
+        self.model: Optional[dict] = None
+        self.anomaly_results = pd.DataFrame({"anomaly_score": np.zeros(0)}, index=pd.Index([], dtype=object))
+        self.communities: Dict = {}
+        self.pagerank: Dict = {}
+        self.betweenness_sums: Optional[np.ndarray] = None  # aligned with graph codes
+        self.betweenness_pivots = np.zeros(0, dtype=bool)
+        self.updated_at = None
+
+    @property
+    def n_transactions(self) -> int:
+        return len(self.upload_order)
+
+
+def _empty_graph() -> CompactGraph:
+    empty = np.zeros(0, dtype=np.int64)
+    return CompactGraph(
+        np.zeros(0, dtype=object), empty, empty, np.zeros(0), empty,
+        first_time=empty, node_order=empty, temporal=TemporalEdges(np.zeros(1, dtype=np.int64), empty, np.zeros(0))
+    )
+
+
+# -------------------------
+# DELTA UPDATES (run inside worker processes)
+# -------------------------
+def _merge_graph(cg: CompactGraph, upload_order: np.ndarray, delta: pd.DataFrame):
+    """
+    Folds the delta's transactions into the compact graph without going
+    back to earlier uploads: account codes are shifted past new IDs, new
+    pairs are slotted into the sorted CSR edges, and only edges that got
+    transactions have their slice of the temporal store re-sorted. The
+    result has the layout build_compact_graph gives all uploads at once.
+    Returns (graph, upload order, delta pairs, new pairs).
+    """
+    senders = delta["sender_id"].to_numpy(dtype=object)
+    receivers = delta["receiver_id"].to_numpy(dtype=object)
+    times = delta["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    amounts = delta["amount"].to_numpy(dtype=float)
+    offset = len(upload_order)
+
+    # 1. Account codes stay in sorted ID order: old codes move up past the new IDs below them
+    endpoints = np.concatenate([senders, receivers])
+    added = np.sort(pd.unique(endpoints[cg.codes(endpoints) < 0]).astype(object))
+    ids = np.insert(cg.ids, np.searchsorted(cg.ids, added), added)
+    remap = np.arange(cg.n_nodes) + np.searchsorted(added, cg.ids)
+    n = len(ids)
+    lookup = pd.Index(ids)
+    txn_keys = lookup.get_indexer(senders).astype(np.int64) * n + lookup.get_indexer(receivers)
+
+    # 2. Edge keys (src * n + dst, ascending = CSR order); the delta's new pairs are slotted in
+    old_keys = remap[cg.edge_sources()].astype(np.int64) * n + remap[cg.out_dst]
+    delta_keys = np.unique(txn_keys)
+    pos = np.searchsorted(old_keys, delta_keys)
+    known = pos < len(old_keys)
+    known[known] = old_keys[pos[known]] == delta_keys[known]
+    fresh = delta_keys[~known]
+    keys = np.insert(old_keys, np.searchsorted(old_keys, fresh), fresh)
+    old_edge = np.arange(len(old_keys)) + np.searchsorted(fresh, old_keys)
+    edge_of_txn = np.searchsorted(keys, txn_keys)
+    n_edges = len(keys)
+
+    amount = np.zeros(n_edges)
+    amount[old_edge] = cg.amount
+    amount += np.bincount(edge_of_txn, weights=amounts, minlength=n_edges)
+    txn_count = np.zeros(n_edges, dtype=np.int64)
+    txn_count[old_edge] = cg.count
+    new_len = np.bincount(edge_of_txn, minlength=n_edges)
+    txn_count += new_len
+
+    # 3. Temporal store: old transactions keep their slots' order, the delta's follow on their edge
+    temporal = cg.temporal
+    kept_len = np.diff(temporal.ptr)
+    old_len = np.zeros(n_edges, dtype=np.int64)
+    old_len[old_edge] = kept_len
+    total = old_len + new_len
+    ptr = np.zeros(n_edges + 1, dtype=np.int64)
+    np.cumsum(total, out=ptr[1:])
+
+    _, old_pos = gather_segments(ptr[old_edge], kept_len)
+    by_edge = np.argsort(edge_of_txn, kind="stable")
+    edge_sorted = edge_of_txn[by_edge]
+    new_pos = ptr[edge_sorted] + old_len[edge_sorted] + np.arange(len(delta)) - np.searchsorted(edge_sorted, edge_sorted)
+
+    all_times = np.empty(ptr[-1], dtype=np.int64)
+    all_amounts = np.empty(ptr[-1])
+    order = np.empty(ptr[-1], dtype=np.int64)
+    all_times[old_pos], all_amounts[old_pos], order[old_pos] = temporal.times, temporal.amounts, upload_order
+    all_times[new_pos], all_amounts[new_pos], order[new_pos] = times[by_edge], amounts[by_edge], offset + by_edge
+
+    # Touched edges go back to (time, upload position) order, as from_edge_ids sorts one upload
+    touched = np.flatnonzero(new_len)
+    _, slots = gather_segments(ptr[touched], total[touched])
+    segment = np.repeat(np.arange(len(touched)), total[touched])
+    resorted = slots[np.lexsort((order[slots], all_times[slots], segment))]
+    all_times[slots], all_amounts[slots], order[slots] = all_times[resorted], all_amounts[resorted], order[resorted]
+
+    # 4. Node order of an nx.DiGraph fed the edges in (sender, receiver) order
+    src, dst = keys // n, keys % n
+    ends = np.column_stack([src, dst]).ravel()
+    _, first_seen = np.unique(ends, return_index=True)
+
+    merged = CompactGraph(
+        ids, src, dst, amount, txn_count,
+        first_time=all_times[ptr[:-1]], node_order=ends[np.sort(first_seen)],
+        temporal=TemporalEdges(ptr, all_times, all_amounts)
+    )
+
+    def pairs(edge_keys):
+        return list(zip(ids[edge_keys // n].tolist(), ids[edge_keys % n].tolist()))
+
+    return merged, order, pairs(delta_keys), pairs(fresh)
+
+
+def _update_stats(stats: pd.DataFrame, delta: pd.DataFrame) -> pd.DataFrame:
+    senders = delta["sender_id"].to_numpy(dtype=object)
+    receivers = delta["receiver_id"].to_numpy(dtype=object)
+    amounts = delta["amount"].to_numpy(dtype=float)
+    parts = pd.DataFrame({
+        "amount": amounts,
+        "sumsq": amounts * amounts,
+        "one": 1.0,
+        "self": (senders == receivers).astype(float)
+    })
+
+    sent = parts.groupby(senders).agg(
+        out_count=("one", "sum"), out_sum=("amount", "sum"), out_sumsq=("sumsq", "sum"), self_count=("self", "sum")
+    )
+    received = parts.groupby(receivers).agg(
+        in_count=("one", "sum"), in_sum=("amount", "sum"), in_sumsq=("sumsq", "sum")
+    )
+    delta_stats = sent.join(received, how="outer").fillna(0)
+
+    return stats.add(delta_stats, fill_value=0)[STAT_COLUMNS]
+
+
+def merge_delta(cg: CompactGraph, upload_order: np.ndarray, stats: pd.DataFrame, delta: pd.DataFrame):
+    """The graph stage of an append: merged graph, upload order, running sums, delta pairs and new pairs."""
+    merged, order, delta_edges, new_edges = _merge_graph(cg, upload_order, delta)
+    return merged, order, _update_stats(stats, delta), delta_edges, new_edges
+
+
+def _features(stats: pd.DataFrame) -> pd.DataFrame:
+    """anomaly_engine.FEATURE_COLUMNS from the running sums (std with ddof=1, 0 below two rows)."""
+    features = pd.DataFrame(index=stats.index)
+    for side in ("out", "in"):
+        n = stats[f"{side}_count"].to_numpy()
+        total = stats[f"{side}_sum"].to_numpy()
+        sumsq = stats[f"{side}_sumsq"].to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            avg = np.where(n > 0, total / n, 0.0)
+            var = np.where(n > 1, (sumsq - total * total / n) / (n - 1), 0.0)
+        features[f"{side}_count"] = n
+        features[f"{side}_avg"] = avg
+        features[f"{side}_std"] = np.sqrt(np.maximum(var, 0))
+        features[f"{side}_sum"] = total
+    return features[FEATURE_COLUMNS]
+
+
+def _account_transactions(cg: CompactGraph, upload_order: np.ndarray, codes: np.ndarray, side: str):
+    """
+    (account, counterparty, time, amount) arrays of every transaction the
+    accounts sent ("out") or received ("in"), in upload order.
+    """
+    ptr = cg.out_ptr if side == "out" else cg.in_ptr
+    slot_ptr, slots = gather_segments(ptr[codes], ptr[codes + 1] - ptr[codes])
+    owners = np.repeat(codes, np.diff(slot_ptr))
+    if side == "out":
+        edges, others = slots, cg.out_dst[slots]
+    else:
+        edges, others = cg.in_edge[slots], cg.in_src[slots]
+
+    temporal = cg.temporal
+    lengths = temporal.ptr[edges + 1] - temporal.ptr[edges]
+    _, txns = gather_segments(temporal.ptr[edges], lengths)
+    by_upload = np.argsort(upload_order[txns], kind="stable")
+    txns = txns[by_upload]
+    return (
+        cg.ids[np.repeat(owners, lengths)[by_upload]],
+        cg.ids[np.repeat(others, lengths)[by_upload]],
+        temporal.times[txns],
+        temporal.amounts[txns]
+    )
+
+
+def update_bursts(
+    cg: CompactGraph,
+    upload_order: np.ndarray,
+    fan_in: Dict,
+    fan_out: Dict,
+    delta_senders: List[str],
+    delta_receivers: List[str]
+) -> Tuple[Dict, Dict, List[Dict]]:
+    """
+    Re-runs the fan-in / fan-out window scan only for accounts the delta
+    touched, from their transactions in the graph; every other account
+    keeps its first burst. Returns (fan_in, fan_out, smurf rings).
+    """
+    thresholds = (WINDOW_HOURS, MIN_UNIQUE_ACCOUNTS, MIN_TOTAL_AMOUNT, MAX_AMOUNT_STD)
+    fan_in, fan_out = dict(fan_in), dict(fan_out)
+
+    # Fan-in also depends on whether the receiver redistributes (has sent anything)
+    for bursts, affected, side in (
+        (fan_in, set(delta_receivers) | set(delta_senders), "in"),
+        (fan_out, set(delta_senders), "out")
+    ):
+        codes = np.sort(cg.codes(list(affected)))
+        accounts, counterparties, times, amounts = _account_transactions(cg, upload_order, codes, side)
+        eligible = None
+        if side == "in":
+            # Indexed like _first_bursts' sorted account values (codes follow sorted IDs)
+            eligible = cg.out_degree()[np.unique(cg.codes(accounts))] > 0
+
+        for acc in affected:
+            bursts.pop(acc, None)
+        for acc, members in _first_bursts(accounts, counterparties, times, amounts, *thresholds, eligible=eligible):
+            bursts[acc] = members
+
+    return fan_in, fan_out, smurf_rings(sorted(fan_in.items()), sorted(fan_out.items()))
+
+
+def carry_betweenness(state: "DatasetState", cg: CompactGraph, accounts: List[str]):
+    """
+    The component plan of an append's betweenness: only weakly connected
+    components holding a delta account, a new account or an account whose
+    pivot status changed are batched. Every other component has the same
+    accounts, edges and transaction counts as before, so its accounts keep
+    their stored sums. With sampled pivots a new account redraws them all,
+    so little is kept then. Returns (plan, known sums, pivot flags), both
+    per account code.
+    """
+    pivots = np.zeros(cg.n_nodes, dtype=bool)
+    pivots[betweenness_pivots(cg, choose_centrality_strategy(cg))] = True
+    known = np.zeros(cg.n_nodes)
+    dirty = np.ones(cg.n_nodes, dtype=bool)
+    if state.betweenness_sums is not None:
+        old = pd.Index(state.graph.ids).get_indexer(cg.ids)
+        seen = old >= 0
+        # Components only grow, so an account's old sums are its component's if nothing in it changed
+        known[seen] = state.betweenness_sums[old[seen]]
+        dirty[seen] = state.betweenness_pivots[old[seen]] != pivots[seen]
+        dirty[cg.codes(accounts)] = True
+    return plan_components(cg, ANALYZE_WORKERS, dirty=dirty), known, pivots
+
+
+def update_cycles(cg: CompactGraph, scc: List[List], touched_edges, cached: Dict) -> Tuple[List[Dict], Dict]:
+    """
+    Cycles never leave their SCC, so an SCC's cycles only change when an edge
+    inside it is touched. Only such SCCs (and ones not seen before) are
+    searched. Returns (rings, cycles per SCC).
+    """
+    component_of = {node: i for i, component in enumerate(scc) for node in component}
+    dirty = {
+        component_of[u] for u, v in touched_edges
+        if u in component_of and component_of[u] == component_of.get(v)
+    }
+
+    cache = {}
+    search = cycle_search(cg) if REQUIRE_TIME_ORDER else None
+
+    def cycles():
+        for i, component in enumerate(scc):
+            key = frozenset(component)
+            found = None if i in dirty else cached.get(key)
+            if found is None:
+                found = list(islice(
+                    iter_cycles(cg, scc=[component], max_length=MAX_CYCLE_LENGTH, temporal=REQUIRE_TIME_ORDER, search=search),
+                    MAX_CYCLE_RINGS
+                ))
+            cache[key] = found
+            yield from found
+
+    rings = cycle_rings(cycles(), MAX_CYCLE_RINGS)
+    # SCCs past the ring cap were never visited; they are searched when needed
+    return rings, cache
+
+
+def _chain_sources(cg: CompactGraph, seeds: np.ndarray, relay: np.ndarray) -> np.ndarray:
+    """
+    Accounts whose chains can pass through a seed: the seeds and everything
+    reaching one in under MAX_HOPS hops through relay accounts.
+    """
+    reached = np.zeros(cg.n_nodes, dtype=bool)
+    frontier = np.unique(seeds)
+    reached[frontier] = True
+    for _ in range(MAX_HOPS - 1):
+        frontier = frontier[relay[frontier]]
+        _, slots = gather_segments(cg.in_ptr[frontier], cg.in_ptr[frontier + 1] - cg.in_ptr[frontier])
+        frontier = np.unique(cg.in_src[slots])
+        frontier = frontier[~reached[frontier]]
+        if len(frontier) == 0:
+            break
+        reached[frontier] = True
+    return np.flatnonzero(reached)
+
+
+def update_shells(
+    cg: CompactGraph,
+    account_stats: pd.DataFrame,
+    pass_through: frozenset,
+    delta_senders: List[str],
+    cached: Dict,
+    stats: Dict = None
+) -> Tuple[List[Dict], Dict, frozenset]:
+    """
+    Searches shell chains again only from sources whose chains the delta can
+    change: ones reaching a delta sender (new transactions extend walks
+    from there) or an account that became or stopped being pass-through,
+    with every account in between a relay before or after. Other sources
+    keep their cached chains. Rings are numbered over all chains exactly
+    as detect_shell_networks numbers them. Returns (rings, chains per
+    source, pass-through accounts). If a stats dict is passed, the
+    pass-through account, searched source and candidate path counts are
+    written to it.
+    """
+    features = _features(account_stats.reindex(cg.ids).fillna(0))
+    mules = find_pass_through_accounts(cg, context=AnalysisContext(account_features=features))
+    was = np.zeros(cg.n_nodes, dtype=bool)
+    was[cg.codes(list(pass_through))] = True
+
+    seeds = np.concatenate([cg.codes(delta_senders), np.flatnonzero(mules != was)])
+    sources = _chain_sources(cg, seeds, mules | was)
+
+    cache = dict(cached)
+    search = chain_search(cg)
+    relay = mules.tolist()
+    ids = cg.ids
+    for source in sources.tolist():
+        paths = search.paths(source, MAX_HOPS, MIN_HOPS, relay=relay, max_paths=MAX_PATHS_PER_SOURCE)
+        if paths:
+            cache[ids[source]] = [ids[path].tolist() for path in paths]
+        else:
+            cache.pop(ids[source], None)
+
+    # Sources in node order, each source's chains by target (see shell_candidates)
+    rank = np.empty(cg.n_nodes, dtype=np.int64)
+    rank[cg.node_order] = np.arange(cg.n_nodes)
+    source_rank = dict(zip(cache, rank[cg.codes(list(cache))].tolist()))
+    chains = []
+    for source in sorted(cache, key=source_rank.get):
+        paths = cache[source]
+        targets = rank[cg.codes([path[-1] for path in paths])].tolist()
+        chains.extend(paths[i] for i in sorted(range(len(paths)), key=targets.__getitem__))
+    rings, n_candidates = number_shell_rings(chains)
+
+    if stats is not None:
+        stats["pass_through_accounts"] = int(mules.sum())
+        stats["searched_sources"] = len(sources)
+        stats["candidate_paths"] = n_candidates
+    return rings, cache, frozenset(ids[mules].tolist())
+
+
+def update_anomaly(model: Optional[dict], cg: CompactGraph, stats: pd.DataFrame, accounts: List[str]):
+    """
+    Scores accounts against the dataset's frozen model (fitted here, on
+    every account, when the dataset is created). Only accounts the delta
+    touched change features or degree, so only they are rescored.
+    Returns (model, scores of those accounts).
+    """
+    features = _features(stats.reindex(accounts).fillna(0))
+    if model is None:
+        model = reference_model(features, cg)
+    return model, score_against(model, features, cg)
+
+
+def recent_transactions(cg: CompactGraph) -> pd.DataFrame:
+    """The senders and times of the last VELOCITY_WINDOW_NS of transactions (all risk_engine's velocity reads)."""
+    temporal = cg.temporal
+    if len(temporal.times) == 0:
+        return pd.DataFrame({"sender_id": pd.Series(dtype=object), "timestamp": pd.Series(dtype="datetime64[ns]")})
+    recent = temporal.times > temporal.times.max() - VELOCITY_WINDOW_NS
+    senders = np.repeat(cg.edge_sources(), np.diff(temporal.ptr))[recent]
+    return pd.DataFrame({
+        "sender_id": cg.ids[senders],
+        "timestamp": temporal.times[recent].view("datetime64[ns]")
+    })
+
+
+# -------------------------
+# ORCHESTRATION
+# -------------------------
+async def apply_delta(
+    state: DatasetState,
+    delta: pd.DataFrame,
+    start_time: float = None,
+    timings: List[Dict] = None,
+    report: bool = True
+) -> Tuple[DatasetState, Optional[Dict]]:
+    """
+    Appends delta to the dataset and returns (new state, full /analyze
+    response); state itself is left untouched, so a failed append changes
+    nothing. The stages are run_analysis' stages in the same process pool,
+    each reworking only what the delta can change: the graph is merged,
+    communities and PageRank are warm-started, and cycles, bursts, shell
+    chains and anomaly scores are recomputed for touched SCCs / accounts.
+    Anomaly scores come from the model fitted when the dataset was created
+    (see update_anomaly), so they can differ from a fresh /analyze in "fit"
+    mode; in "persistent" mode an append matches /analyze of all uploads.
+    With report=False only the state is updated (the response is None).
+    """
+    start_time = start_time or time.time()
+    staged, run_stage = stage_runners(timings=timings)
+    rows = len(delta)
+    delta_senders = pd.unique(delta["sender_id"].to_numpy(dtype=object)).tolist()
+    delta_receivers = pd.unique(delta["receiver_id"].to_numpy(dtype=object)).tolist()
+
+    # 1. GRAPH FOUNDATION (delta folded into the stored graph)
+    graph_stats = {"rows": rows}
+
+    async def foundation(run, local):
+        (merged,) = await run([(merge_delta, (state.graph, state.upload_order, state.account_stats, delta), {})])
+        plan, known_sums, pivots = await local(carry_betweenness, state, merged[0], delta_senders + delta_receivers)
+        if plan is not None:
+            graph_stats.update(plan.stats)
+        return merged, plan, known_sums, pivots
+
+    (CG, upload_order, stats, delta_edges, new_edges), plan, known_sums, pivots = await staged(
+        "graph", foundation, sizes=graph_stats
+    )
+    graph_sizes = {"nodes": CG.n_nodes, "edges": CG.n_edges}
+
+    # 2. ADVANCED GRAPH INTELLIGENCE (warm-started) + 3. PATTERN DETECTION + 4. ML ANOMALY DETECTION
+    # New transactions on existing edges only matter for time-ordered cycles
+    touched_edges = delta_edges if REQUIRE_TIME_ORDER else new_edges
+
+    async def intelligence_then_cycles():
+        graph_intel = await staged(
+            "intelligence",
+            intelligence_work(
+                CG, plan, partition=state.communities, pagerank_start=state.pagerank, known_sums=known_sums
+            ),
+            sizes={**graph_sizes, **({"batches": len(plan.batches)} if plan is not None else {})}
+        )
+        scc = graph_intel["scc"]
+        cycles = await run_stage(
+            "cycles", update_cycles, CG, scc, touched_edges, state.cycles_by_scc,
+            sizes={**graph_sizes, "scc_count": len(scc), "touched_edges": len(touched_edges)}
+        )
+        return graph_intel, cycles
+
+    # The first run scores every account; appends only the delta's
+    scored = list(CG.ids) if state.model is None else sorted(set(delta_senders) | set(delta_receivers))
+    tasks = [
+        asyncio.ensure_future(intelligence_then_cycles()),
+        asyncio.ensure_future(run_stage(
+            "smurfing", update_bursts, CG, upload_order, state.fan_in, state.fan_out, delta_senders, delta_receivers,
+            sizes={"rows": rows}
+        )),
+        asyncio.ensure_future(run_stage(
+            "shell", update_shells, CG, stats, state.pass_through, delta_senders, state.shell_paths,
+            stats={}, sizes={"rows": rows, **graph_sizes}
+        )),
+        asyncio.ensure_future(run_stage(
+            "anomaly", update_anomaly, state.model, CG, stats, scored, sizes={"accounts": len(scored)}
+        ))
+    ]
+    try:
+        (graph_intel, (cycle_results, cycles_by_scc)), (fan_in, fan_out, smurf_results), \
+            (shell_results, shell_paths, pass_through), (model, rescored) = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    all_rings = cycle_results + smurf_results + shell_results
+    context = AnalysisContext(rings=all_rings)
+    anomaly_results = pd.concat([state.anomaly_results.drop(rescored.index, errors="ignore"), rescored])
+    anomaly_results = anomaly_results.reindex(CG.ids)
+
+    updated = DatasetState(state.dataset_id)
+    updated.uploads = state.uploads + 1
+    updated.graph, updated.upload_order, updated.account_stats = CG, upload_order, stats
+    updated.fan_in, updated.fan_out, updated.cycles_by_scc = fan_in, fan_out, cycles_by_scc
+    updated.shell_paths, updated.pass_through = shell_paths, pass_through
+    updated.model, updated.anomaly_results = model, anomaly_results
+    updated.communities = graph_intel["communities"]
+    updated.pagerank = graph_intel["centrality"]["pagerank"]
+    updated.betweenness_sums, updated.betweenness_pivots = graph_intel.pop("betweenness_sums"), pivots
+    updated.updated_at = time.time()
+    if not report:
+        return updated, None
+
+    # 5. RISK CALIBRATION (WEIGHTED MODEL) + RING CONSOLIDATION
+    accounts = CG.ids[CG.node_order].tolist()
+    ring_sizes = {"accounts": len(accounts), "rings": len(all_rings)}
+    txn_counts = stats["out_count"] + stats["in_count"] - stats["self_count"]
+
+    async def scoring(run, local):
+        recent = await local(recent_transactions, CG)
+        (table,) = await run([(
+            build_score_table, (accounts, graph_intel, anomaly_results, all_rings, recent),
+            {"txn_counts": txn_counts, "context": context.only("pattern_map")}
+        )])
+        return table
+
+    tasks = [
+        asyncio.ensure_future(staged("scoring", scoring, sizes=ring_sizes)),
+        asyncio.ensure_future(run_stage(
+            "consolidation", consolidate_rings, all_rings, hubs=graph_intel["hubs"], sizes={"rings": len(all_rings)}
+        ))
+    ]
+    try:
+        score_table, cases = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    # 6. EXPLANATIONS + 7. RESPONSE FORMATTING
+    result = await run_stage(
+        "report", finish_report, CG, graph_intel, anomaly_results, all_rings, score_table, start_time,
+        context=context.only("pattern_map"), cases=cases, sizes=ring_sizes
+    )
+    result["summary"]["dataset_id"] = state.dataset_id
+    ANALYSIS_SECONDS.observe(time.time() - start_time)
+
+    return updated, result
+
+
+# -------------------------
+# DATASET REGISTRY
+# -------------------------
+# On disk a dataset is a directory: a snapshot of its state after some upload, plus
+# the deltas appended since, one file each, replayed on load
+def _dataset_dir(dataset_id: str) -> str:
+    return os.path.join(DATASET_STATE_DIR, dataset_id)
+
+
+def _snapshot_path(dataset_id: str) -> str:
+    return os.path.join(_dataset_dir(dataset_id), "snapshot.pkl")
+
+
+def _delta_path(dataset_id: str, upload: int) -> str:
+    return os.path.join(_dataset_dir(dataset_id), f"delta-{upload:06d}.pkl")
+
+
+def _valid_id(dataset_id: str) -> bool:
+    return re.fullmatch(r"[0-9a-f]{32}", dataset_id) is not None
+
+
+def _write(path: str, value):
+    private_dir(DATASET_STATE_DIR)
+    directory = private_dir(os.path.dirname(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _journal(dataset_id: str) -> List[Tuple[int, str]]:
+    """(upload, path) of the dataset's delta files, oldest first."""
+    found = []
+    for name in os.listdir(_dataset_dir(dataset_id)):
+        match = re.fullmatch(r"delta-(\d{6})\.pkl", name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(_dataset_dir(dataset_id), name)))
+    return sorted(found)
+
+
+def _save_snapshot(state: DatasetState):
+    # The snapshot covers every delta so far, so the journal is dropped after it
+    _write(_snapshot_path(state.dataset_id), state)
+    for upload, path in _journal(state.dataset_id):
+        if upload <= state.uploads:
+            os.remove(path)
+
+
+def _persist(state: DatasetState, delta: pd.DataFrame = None, busy=()):
+    """
+    Saves an upload: the full state when the dataset is new or its journal
+    is DATASET_SNAPSHOT_EVERY deltas long, otherwise just the delta.
+    """
+    if delta is None or (state.uploads - 1) % max(DATASET_SNAPSHOT_EVERY, 1) == 0:
+        _save_snapshot(state)
+    else:
+        _write(_delta_path(state.dataset_id, state.uploads), delta)
+    _evict_disk(keep={state.dataset_id, *busy})
+
+
+def _read_disk(dataset_id: str) -> Optional[Tuple[DatasetState, List[pd.DataFrame]]]:
+    """The dataset's snapshot and the deltas appended after it, or None if it is missing or expired."""
+    try:
+        if time.time() - os.path.getmtime(_dataset_dir(dataset_id)) > DATASET_TTL_SECONDS:
+            _remove(dataset_id)
+            return None
+        # Unpickling runs code: only from directories no other user can write to
+        private_dir(DATASET_STATE_DIR)
+        private_dir(_dataset_dir(dataset_id))
+        with open(_snapshot_path(dataset_id), "rb") as f:
+            state = pickle.load(f)
+        deltas = []
+        for upload, path in _journal(dataset_id):
+            if upload <= state.uploads:
+                continue
+            if upload != state.uploads + len(deltas) + 1:
+                break # A gap means the rest of the journal was never completed
+            with open(path, "rb") as f:
+                deltas.append(pickle.load(f))
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    return state, deltas
+
+
+def _remember(state: DatasetState):
+    with _lock:
+        _memory[state.dataset_id] = state
+        _memory.move_to_end(state.dataset_id)
+        while len(_memory) > DATASET_CACHE_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _remove(dataset_id: str):
+    # The dataset is gone for good, so its append lock goes too (any waiter finds no dataset)
+    with _lock:
+        _memory.pop(dataset_id, None)
+        _locks.pop(dataset_id, None)
+    shutil.rmtree(_dataset_dir(dataset_id), ignore_errors=True)
+
+
+def _evict_disk(keep=()):
+    """
+    Drops datasets not appended to within DATASET_TTL_SECONDS, then the
+    least recently appended ones above the size cap (never those in keep).
+    """
+    now = time.time()
+    entries = []
+    for name in os.listdir(DATASET_STATE_DIR):
+        directory = os.path.join(DATASET_STATE_DIR, name)
+        if not _valid_id(name) or name in keep or not os.path.isdir(directory):
+            continue
+        try:
+            mtime = os.path.getmtime(directory)
+            size = sum(entry.stat().st_size for entry in os.scandir(directory))
+        except OSError:
+            continue
+        if now - mtime > DATASET_TTL_SECONDS:
+            _remove(name)
+        else:
+            entries.append((mtime, size, name))
+
+    entries.sort()
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in entries:
+        if total <= DATASET_DISK_MB * 1024 * 1024:
+            break
+        _remove(name)
+        total -= size
+
+
+def _busy() -> List[str]:
+    return [dataset_id for dataset_id, lock in _locks.items() if lock.locked()]
+
+
+async def load_dataset(dataset_id: str) -> Optional[DatasetState]:
+    if not _valid_id(dataset_id):
+        return None
+    with _lock:
+        state = _memory.get(dataset_id)
+        if state is not None:
+            _memory.move_to_end(dataset_id)
+            return state
+
+    stored = await asyncio.to_thread(_read_disk, dataset_id)
+    if stored is None:
+        return None
+    state, deltas = stored
+    # Appends since the snapshot are applied again, without building their responses
+    for delta in deltas:
+        state, _ = await apply_delta(state, delta, report=False)
+    _remember(state)
+    return state
+
+
+async def create_dataset(df: pd.DataFrame, start_time: float = None, timings: List[Dict] = None) -> Dict:
+    """Full analysis of df that also becomes the dataset's persistent state."""
+    state, result = await apply_delta(DatasetState(), df, start_time, timings)
+    await asyncio.to_thread(_persist, state, busy=_busy())
+    _remember(state)
+    return result
+
+
+async def append_to_dataset(
+    dataset_id: str, delta: pd.DataFrame, start_time: float = None, timings: List[Dict] = None
+) -> Optional[Dict]:
+    """Appends delta to a dataset (None if the dataset does not exist)."""
+    # Only datasets that exist get a lock
+    if not _valid_id(dataset_id) or not (dataset_id in _memory or os.path.isdir(_dataset_dir(dataset_id))):
+        return None
+    # Appends to one dataset run one at a time, each on the state the previous one left
+    async with _locks.setdefault(dataset_id, asyncio.Lock()):
+        state = await load_dataset(dataset_id)
+        if state is None:
+            # Expired or evicted since the check above
+            with _lock:
+                _locks.pop(dataset_id, None)
+            return None
+        state, result = await apply_delta(state, delta, start_time, timings)
+        await asyncio.to_thread(_persist, state, delta, _busy())
+        _remember(state)
+    return result
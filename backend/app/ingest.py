@@ -0,0 +1,235 @@
+# backend/app/ingest.py
+
+import gzip
+import io
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, TextIO
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from app.validator import REQUIRED_COLUMNS, ValidationReport, duplicate_ids, validate_chunk
+
+ALLOWED_EXTENSIONS = (".csv", ".csv.gz", ".csv.zst")
+
+# Rows parsed per chunk; only one chunk of raw strings is alive at a time
+CHUNK_ROWS = 250_000
+
+# Ceilings for a single upload (compressed bytes on disk / parsed frame in memory)
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", 512))
+MAX_INGEST_MEMORY_MB = float(os.getenv("MAX_INGEST_MEMORY_MB", 1024))
+
+ACCOUNT_COLUMNS = ["sender_id", "receiver_id"]
+
+# Everything is read as text; validation types amounts and timestamps row by row
+# so one malformed cell flags its row instead of failing the whole parse
+CSV_DTYPES = {col: str for col in REQUIRED_COLUMNS}
+
+_MAGIC = {
+    b"\x1f\x8b": "gzip",
+    b"\x28\xb5\x2f\xfd": "zstd"
+}
+
+MB = 1024 * 1024
+
+
+class IngestError(ValueError):
+    """The upload could not be parsed into a transaction frame."""
+
+
+class IngestLimitError(IngestError):
+    """The upload exceeds the configured size or memory ceiling."""
+
+
+class InvalidRowsError(IngestError):
+    """Rows failed validation and the upload was not read in drop mode."""
+
+    def __init__(self, report: ValidationReport):
+        super().__init__(
+            f"{report.invalid_rows} of {report.rows} rows are invalid; "
+            "fix them or upload with on_invalid=drop to skip them"
+        )
+        self.report = report.to_dict()
+
+
+def is_allowed_filename(filename: str) -> bool:
+    return bool(filename) and filename.lower().endswith(ALLOWED_EXTENSIONS)
+
+
+def _sniff_compression(source: BinaryIO) -> Optional[str]:
+    head = source.read(4)
+    source.seek(0)
+    for magic, method in _MAGIC.items():
+        if head.startswith(magic):
+            return method
+    return None
+
+
+@contextmanager
+def _open_text(source: BinaryIO, compression: Optional[str]) -> Iterator[TextIO]:
+    """The upload's decompressed text from the start, for a second streaming read; source stays open."""
+    source.seek(0)
+    if compression == "gzip":
+        raw = gzip.GzipFile(fileobj=source, mode="rb")
+    elif compression == "zstd":
+        import zstandard
+        raw = zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True, closefd=False)
+    else:
+        raw = source
+    text = io.TextIOWrapper(raw, encoding="utf-8", errors="replace", newline="")
+    try:
+        yield text
+    finally:
+        text.detach()
+        if raw is not source:
+            raw.close()
+        source.seek(0)
+
+
+def _source_size(source: BinaryIO) -> int:
+    source.seek(0, os.SEEK_END)
+    size = source.tell()
+    source.seek(0)
+    return size
+
+
+def _as_category(values: pd.Series) -> pd.Series:
+    # Unsorted factorize; astype("category") would sort every chunk's categories
+    codes, uniques = pd.factorize(values)
+    return pd.Series(pd.Categorical.from_codes(codes, uniques), index=values.index)
+
+
+def _without_rows(chunk: pd.DataFrame, drop: np.ndarray) -> pd.DataFrame:
+    chunk = chunk[~drop]
+    # Accounts seen only in dropped rows must not stay behind as categories
+    return chunk.assign(**{col: chunk[col].cat.remove_unused_categories() for col in ACCOUNT_COLUMNS})
+
+
+def _frame_bytes(chunk: pd.DataFrame) -> int:
+    # deep=True walks every string; extrapolate the object column from a sample
+    size = int(chunk.memory_usage(deep=False).sum())
+    sample = chunk["transaction_id"].iloc[:1000]
+    if len(sample):
+        per_row = sample.memory_usage(deep=True, index=False) - sample.memory_usage(index=False)
+        size += int(per_row * len(chunk) / len(sample))
+    return size
+
+
+def _empty_frame() -> pd.DataFrame:
+    return pd.DataFrame({
+        "transaction_id": pd.Series(dtype=object),
+        "sender_id": pd.Series(dtype="category"),
+        "receiver_id": pd.Series(dtype="category"),
+        "amount": pd.Series(dtype="float64"),
+        "timestamp": pd.Series(dtype="datetime64[ns]")
+    })
+
+
+def read_transactions(
+    source: BinaryIO,
+    chunk_rows: int = CHUNK_ROWS,
+    max_upload_mb: float = MAX_UPLOAD_MB,
+    max_memory_mb: float = MAX_INGEST_MEMORY_MB,
+    report: ValidationReport = None
+) -> pd.DataFrame:
+    """
+    Parses a (optionally gzip/zstd-compressed) transaction CSV in chunks
+    with an explicit schema. Account IDs come back as categoricals sharing
+    one category set; extra columns are dropped.
+
+    Every row is validated (see validator.validate_chunk) into report.
+    Invalid rows raise InvalidRowsError in the report's "reject" mode and
+    are left out in "drop" mode.
+    """
+    report = report or ValidationReport()
+
+    # 1. Size ceiling on the raw upload
+    size = _source_size(source)
+    if size > max_upload_mb * MB:
+        raise IngestLimitError(f"Upload is {size / MB:.0f} MB; the limit is {max_upload_mb:g} MB")
+
+    compression = _sniff_compression(source)
+
+    try:
+        # 2. Header check before parsing any rows
+        columns = pd.read_csv(source, nrows=0, compression=compression).columns
+        missing = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing:
+            raise IngestError(f"Missing column{'s' if len(missing) > 1 else ''}: {', '.join(missing)}")
+        source.seek(0)
+
+        # 3. Chunked parse, bounded by the memory ceiling
+        reader = pd.read_csv(
+            source,
+            compression=compression,
+            usecols=REQUIRED_COLUMNS,
+            dtype=CSV_DTYPES,
+            chunksize=chunk_rows
+        )
+        chunks = []
+        used = 0
+        for chunk in reader:
+            # 4. Bulk row checks and typing; the index keeps each row's position in the file
+            chunk = validate_chunk(chunk, report)
+            for col in ACCOUNT_COLUMNS:
+                chunk[col] = _as_category(chunk[col])
+
+            used += _frame_bytes(chunk)
+            if used > max_memory_mb * MB:
+                raise IngestLimitError(
+                    f"Parsed transactions exceed the {max_memory_mb:g} MB ingestion memory limit"
+                )
+            chunks.append(chunk[REQUIRED_COLUMNS])
+    except IngestError:
+        raise
+    except ImportError as e:
+        raise IngestError(f"Compressed upload not supported: {str(e)}")
+    except Exception as e:
+        raise IngestError(f"Invalid CSV: {str(e)}")
+
+    # 5. Duplicate transaction IDs can sit in different chunks
+    if chunks:
+        duplicated = duplicate_ids(pd.concat([chunk["transaction_id"] for chunk in chunks]), report)
+        if duplicated.any():
+            bounds = np.cumsum([len(chunk) for chunk in chunks])[:-1]
+            chunks = [_without_rows(chunk, drop) for chunk, drop in zip(chunks, np.split(duplicated, bounds))]
+
+    # 6. The listed failures get their real file lines (records can span lines)
+    if not report.ok:
+        with _open_text(source, compression) as text:
+            report.locate_lines(text)
+        if report.mode == "reject":
+            raise InvalidRowsError(report)
+
+    return concat_transactions(chunks)
+
+
+def concat_transactions(frames) -> pd.DataFrame:
+    """
+    Concatenates transaction frames, keeping sender / receiver IDs as
+    categoricals over one shared category set.
+    """
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return _empty_frame()
+
+    accounts = union_categoricals(
+        [pd.Categorical(frame[col]) for col in ACCOUNT_COLUMNS for frame in frames]
+    )
+    # Concatenating mismatched categoricals would decode them to objects
+    df = pd.concat([frame.drop(columns=ACCOUNT_COLUMNS) for frame in frames], ignore_index=True)
+    n = len(df)
+    df["sender_id"] = accounts[:n]
+    df["receiver_id"] = accounts[n:]
+    # Chunks typed differently (naive / tz-aware / other resolution) concatenate to objects
+    if df["timestamp"].dtype != "datetime64[ns]":
+        df["timestamp"] = _naive_timestamps(df["timestamp"])
+
+    return df[REQUIRED_COLUMNS]
+
+
+def _naive_timestamps(values: pd.Series) -> pd.Series:
+    """Timestamps as naive UTC datetime64[ns]; aware values are converted first."""
+    return pd.to_datetime(values, errors="coerce", utc=True).dt.tz_localize(None).astype("datetime64[ns]")
@@ -0,0 +1,192 @@
+# backend/app/jobs.py
+
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import AsyncIterator, Dict, Optional
+
+import pandas as pd
+
+from app.pipeline import STAGES, StageError
+from app.result_cache import analyze_and_cache, with_cache_status
+
+# Analyses running at once; further jobs wait in the queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 16))
+# How long finished jobs (and their results) are kept
+JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", 3600))
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+_jobs: Dict[str, "Job"] = {}
+_slots = None
+
+
+class JobQueueFull(Exception):
+    """Too many jobs are already queued or running."""
+
+
+class Job:
+    """One submitted analysis: status, stage events and the final result."""
+
+    def __init__(self, key: str, validation: Dict = None):
+        self.id = uuid.uuid4().hex
+        # Result cache key of the upload, which is also the analysis ID of the result
+        self.key = key
+        self.status = QUEUED
+        self.stage = None
+        self.completed_stages = 0
+        self.events = []
+        self.result = None
+        # Report on the rows dropped at upload, added to the result summary
+        self.validation = validation
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.task = None
+        self._wake = asyncio.Event()
+
+    def publish(self, event: str, data: Dict):
+        self.events.append((event, data))
+        # Wake every subscriber waiting on the current event, then arm a fresh one
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    def on_stage(self, stage: str, state: str):
+        if state == "started":
+            self.stage = stage
+        elif state == "completed":
+            self.completed_stages += 1
+        self.publish("stage", {
+            "stage": stage,
+            "state": state,
+            "completed_stages": self.completed_stages,
+            "total_stages": len(STAGES),
+            "elapsed_seconds": round(time.time() - (self.started_at or self.created_at), 3)
+        })
+
+    def to_status(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "completed_stages": self.completed_stages,
+            "total_stages": len(STAGES),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(max(JOB_WORKERS, 1))
+    return _slots
+
+
+def _purge_expired():
+    now = time.time()
+    expired = [
+        job_id for job_id, job in _jobs.items()
+        if job.status in FINISHED and now - job.finished_at > JOB_RESULT_TTL_SECONDS
+    ]
+    for job_id in expired:
+        del _jobs[job_id]
+
+
+async def _run_job(job: Job, df: Optional[pd.DataFrame], cached: Optional[Dict] = None):
+    try:
+        if cached is not None:
+            # Same upload and parameters as a cached analysis: nothing to run
+            job.started_at = time.time()
+            job.result = with_cache_status(cached, job.key, hit=True)
+        else:
+            async with _get_slots():
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.publish("status", job.to_status())
+                job.result = await analyze_and_cache(df, job.key, job.validation, job.started_at, progress=job.on_stage)
+        job.status = COMPLETED
+    except asyncio.CancelledError:
+        job.status = CANCELLED
+    except StageError as e:
+        job.status = FAILED
+        job.error = str(e)
+    except Exception as e:
+        job.status = FAILED
+        job.error = f"{type(e).__name__}: {e}"
+    finally:
+        job.finished_at = time.time()
+        job.publish("end", job.to_status())
+
+
+def submit_job(df: Optional[pd.DataFrame], key: str, validation: Dict = None, cached: Dict = None) -> Job:
+    """
+    Queues the analysis of df under its result cache key. With cached (the
+    result already stored under key), df may be None and the job completes
+    right away.
+    """
+    _purge_expired()
+
+    pending = sum(1 for job in _jobs.values() if job.status not in FINISHED)
+    if pending >= JOB_WORKERS + JOB_QUEUE_SIZE:
+        raise JobQueueFull(f"{pending} analysis jobs are already queued or running")
+
+    job = Job(key, validation)
+    _jobs[job.id] = job
+    job.task = asyncio.create_task(_run_job(job, df, cached))
+    job.task.add_done_callback(lambda task: _finish_unstarted(job))
+    return job
+
+
+def _finish_unstarted(job: Job):
+    # A task cancelled before its first step never runs _run_job's cleanup
+    if job.status not in FINISHED:
+        job.status = CANCELLED
+        job.finished_at = time.time()
+        job.publish("end", job.to_status())
+
+
+def get_job(job_id: str) -> Optional[Job]:
+    _purge_expired()
+    return _jobs.get(job_id)
+
+
+async def cancel_job(job: Job) -> Job:
+    # Work already handed to a pool process finishes there; its result is dropped
+    if job.status not in FINISHED and job.task is not None:
+        job.task.cancel()
+        await asyncio.wait([job.task])
+    return job
+
+
+def shutdown_jobs():
+    for job in _jobs.values():
+        if job.task is not None:
+            job.task.cancel()
+
+
+async def sse_events(job: Job) -> AsyncIterator[str]:
+    """Replays the job's events, then follows it live until it finishes (SSE framing)."""
+    sent = 0
+    while True:
+        wake = job._wake
+        while sent < len(job.events):
+            event, data = job.events[sent]
+            sent += 1
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            if event == "end":
+                return
+        if job.status in FINISHED:
+            return
+        await wake.wait()
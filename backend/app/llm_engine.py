@@ -0,0 +1,305 @@
+# backend/app/llm_engine.py
+
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.metrics import record_groq
+from app.schemas import ChatRequest, SummarizeRequest
+
+GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_API_URL = os.getenv("GROQ_API_URL", "https://api.groq.com/openai/v1/chat/completions")
+GROQ_MODEL   = os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile")
+GROQ_TIMEOUT_SECONDS = float(os.getenv("GROQ_TIMEOUT_SECONDS", 60))
+
+# Pooled keep-alive connections shared by every request
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", 20))
+GROQ_KEEPALIVE_SECONDS = float(os.getenv("GROQ_KEEPALIVE_SECONDS", 60))
+# Upstream calls in flight at once; further calls wait in a bounded queue
+GROQ_CONCURRENCY = int(os.getenv("GROQ_CONCURRENCY", 8))
+GROQ_QUEUE_SIZE = int(os.getenv("GROQ_QUEUE_SIZE", 32))
+
+SUMMARY_CACHE_ENTRIES = int(os.getenv("SUMMARY_CACHE_ENTRIES", 128))
+
+SUMMARY_SYSTEM_PROMPT = "You are a senior AML Compliance Architect. Provide a sophisticated, professional summary of the fraud analysis 'study' provided. Synthesize the findings into 4-5 high-impact bullet points (-). Do not use headings or introductory filler. Focus on network risk, laundering complexity, and immediate compliance priority. Keep it under 120 words."
+
+ERROR_LABELS = {"summarize": "Groq API error", "chat": "Groq Chat API error"}
+
+_client: Optional[httpx.AsyncClient] = None
+_slots = None
+_waiting = 0
+_summaries: "OrderedDict[str, str]" = OrderedDict()
+
+
+class LLMError(Exception):
+    """An upstream LLM call failed; carries the HTTP status to answer with."""
+
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+        super().__init__(detail)
+
+
+# -------------------------
+# SHARED CLIENT
+# -------------------------
+def get_client() -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(GROQ_TIMEOUT_SECONDS, connect=10.0),
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_CONNECTIONS,
+                keepalive_expiry=GROQ_KEEPALIVE_SECONDS
+            )
+        )
+    return _client
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(max(GROQ_CONCURRENCY, 1))
+    return _slots
+
+
+@asynccontextmanager
+async def _upstream_slot():
+    global _waiting
+    slots = _get_slots()
+    if slots.locked() and _waiting >= GROQ_QUEUE_SIZE:
+        raise LLMError(429, "Too many AI requests are waiting; try again shortly")
+
+    _waiting += 1
+    try:
+        await slots.acquire()
+    finally:
+        _waiting -= 1
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+def _headers() -> Dict[str, str]:
+    return {"Authorization": f"Bearer {GROQ_API_KEY}"}
+
+
+# -------------------------
+# UPSTREAM CALLS
+# -------------------------
+async def complete(endpoint: str, payload: Dict) -> str:
+    """One chat completion; returns the message content."""
+    async with _upstream_slot():
+        started = time.perf_counter()
+        outcome = "unreachable"
+        try:
+            response = await get_client().post(GROQ_API_URL, json=payload, headers=_headers())
+            outcome = "ok" if response.status_code == 200 else "error"
+        except httpx.RequestError as e:
+            raise LLMError(503, f"Could not reach Groq: {str(e)}")
+        finally:
+            record_groq(endpoint, outcome, time.perf_counter() - started)
+
+    if response.status_code != 200:
+        raise LLMError(502, f"{ERROR_LABELS[endpoint]}: {response.text}")
+    return response.json()["choices"][0]["message"]["content"]
+
+
+async def open_stream(endpoint: str, payload: Dict) -> AsyncIterator[str]:
+    """
+    Starts a streaming completion and returns an iterator over its content
+    tokens. Connection and status errors are raised here, before any token
+    is sent, so callers can still answer with a plain HTTP error.
+    """
+    tokens = _stream_tokens(endpoint, payload)
+    # Runs the stream up to the upstream's answer; a failure there ends (and cleans up) the generator
+    await anext(tokens)
+    return tokens
+
+
+async def _stream_tokens(endpoint: str, payload: Dict):
+    """
+    Yields None once the upstream has answered 200, then the content
+    tokens. The upstream slot is taken inside the body, so closing the
+    generator at any point (or never iterating it) always releases it.
+    """
+    async with _upstream_slot():
+        started = time.perf_counter()
+        outcome = "unreachable"
+        try:
+            async with get_client().stream(
+                "POST", GROQ_API_URL, json={**payload, "stream": True}, headers=_headers()
+            ) as response:
+                if response.status_code != 200:
+                    outcome = "error"
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise LLMError(502, f"{ERROR_LABELS[endpoint]}: {body}")
+                yield None
+
+                # Upstream speaks OpenAI-style SSE: "data: {chunk}" lines, then "data: [DONE]"
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    token = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if token:
+                        yield token
+                outcome = "ok"
+        except httpx.HTTPError as e:
+            raise LLMError(503, f"Could not reach Groq: {str(e)}")
+        finally:
+            record_groq(endpoint, outcome, time.perf_counter() - started)
+
+
+async def _replay(text: str):
+    yield text
+
+
+# -------------------------
+# PROMPTS
+# -------------------------
+def summary_payload(req: SummarizeRequest) -> Dict:
+    prompt = f"""
+As a senior AML compliance officer, review this study of transaction data:
+- Dataset: {req.total_accounts} accounts analyzed.
+- Findings: {req.fraud_rings} fraud rings discovered, {req.suspicious_accounts} accounts flagged as high-risk.
+- Intelligence: Avg Risk {req.avg_risk_score}/100.
+- Critical Hubs: {req.graph_hubs or 'None detected'}.
+- Pattern Evidence: {req.rings_detail}.
+- Behavioral Context: {req.top_flagged_reasons}.
+
+Provide a high-level expert summary of this study. Focus on the structural integrity of the network and the severity of the found patterns (cycles, shells, smurfing).
+    """.strip()
+
+    return {
+        "model": GROQ_MODEL,
+        "messages": [
+            {"role": "system", "content": SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": 0.4,
+        "max_tokens": 500
+    }
+
+
+def chat_payload(req: ChatRequest) -> Dict:
+    # Construct a system message that includes the analysis context
+    context_str = f"""
+    You are an expert AML Compliance Assistant. You are analyzing a specific transaction study.
+    Study Context:
+    - Accounts: {req.context.get('total_accounts', 'Unknown')}
+    - Fraud Rings: {req.context.get('fraud_rings', 'Unknown')}
+    - Avg Risk Score: {req.context.get('avg_risk_score', 'Unknown')}
+    - Top Flagged: {req.context.get('top_flagged_reasons', 'None')}
+    - Key Hubs: {req.context.get('graph_hubs', 'None')}
+    
+    Answer the user's questions strictly based on this context and AML best practices. 
+    Be professional, concise, and helpful.
+    """
+
+    messages: List[Dict] = [{"role": "system", "content": context_str.strip()}]
+    for msg in req.messages:
+        messages.append({"role": msg.role, "content": msg.content})
+
+    return {
+        "model": GROQ_MODEL,
+        "messages": messages,
+        "temperature": 0.5,
+        "max_tokens": 600
+    }
+
+
+# -------------------------
+# SUMMARIES (LRU-cached) + CHAT
+# -------------------------
+def _summary_key(req: SummarizeRequest) -> str:
+    return json.dumps([GROQ_MODEL, req.model_dump()], sort_keys=True)
+
+
+def _remember_summary(key: str, text: str):
+    _summaries[key] = text
+    _summaries.move_to_end(key)
+    while len(_summaries) > SUMMARY_CACHE_ENTRIES:
+        _summaries.popitem(last=False)
+
+
+def cached_summary(req: SummarizeRequest) -> Optional[str]:
+    key = _summary_key(req)
+    text = _summaries.get(key)
+    if text is not None:
+        _summaries.move_to_end(key)
+    return text
+
+
+async def summarize(req: SummarizeRequest) -> str:
+    text = cached_summary(req)
+    if text is None:
+        text = await complete("summarize", summary_payload(req))
+        _remember_summary(_summary_key(req), text)
+    return text
+
+
+async def stream_summary(req: SummarizeRequest) -> AsyncIterator[str]:
+    """Summary tokens as they arrive; a cached summary is replayed as one token."""
+    text = cached_summary(req)
+    if text is not None:
+        return _replay(text)
+
+    tokens = await open_stream("summarize", summary_payload(req))
+
+    async def remember():
+        parts = []
+        try:
+            async for token in tokens:
+                parts.append(token)
+                yield token
+        finally:
+            await tokens.aclose()
+        # Only complete summaries are cached
+        _remember_summary(_summary_key(req), "".join(parts))
+
+    return remember()
+
+
+async def chat(req: ChatRequest) -> str:
+    return await complete("chat", chat_payload(req))
+
+
+async def stream_chat(req: ChatRequest) -> AsyncIterator[str]:
+    return await open_stream("chat", chat_payload(req))
+
+
+async def sse_tokens(tokens: AsyncIterator[str], final_field: str) -> AsyncIterator[str]:
+    """
+    SSE framing for a token stream: "token" events, then one "end" event
+    carrying the full text under final_field (or an "error" event).
+    """
+    parts = []
+    try:
+        async for token in tokens:
+            parts.append(token)
+            yield f"event: token\ndata: {json.dumps({'content': token})}\n\n"
+    except LLMError as e:
+        yield f"event: error\ndata: {json.dumps({'detail': e.detail})}\n\n"
+        return
+    finally:
+        # Stopping early (e.g. the client went away) frees the upstream slot right away
+        await tokens.aclose()
+    yield f"event: end\ndata: {json.dumps({final_field: ''.join(parts)})}\n\n"
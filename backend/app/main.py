@@ -1,24 +1,51 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import pandas as pd
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from typing import TYPE_CHECKING, Literal, Optional, Tuple
 import time
-import httpx
-import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Modular production-grade engines
-from app.graph_engine import build_graph, analyze_graph_intelligence
-from app.cycle_detector import detect_cycles
-from app.smurf_detector import detect_smurfing
-from app.shell_detector import detect_shell_networks
-from app.anomaly_engine import detect_anomalies
-from app.risk_engine import calculate_final_scores
-from app.explanation_engine import batch_explain
+# Only light modules load at startup so /chat can answer right away.
+# The analysis engines (pandas, networkx, scikit-learn, ...) are imported
+# inside the endpoints that use them, or preloaded by app.warmup.
+from app.llm_engine import (
+    LLMError, chat as llm_chat, close_client, get_client, sse_tokens, stream_chat, stream_summary,
+    summarize as llm_summarize
+)
+from app.metrics import record_request, render as render_metrics
+from app.schemas import ChatRequest, RescoreRequest, SummarizeRequest
+from app.warmup import WARMUP, loaded, warm_up
+
+if TYPE_CHECKING:
+    import pandas as pd
+    from app.jobs import Job
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled keep-alive client for every upstream LLM call
+    get_client()
+    warming = asyncio.create_task(warm_up()) if WARMUP else None
+    yield
+    if warming is not None:
+        warming.cancel()
 
-app = FastAPI()
+    # Only stop what was started
+    jobs, pipeline = loaded("app.jobs"), loaded("app.pipeline")
+    if jobs is not None:
+        jobs.shutdown_jobs()
+    if pipeline is not None:
+        pipeline.shutdown_executor()
+    await close_client()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,195 +55,423 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def count_requests(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route templates (not raw paths) keep the label set bounded
+    route = request.scope.get("route")
+    record_request(
+        request.method, route.path if route is not None else "unmatched", response.status_code,
+        time.perf_counter() - started
+    )
+    return response
+
+
+def check_filename(file: UploadFile):
+    from app.ingest import is_allowed_filename
+
+    if not is_allowed_filename(file.filename):
+        raise HTTPException(status_code=400, detail="Only CSV files allowed (.csv, .csv.gz, .csv.zst)")
+
+
+# Per-request override of INVALID_ROWS: reject uploads with invalid rows, or drop those rows
+InvalidRows = Optional[Literal["reject", "drop"]]
+
+
+async def read_upload(file: UploadFile, on_invalid: InvalidRows = None) -> Tuple["pd.DataFrame", Optional[dict]]:
+    """The parsed transactions, plus the validation report when invalid rows are dropped."""
+    from app.ingest import IngestError, IngestLimitError, InvalidRowsError, read_transactions
+    from app.validator import ValidationReport
+
+    check_filename(file)
+    report = ValidationReport(on_invalid)
+
+    # Starlette has already spooled the upload to disk; parse it in chunks off the event loop
+    try:
+        df = await run_in_threadpool(read_transactions, file.file, report=report)
+    except IngestLimitError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except InvalidRowsError as e:
+        raise HTTPException(status_code=400, detail={"message": str(e), **e.report})
+    except IngestError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return df, (report.to_dict() if report.mode == "drop" else None)
+
+
+def check_format(fmt: str, encoding: str, detail: str, hops: int, paged: bool = False):
+    from app.response_format import FormatError, check_options
+
+    try:
+        check_options(fmt, encoding, detail, hops, paged=paged)
+    except FormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def check_key(key: str):
+    if not re.fullmatch(r"[0-9a-f]{64}", key):
+        raise HTTPException(status_code=400, detail="Invalid cache key")
+
+
+async def encoded_response(
+    payload: dict, encoding: str, headers: dict = None, encoder=None, accept_encoding: Optional[str] = None
+) -> Response:
+    from app.response_format import FormatError, accepted_compression, compress, encode
+
+    encoder = encoder or encode
+    headers = dict(headers or {})
+    # msgpack is compressed (zstd, else gzip) when the client accepts it; arrow is compressed internally
+    coding = accepted_compression(accept_encoding) if encoding == "msgpack" else None
+
+    def run():
+        body, media_type = encoder(payload, encoding)
+        return (compress(body, coding) if coding else body), media_type
+
+    # Large payloads take a while to serialize; keep that off the event loop
+    try:
+        body, media_type = await run_in_threadpool(run)
+    except FormatError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if encoding == "msgpack":
+        headers["Vary"] = "Accept-Encoding"
+    if coding:
+        headers["Content-Encoding"] = coding
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def find_job(job_id: str) -> "Job":
+    from app.jobs import get_job
+
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired job: {job_id}")
+    return job
+
+
+def with_timings(result: dict, timings: list, start_time: float) -> dict:
+    return {**result, "timings": {"total_seconds": round(time.time() - start_time, 3), "stages": timings}}
+
+
 @app.post("/analyze")
-async def analyze(file: UploadFile = File(...)):
+async def analyze(
+    file: UploadFile = File(...),
+    timings: bool = False,
+    fmt: str = Query("records", alias="format"),
+    encoding: str = "json",
+    detail: str = "full",
+    hops: int = 1,
+    edge_limit: Optional[int] = Query(None, ge=1),
+    on_invalid: InvalidRows = None,
+    accept_encoding: Optional[str] = Header(None)
+):
+    from app.pipeline import StageError
+    from app.response_format import shape_result
+    from app.result_cache import analyze_and_cache, cache_key, get_cached, with_cache_status
+
     start_time = time.time()
+    check_filename(file)
+    check_format(fmt, encoding, detail, hops)
+
+    # Same bytes + same detector parameters (and invalid-row mode) -> same result
+    key = await run_in_threadpool(cache_key, file.file, on_invalid)
+    cached = await run_in_threadpool(get_cached, key)
+    stage_timings = []
+    if cached is not None:
+        result = with_cache_status(cached, key, hit=True)
+    else:
+        df, validation = await read_upload(file, on_invalid)
 
-    if not file.filename.endswith(".csv"):
-        raise HTTPException(status_code=400, detail="Only CSV files allowed")
+        # CPU-bound stages run in the process pool so the event loop stays free.
+        # The score components are kept under the same key for /rescore
+        try:
+            result = await analyze_and_cache(df, key, validation, start_time, timings=stage_timings)
+        except StageError as e:
+            raise HTTPException(status_code=500, detail=str(e))
 
+    if timings:
+        result = with_timings(result, stage_timings, start_time)
+
+    # The cache key doubles as the analysis ID for the paginated endpoints
+    result = await run_in_threadpool(shape_result, result, key, fmt, detail, hops, edge_limit)
+    return await encoded_response(
+        result, encoding, headers={"X-Cache": "HIT" if cached is not None else "MISS"}, accept_encoding=accept_encoding
+    )
+
+
+@app.post("/rescore")
+async def rescore_analysis(
+    req: RescoreRequest,
+    fmt: str = Query("records", alias="format"),
+    encoding: str = "json",
+    detail: str = "full",
+    hops: int = 1,
+    edge_limit: Optional[int] = Query(None, ge=1),
+    accept_encoding: Optional[str] = Header(None)
+):
+    from app.rescore import RescoreError, rescore, scoring_parameters
+    from app.response_format import shape_result
+    from app.result_cache import get_cached, with_cache_status
+    from app.score_artifacts import load_artifacts
+
+    check_key(req.analysis_id)
+    check_format(fmt, encoding, detail, hops)
     try:
-        df = pd.read_csv(file.file)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Invalid CSV: {str(e)}")
-
-    required_columns = ["transaction_id", "sender_id", "receiver_id", "amount", "timestamp"]
-    for col in required_columns:
-        if col not in df.columns:
-            raise HTTPException(status_code=400, detail=f"Missing column: {col}")
-
-    df["timestamp"] = pd.to_datetime(df["timestamp"])
-
-    # 1. GRAPH FOUNDATION
-    G = build_graph(df)
-    
-    # 2. ADVANCED GRAPH INTELLIGENCE
-    graph_intel = analyze_graph_intelligence(G)
-    
-    # 3. PATTERN DETECTION
-    cycle_rings = detect_cycles(G)
-    smurf_rings = detect_smurfing(df)
-    shell_rings = detect_shell_networks(G, df)
-    all_rings = cycle_rings + smurf_rings + shell_rings
-    
-    # 4. ML ANOMALY DETECTION
-    anomaly_results = detect_anomalies(df, G)
-    
-    # 5. RISK CALIBRATION (WEIGHTED MODEL)
-    accounts = list(G.nodes())
-    risk_results = calculate_final_scores(accounts, graph_intel, anomaly_results, all_rings, df)
-    
-    # 6. EXPLANATION ENGINE
-    account_patterns = {}
-    for ring in all_rings:
-        for acc in ring["member_accounts"]:
-            if acc not in account_patterns: account_patterns[acc] = []
-            account_patterns[acc].append(ring["pattern_type"])
-            
-    explanations = batch_explain(risk_results, account_patterns, graph_intel)
-    
-    # 7. RESPONSE FORMATTING
-    suspicious_accounts = []
-    for acc, data in risk_results.items():
-        if data["score"] > 25: # Filtering threshold for 'suspicious' tag
-            suspicious_accounts.append({
-                "account_id": acc,
-                "suspicion_score": data["score"],
-                "confidence": data["confidence"],
-                "detected_patterns": account_patterns.get(acc, ["anomaly"]),
-                "risk_breakdown": data["breakdown"]
-            })
-            
-    suspicious_accounts.sort(key=lambda x: x["suspicion_score"], reverse=True)
-    
-    processing_time = round(time.time() - start_time, 3)
-
-    return {
-        "suspicious_accounts": suspicious_accounts,
-        "fraud_rings": all_rings,
-        "graph_clusters": [
-            {"cluster_id": cid, "members": [node for node, c in graph_intel["communities"].items() if c == cid]}
-            for cid in set(graph_intel["communities"].values())
-        ],
-        "anomaly_scores": [
-            {"account_id": acc, "score": round(float(score), 3)}
-            for acc, score in anomaly_results["anomaly_score"].items() if score > 0.5
-        ],
-        "explanations": [
-            {"account_id": acc, "text": text} for acc, text in explanations.items()
-        ],
-        "graph": {
-            "nodes": [{"id": node, "community": graph_intel["communities"].get(node)} for node in G.nodes()],
-            "edges": [{"source": u, "target": v, "amount": d["amount"]} for u, v, d in G.edges(data=True)]
-        },
-        "summary": {
-            "total_accounts_analyzed": len(G.nodes()),
-            "suspicious_accounts_flagged": len(suspicious_accounts),
-            "fraud_rings_detected": len(all_rings),
-            "avg_risk_score": round(sum(acc["suspicion_score"] for acc in suspicious_accounts) / len(suspicious_accounts), 2) if suspicious_accounts else 0,
-            "processing_time_seconds": processing_time
-        }
-    }
+        parameters = scoring_parameters(
+            req.weights, req.suspicious_threshold, req.explain_threshold, req.anomaly_threshold
+        )
+    except RescoreError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    result = await run_in_threadpool(get_cached, req.analysis_id)
+    artifacts = await run_in_threadpool(load_artifacts, req.analysis_id) if result is not None else None
+    if artifacts is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired analysis: {req.analysis_id}")
+
+    # Only the scoring and report sections are recomputed; nothing is re-detected
+    result = await run_in_threadpool(rescore, with_cache_status(result, req.analysis_id, hit=True), artifacts, parameters)
+    result = await run_in_threadpool(shape_result, result, req.analysis_id, fmt, detail, hops, edge_limit)
+    return await encoded_response(result, encoding, accept_encoding=accept_encoding)
+
+
+@app.get("/analyses/{analysis_id}/{table}")
+async def analysis_table(
+    analysis_id: str,
+    table: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(10_000, ge=1),
+    fmt: str = Query("records", alias="format"),
+    encoding: str = "json",
+    detail: str = "full",
+    hops: int = 1,
+    accept_encoding: Optional[str] = Header(None)
+):
+    from app.response_format import TABLES, encode_page, page
+    from app.result_cache import get_cached
+
+    check_key(analysis_id)
+    check_format(fmt, encoding, detail, hops, paged=True)
+    if table not in TABLES:
+        raise HTTPException(status_code=404, detail=f"Unknown table: {table} (expected one of {', '.join(TABLES)})")
+
+    result = await run_in_threadpool(get_cached, analysis_id)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown or expired analysis: {analysis_id}")
+
+    payload = await run_in_threadpool(page, result, analysis_id, table, offset, limit, fmt, detail, hops)
+    return await encoded_response(
+        payload, encoding, headers={"X-Total-Count": str(payload["total"])}, encoder=encode_page,
+        accept_encoding=accept_encoding
+    )
+
+
+async def query_analysis(analysis_id: str, missing: str, query: str, *args) -> dict:
+    """Runs one AnalysisStore query against a stored analysis; 404 when it or the queried item is missing."""
+    from app.analysis_store import StoreQueryError, open_analysis
+
+    check_key(analysis_id)
+
+    def run():
+        store = open_analysis(analysis_id)
+        if store is None:
+            raise HTTPException(status_code=404, detail=f"Unknown or expired analysis: {analysis_id}")
+        with store:
+            return getattr(store, query)(*args)
+
+    try:
+        payload = await run_in_threadpool(run)
+    except StoreQueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if payload is None:
+        raise HTTPException(status_code=404, detail=missing)
+    return payload
+
+
+@app.get("/analyses/{analysis_id}/accounts/{account_id}")
+async def analysis_account(
+    analysis_id: str,
+    account_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1),
+    encoding: str = "json",
+    accept_encoding: Optional[str] = Header(None)
+):
+    payload = await query_analysis(analysis_id, f"Unknown account: {account_id}", "account", account_id, offset, limit)
+    return await encoded_response(payload, encoding, accept_encoding=accept_encoding)
+
+
+@app.get("/analyses/{analysis_id}/accounts/{account_id}/ego")
+async def analysis_ego_network(
+    analysis_id: str,
+    account_id: str,
+    depth: int = 1,
+    edge_limit: int = Query(1000, ge=1),
+    encoding: str = "json",
+    accept_encoding: Optional[str] = Header(None)
+):
+    payload = await query_analysis(
+        analysis_id, f"Unknown account: {account_id}", "ego_network", account_id, depth, edge_limit
+    )
+    return await encoded_response(payload, encoding, accept_encoding=accept_encoding)
+
+
+@app.get("/analyses/{analysis_id}/rings/{ring_id}")
+async def analysis_ring(
+    analysis_id: str, ring_id: str, encoding: str = "json", accept_encoding: Optional[str] = Header(None)
+):
+    payload = await query_analysis(analysis_id, f"Unknown ring: {ring_id}", "ring", ring_id)
+    return await encoded_response(payload, encoding, accept_encoding=accept_encoding)
+
+
+@app.get("/analyses/{analysis_id}/communities/{community_id}")
+async def analysis_community(
+    analysis_id: str,
+    community_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1),
+    encoding: str = "json",
+    accept_encoding: Optional[str] = Header(None)
+):
+    payload = await query_analysis(
+        analysis_id, f"Unknown community: {community_id}", "community", community_id, offset, limit
+    )
+    return await encoded_response(payload, encoding, accept_encoding=accept_encoding)
+
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.delete("/cache")
+async def clear_cache():
+    from app.result_cache import invalidate
+
+    return {"removed": await run_in_threadpool(invalidate)}
+
+
+@app.delete("/cache/{key}")
+async def invalidate_cache(key: str):
+    from app.result_cache import invalidate
+
+    check_key(key)
+    return {"removed": await run_in_threadpool(invalidate, key)}
+
+# ── Incremental Datasets ──
+
+@app.post("/datasets", status_code=201)
+async def create_dataset_endpoint(file: UploadFile = File(...), on_invalid: InvalidRows = None):
+    from app.incremental import create_dataset
+    from app.pipeline import StageError
+    from app.validator import with_validation
+
+    start_time = time.time()
+    df, validation = await read_upload(file, on_invalid)
+    # Same staged pipeline and process pool as /analyze
+    try:
+        result = await create_dataset(df, start_time)
+    except StageError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return with_validation(result, validation)
+
+
+@app.post("/datasets/{dataset_id}/append")
+async def append_dataset(dataset_id: str, file: UploadFile = File(...), on_invalid: InvalidRows = None):
+    from app.incremental import append_to_dataset
+    from app.pipeline import StageError
+    from app.validator import with_validation
+
+    start_time = time.time()
+    delta, validation = await read_upload(file, on_invalid)
+    try:
+        result = await append_to_dataset(dataset_id, delta, start_time)
+    except StageError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Unknown dataset: {dataset_id}")
+    return with_validation(result, validation)
+
+# ── Analysis Jobs ──
+
+@app.post("/jobs", status_code=202)
+async def create_job(file: UploadFile = File(...), on_invalid: InvalidRows = None):
+    from app.jobs import JobQueueFull, submit_job
+    from app.result_cache import cache_key, get_cached
+
+    check_filename(file)
+    # Keyed like /analyze: a cached upload completes at once, and every job result is rescorable
+    key = await run_in_threadpool(cache_key, file.file, on_invalid)
+    cached = await run_in_threadpool(get_cached, key)
+    df, validation = (None, None) if cached is not None else await read_upload(file, on_invalid)
+
+    try:
+        job = submit_job(df, key, validation, cached=cached)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return job.to_status()
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return find_job(job_id).to_status()
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    from app.jobs import sse_events
+
+    job = find_job(job_id)
+    return sse_response(sse_events(job))
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    from app.jobs import COMPLETED, FAILED
+
+    job = find_job(job_id)
+    if job.status == COMPLETED:
+        return job.result
+    if job.status == FAILED:
+        raise HTTPException(status_code=500, detail=job.error)
+    raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+
+@app.delete("/jobs/{job_id}")
+async def delete_job(job_id: str):
+    from app.jobs import cancel_job
+
+    job = await cancel_job(find_job(job_id))
+    return job.to_status()
 
 # ── Groq AI Summary ──
 
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
-GROQ_MODEL   = "llama-3.3-70b-versatile"
+def llm_error(e: LLMError) -> HTTPException:
+    return HTTPException(status_code=e.status_code, detail=e.detail)
 
-class SummarizeRequest(BaseModel):
-    total_accounts: int = 0
-    fraud_rings: int = 0
-    suspicious_accounts: int = 0
-    avg_risk_score: float = 0.0
-    processing_time: float = 0.0
-    rings_detail: str = ""
-    top_flagged_reasons: str = ""
-    graph_hubs: str = ""
 
-class ChatMessage(BaseModel):
-    role: str
-    content: str
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-class ChatRequest(BaseModel):
-    messages: list[ChatMessage]
-    context: dict
 
 @app.post("/summarize")
-async def summarize(req: SummarizeRequest):
-    prompt = f"""
-As a senior AML compliance officer, review this study of transaction data:
-- Dataset: {req.total_accounts} accounts analyzed.
-- Findings: {req.fraud_rings} fraud rings discovered, {req.suspicious_accounts} accounts flagged as high-risk.
-- Intelligence: Avg Risk {req.avg_risk_score}/100.
-- Critical Hubs: {req.graph_hubs or 'None detected'}.
-- Pattern Evidence: {req.rings_detail}.
-- Behavioral Context: {req.top_flagged_reasons}.
-
-Provide a high-level expert summary of this study. Focus on the structural integrity of the network and the severity of the found patterns (cycles, shells, smurfing).
-    """.strip()
-
-    payload = {
-        "model": GROQ_MODEL,
-        "messages": [
-            {
-                "role": "system", 
-                "content": "You are a senior AML Compliance Architect. Provide a sophisticated, professional summary of the fraud analysis 'study' provided. Synthesize the findings into 4-5 high-impact bullet points (-). Do not use headings or introductory filler. Focus on network risk, laundering complexity, and immediate compliance priority. Keep it under 120 words."
-            },
-            {"role": "user", "content": prompt}
-        ],
-        "temperature": 0.4,
-        "max_tokens": 500
-    }
-
+async def summarize(req: SummarizeRequest, stream: bool = False):
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(GROQ_API_URL, json=payload, headers={"Authorization": f"Bearer {GROQ_API_KEY}"})
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail=f"Groq API error: {response.text}")
-        return {"summary": response.json()["choices"][0]["message"]["content"]}
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=503, detail=f"Could not reach Groq: {str(e)}")
+        if stream:
+            return sse_response(sse_tokens(await stream_summary(req), "summary"))
+        return {"summary": await llm_summarize(req)}
+    except LLMError as e:
+        raise llm_error(e)
 
 
 @app.post("/chat")
-async def chat(req: ChatRequest):
-    # Construct a system message that includes the analysis context
-    context_str = f"""
-    You are an expert AML Compliance Assistant. You are analyzing a specific transaction study.
-    Study Context:
-    - Accounts: {req.context.get('total_accounts', 'Unknown')}
-    - Fraud Rings: {req.context.get('fraud_rings', 'Unknown')}
-    - Avg Risk Score: {req.context.get('avg_risk_score', 'Unknown')}
-    - Top Flagged: {req.context.get('top_flagged_reasons', 'None')}
-    - Key Hubs: {req.context.get('graph_hubs', 'None')}
-    
-    Answer the user's questions strictly based on this context and AML best practices. 
-    Be professional, concise, and helpful.
-    """
-
-    messages = [{"role": "system", "content": context_str.strip()}]
-    for msg in req.messages:
-        messages.append({"role": msg.role, "content": msg.content})
-
-    payload = {
-        "model": GROQ_MODEL,
-        "messages": messages,
-        "temperature": 0.5,
-        "max_tokens": 600
-    }
-
+async def chat(req: ChatRequest, stream: bool = False):
     try:
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            response = await client.post(
-                GROQ_API_URL,
-                json=payload,
-                headers={"Authorization": f"Bearer {GROQ_API_KEY}"}
-            )
-        if response.status_code != 200:
-            raise HTTPException(status_code=502, detail=f"Groq Chat API error: {response.text}")
-        
-        result = response.json()
-        return {"content": result["choices"][0]["message"]["content"]}
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=503, detail=f"Could not reach Groq: {str(e)}")
+        if stream:
+            return sse_response(sse_tokens(await stream_chat(req), "content"))
+        return {"content": await llm_chat(req)}
+    except LLMError as e:
+        raise llm_error(e)
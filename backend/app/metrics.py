@@ -0,0 +1,146 @@
+# backend/app/metrics.py
+
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+# Histogram bucket upper bounds (cumulative, Prometheus style)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = tuple(float(1 << shift) for shift in range(20, 34, 2))  # 1 MiB .. 8 GiB
+
+_registry: List["_Metric"] = []
+_lock = threading.Lock()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_text(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.series: Dict[Tuple, object] = {}
+        _registry.append(self)
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+        for values, state in sorted(self.series.items()):
+            lines.extend(self._render_series(values, state))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def _render_series(self, values, total):
+        return [f"{self.name}{_label_text(self.labels, values)} {_number(total)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets=DURATION_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            counts, total = self.series.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            # Per-bucket counts; render() turns them cumulative
+            counts[bisect_left(self.buckets, value)] += 1
+            self.series[key] = (counts, total + value)
+
+    def _render_series(self, values, state):
+        counts, total = state
+        lines = []
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            le = 'le="%s"' % ("+Inf" if bound == float("inf") else _number(bound))
+            lines.append(f"{self.name}_bucket{_label_text(self.labels, values, le)} {running}")
+        lines.append(f"{self.name}_sum{_label_text(self.labels, values)} {_number(total)}")
+        lines.append(f"{self.name}_count{_label_text(self.labels, values)} {running}")
+        return lines
+
+
+# -------------------------
+# APPLICATION METRICS
+# -------------------------
+HTTP_REQUESTS = Counter(
+    "fintrace_http_requests_total", "HTTP requests by method, route and status code.", ("method", "route", "status")
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "fintrace_http_request_duration_seconds", "Time to produce the HTTP response headers.", ("method", "route")
+)
+ANALYSIS_SECONDS = Histogram(
+    "fintrace_analysis_duration_seconds", "End-to-end /analyze pipeline time."
+)
+STAGE_WALL_SECONDS = Histogram(
+    "fintrace_stage_wall_seconds", "Wall time per pipeline stage.", ("stage",)
+)
+STAGE_CPU_SECONDS = Histogram(
+    "fintrace_stage_cpu_seconds", "CPU time (user + system, incl. child processes) per pipeline stage.", ("stage",)
+)
+STAGE_PEAK_RSS_BYTES = Histogram(
+    "fintrace_stage_peak_rss_delta_bytes", "Growth of the worker's peak RSS during a pipeline stage.", ("stage",),
+    buckets=(0.0,) + BYTES_BUCKETS
+)
+MODULE_IMPORT_SECONDS = Histogram(
+    "fintrace_module_import_seconds", "Time to preload an engine module during warm-up.", ("module",)
+)
+GROQ_SECONDS = Histogram(
+    "fintrace_groq_request_duration_seconds", "Groq API call latency by endpoint and outcome.", ("endpoint", "outcome")
+)
+
+
+def record_request(method: str, route: str, status: int, seconds: float):
+    HTTP_REQUESTS.inc(method=method, route=route, status=status)
+    HTTP_REQUEST_SECONDS.observe(seconds, method=method, route=route)
+
+
+def record_stage(timing: Dict):
+    """Observes one pipeline stage timing (see pipeline.run_analysis)."""
+    stage = timing["stage"]
+    STAGE_WALL_SECONDS.observe(timing["wall_seconds"], stage=stage)
+    STAGE_CPU_SECONDS.observe(timing["cpu_seconds"], stage=stage)
+    if timing["peak_rss_delta_bytes"] is not None:
+        STAGE_PEAK_RSS_BYTES.observe(timing["peak_rss_delta_bytes"], stage=stage)
+
+
+def record_import(module: str, seconds: float):
+    MODULE_IMPORT_SECONDS.observe(seconds, module=module)
+
+
+def record_groq(endpoint: str, outcome: str, seconds: float):
+    GROQ_SECONDS.observe(seconds, endpoint=endpoint, outcome=outcome)
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    with _lock:
+        lines = [line for metric in _registry for line in metric.render()]
+    return "\n".join(lines) + "\n"
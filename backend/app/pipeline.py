@@ -0,0 +1,531 @@
+import asyncio
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource # Unix only; without it peak RSS and child-process CPU are not measured
+except ImportError:
+    resource = None
+
+from app.graph_engine import (
+    analyze_graph_intelligence, betweenness_chunks, betweenness_pivots, betweenness_task, choose_centrality_strategy,
+    merge_betweenness_sums, scale_betweenness, with_betweenness
+)
+from app.compact_graph import CompactGraph
+from app.components import plan_components
+from app.context import AnalysisContext
+from app.cycle_detector import batch_cycles, detect_cycles, merge_cycle_batches, scc_batches
+from app.smurf_detector import detect_smurfing
+from app.shell_detector import batch_shell_candidates, detect_shell_networks, find_pass_through_accounts, merge_shell_batches
+from app.anomaly_engine import detect_anomalies
+from app.risk_engine import build_score_table, risk_records
+from app.explanation_engine import EXPLAIN_SCORE_THRESHOLD, batch_explain
+from app.metrics import ANALYSIS_SECONDS, record_stage
+from app.score_artifacts import save_artifacts
+from app.analysis_store import save_analysis
+from app.ring_cases import consolidate_rings, score_rings
+
+# Worker processes for the CPU-bound analysis stages
+ANALYZE_WORKERS = int(os.getenv("ANALYZE_WORKERS", os.cpu_count() or 1))
+
+SUSPICIOUS_SCORE_THRESHOLD = 25
+# Accounts listed under anomaly_scores (normalized Isolation Forest score)
+ANOMALY_REPORT_THRESHOLD = 0.5
+
+# Stage names reported to progress callbacks, in pipeline order
+STAGES = ["graph", "intelligence", "cycles", "smurfing", "shell", "anomaly", "scoring", "consolidation", "report"]
+
+_executor = None
+
+
+class StageError(Exception):
+    """A pipeline stage failed; carries the stage name for the API error."""
+
+    def __init__(self, stage: str, error: BaseException):
+        self.stage = stage
+        self.error = error
+        super().__init__(f"Analysis stage '{stage}' failed: {type(error).__name__}: {error}")
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(ANALYZE_WORKERS, 1))
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _resource_usage():
+    """(CPU seconds incl. reaped child processes, peak RSS bytes or None) of this process."""
+    cpu = time.process_time()
+    if resource is None:
+        return cpu, None
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    return cpu + children.ru_utime + children.ru_stime, peak * (1 if sys.platform == "darwin" else 1024)
+
+
+def _measure(fn, *args, **kwargs):
+    """
+    Runs one stage inside the worker and measures it there. Returns
+    (result, usage). Stages that take a stats dict fill it with work
+    counters (e.g. candidate paths); those come back in usage["sizes"].
+    """
+    cpu_before, peak_before = _resource_usage()
+    wall_before = time.perf_counter()
+    result = fn(*args, **kwargs)
+    wall = time.perf_counter() - wall_before
+    cpu_after, peak_after = _resource_usage()
+
+    return result, {
+        "wall_seconds": round(wall, 6),
+        "cpu_seconds": round(cpu_after - cpu_before, 6),
+        # Growth of the worker's high-water mark; 0 if the stage stayed below it
+        "peak_rss_delta_bytes": None if peak_before is None else peak_after - peak_before,
+        "sizes": dict(kwargs.get("stats") or {})
+    }
+
+
+def _combine_usage(usages: List[Dict], local_cpu: List[float], wall: float) -> Dict:
+    """
+    One stage's usage from all its pool calls: a lone call keeps its own
+    measurements; otherwise wall time is the stage's elapsed time, CPU time
+    and counters are summed (incl. work done in this process) and the peak
+    RSS growth is the largest of any worker.
+    """
+    if len(usages) == 1 and not local_cpu:
+        return usages[0]
+    peaks = [usage["peak_rss_delta_bytes"] for usage in usages if usage["peak_rss_delta_bytes"] is not None]
+    sizes = {}
+    for usage in usages:
+        for key, value in usage["sizes"].items():
+            sizes[key] = sizes.get(key, 0) + value
+    return {
+        "wall_seconds": round(wall, 6),
+        "cpu_seconds": round(sum(usage["cpu_seconds"] for usage in usages) + sum(local_cpu), 6),
+        "peak_rss_delta_bytes": max(peaks) if peaks else None,
+        "sizes": sizes
+    }
+
+
+async def _run_stage(stage: str, fn, *args, **kwargs):
+    """Runs fn in the process pool without blocking the event loop; returns (result, usage)."""
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_executor(), partial(_measure, fn, *args, **kwargs))
+    except BrokenProcessPool as e:
+        # A worker died (e.g. OOM-killed); start a fresh pool for the next request
+        shutdown_executor()
+        raise StageError(stage, e) from e
+    except Exception as e:
+        raise StageError(stage, e) from e
+
+
+# -------------------------
+# STAGES (run inside worker processes)
+# -------------------------
+def build_foundation(df: pd.DataFrame) -> AnalysisContext:
+    # Int-coded CSR graph for the hot paths + shared per-edge / per-account lookups
+    # + per-account aggregates (read by both the shell and anomaly stages).
+    # df itself stays behind: the caller already has it.
+    return AnalysisContext(df).only("graph", "index", "account_features")
+
+
+def graph_intelligence(
+    CG: CompactGraph, betweenness: bool = True, partition: Dict = None, pagerank_start: Dict = None
+):
+    # Louvain and PageRank still run on networkx
+    return analyze_graph_intelligence(
+        CG.to_networkx(), compact=CG, partition=partition, pagerank_start=pagerank_start, betweenness=betweenness
+    )
+
+
+def score_sections(
+    risk_results: Dict,
+    account_patterns: Dict,
+    graph_intel: Dict,
+    anomaly_scores: pd.Series,
+    suspicious_threshold: float = SUSPICIOUS_SCORE_THRESHOLD,
+    explain_threshold: float = EXPLAIN_SCORE_THRESHOLD,
+    anomaly_threshold: float = ANOMALY_REPORT_THRESHOLD
+) -> Dict:
+    """
+    The report parts that follow from the risk scores and thresholds:
+    suspicious accounts, anomaly list, explanations and their summary
+    counts. risk_results only needs the accounts that can clear a threshold.
+    """
+    # EXPLANATION ENGINE
+    explanations = batch_explain(risk_results, account_patterns, graph_intel, explain_threshold)
+
+    # RESPONSE FORMATTING
+    suspicious_accounts = []
+    for acc, data in risk_results.items():
+        if data["score"] > suspicious_threshold: # Filtering threshold for 'suspicious' tag
+            suspicious_accounts.append({
+                "account_id": acc,
+                "suspicion_score": data["score"],
+                "confidence": data["confidence"],
+                "detected_patterns": account_patterns.get(acc, ["anomaly"]),
+                "risk_breakdown": data["breakdown"]
+            })
+
+    suspicious_accounts.sort(key=lambda x: x["suspicion_score"], reverse=True)
+
+    return {
+        "suspicious_accounts": suspicious_accounts,
+        "anomaly_scores": [
+            {"account_id": acc, "score": round(float(score), 3)}
+            for acc, score in anomaly_scores.items() if score > anomaly_threshold
+        ],
+        "explanations": [
+            {"account_id": acc, "text": text} for acc, text in explanations.items()
+        ],
+        "summary": {
+            "suspicious_accounts_flagged": len(suspicious_accounts),
+            "avg_risk_score": round(sum(acc["suspicion_score"] for acc in suspicious_accounts) / len(suspicious_accounts), 2) if suspicious_accounts else 0
+        }
+    }
+
+
+def build_report(
+    CG, graph_intel, anomaly_results, all_rings, risk_results, start_time, context: AnalysisContext = None,
+    cases: List[Dict] = None
+):
+    account_patterns = (context or AnalysisContext()).setdefault(rings=all_rings).pattern_map
+    sections = score_sections(risk_results, account_patterns, graph_intel, anomaly_results["anomaly_score"])
+
+    # Overlapping rings are reported as cases (consolidated here unless passed in), scored from their
+    # members' entries: every ring member is in the pattern map
+    fraud_rings = score_rings(
+        consolidate_rings(all_rings, hubs=graph_intel["hubs"]) if cases is None else cases,
+        {acc: risk_results[acc]["score"] for acc in account_patterns if acc in risk_results}
+    )
+
+    nodes = CG.ids[CG.node_order].tolist()
+    edges = CG.edge_order()
+    processing_time = round(time.time() - start_time, 3)
+
+    # One pass over the partition instead of one scan per community
+    clusters = {}
+    for node, cid in graph_intel["communities"].items():
+        clusters.setdefault(cid, []).append(node)
+
+    return {
+        "suspicious_accounts": sections["suspicious_accounts"],
+        "fraud_rings": fraud_rings,
+        "graph_clusters": [
+            {"cluster_id": cid, "members": clusters[cid]}
+            for cid in sorted(clusters)
+        ],
+        "anomaly_scores": sections["anomaly_scores"],
+        "explanations": sections["explanations"],
+        "graph": {
+            "nodes": [{"id": node, "community": graph_intel["communities"].get(node)} for node in nodes],
+            "edges": [
+                {"source": u, "target": v, "amount": amount}
+                for u, v, amount in zip(
+                    CG.ids[CG.edge_sources()[edges]].tolist(),
+                    CG.ids[CG.out_dst[edges]].tolist(),
+                    CG.amount[edges].tolist()
+                )
+            ]
+        },
+        "summary": {
+            "total_accounts_analyzed": len(nodes),
+            "suspicious_accounts_flagged": sections["summary"]["suspicious_accounts_flagged"],
+            "fraud_rings_detected": len(fraud_rings),
+            "pattern_rings_detected": len(all_rings),
+            "avg_risk_score": sections["summary"]["avg_risk_score"],
+            "processing_time_seconds": processing_time,
+            "centrality_strategy": graph_intel["centrality"]["strategy"]
+        }
+    }
+
+
+def finish_report(
+    CG, graph_intel, anomaly_results, all_rings, score_table, start_time, context: AnalysisContext = None,
+    artifact_key: str = None, cases: List[Dict] = None
+):
+    # The unrounded scores are kept for /rescore next to the cached result (best-effort, like the disk cache)
+    if artifact_key is not None:
+        try:
+            save_artifacts(artifact_key, score_table, anomaly_results, context.pattern_map, graph_intel["hubs"])
+        except OSError:
+            pass
+
+    risk_results = risk_records(score_table)
+    result = build_report(CG, graph_intel, anomaly_results, all_rings, risk_results, start_time, context, cases)
+
+    # Likewise the indexed copy the drill-down queries read (it needs df in the context)
+    if artifact_key is not None:
+        try:
+            save_analysis(
+                artifact_key, context.df, CG, graph_intel, result["fraud_rings"], risk_results, context.pattern_map,
+                result, pattern_rings=all_rings
+            )
+        except (OSError, sqlite3.Error):
+            pass
+    return result
+
+
+def stage_runners(progress: Callable[[str, str], None] = None, timings: List[Dict] = None):
+    """
+    (staged, run_stage) for one analysis. staged(stage, work, sizes) runs
+    await work(run, local) as one reported stage: run(calls) runs (fn,
+    args, kwargs) calls side by side in the process pool and local(fn,
+    *args) runs small merge steps in a thread of this process; the stage's
+    timing covers all of them. run_stage(stage, fn, *args, sizes, **kwargs)
+    is a stage of a single pool call. progress(stage, state) is called as
+    each stage starts, completes or fails; each completed stage's timing is
+    exported to the metrics and appended to timings if given.
+    """
+    notify = progress or (lambda stage, state: None)
+
+    async def staged(stage: str, work, sizes: Dict = None):
+        notify(stage, "started")
+        started = time.perf_counter()
+        usages, local_cpu = [], []
+
+        async def run(calls: List[Tuple]) -> List:
+            futures = [asyncio.ensure_future(_run_stage(stage, fn, *args, **kwargs)) for fn, args, kwargs in calls]
+            try:
+                outcomes = await asyncio.gather(*futures)
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+            usages.extend(usage for _, usage in outcomes)
+            return [result for result, _ in outcomes]
+
+        async def local(fn, *args):
+            def timed():
+                before = time.thread_time()
+                result = fn(*args)
+                local_cpu.append(time.thread_time() - before)
+                return result
+            return await asyncio.to_thread(timed)
+
+        try:
+            result = await work(run, local)
+        except StageError:
+            notify(stage, "failed")
+            raise
+        except Exception as e:
+            notify(stage, "failed")
+            raise StageError(stage, e) from e
+
+        usage = _combine_usage(usages, local_cpu, time.perf_counter() - started)
+        timing = {"stage": stage, **usage, "sizes": {**(sizes or {}), **usage["sizes"]}}
+        record_stage(timing)
+        if timings is not None:
+            timings.append(timing)
+        notify(stage, "completed")
+        return result
+
+    async def run_stage(stage: str, fn, *args, sizes: Dict = None, **kwargs):
+        async def work(run, local):
+            (result,) = await run([(fn, args, kwargs)])
+            return result
+        return await staged(stage, work, sizes)
+
+    return staged, run_stage
+
+
+def intelligence_work(
+    CG: CompactGraph, plan=None, partition: Dict = None, pagerank_start: Dict = None, known_sums: np.ndarray = None
+):
+    """
+    The intelligence stage's work for staged(): Louvain / PageRank (warm-started
+    from a previous partition / PageRank when given) plus betweenness, split
+    into pool tasks when the strategy is parallel or the graph has a plan.
+    With known_sums (unscaled betweenness sums per account code, e.g. from an
+    earlier run), accounts outside the plan's batches keep theirs instead of
+    scoring 0, and the result carries the merged sums as "betweenness_sums".
+    """
+    warm = {"partition": partition, "pagerank_start": pagerank_start}
+
+    async def work(run, local):
+        strategy = choose_centrality_strategy(CG)
+        if plan is None and strategy["mode"] != "parallel" and known_sums is None:
+            (graph_intel,) = await run([(graph_intelligence, (CG,), warm)])
+            return graph_intel
+
+        # Betweenness as pool tasks next to Louvain / PageRank on the whole graph: one per
+        # pivot chunk, per batch of components when the graph splits. Only a giant batch
+        # splits its pivots; the other batches already run side by side
+        pivots = await local(betweenness_pivots, CG, strategy)
+        if plan is None:
+            graphs, chunks = [CG], [betweenness_chunks(pivots, strategy)]
+        else:
+            graphs = [batch.graph for batch in plan.batches]
+            chunks = [
+                betweenness_chunks(p, strategy) if batch.giant else [p]
+                for batch, p in zip(plan.batches, await local(plan.split_codes, pivots))
+            ]
+        graph_intel, *partials = await run(
+            [(graph_intelligence, (CG,), {**warm, "betweenness": False})]
+            + [(*betweenness_task(graph, chunk), {}) for graph, parts in zip(graphs, chunks) for chunk in parts]
+        )
+
+        if plan is None:
+            raw = np.sum(partials, axis=0)
+        else:
+            sums = []
+            for parts in chunks:
+                sums.append(partials[:len(parts)])
+                partials = partials[len(parts):]
+            raw = await local(merge_betweenness_sums, CG, plan.batches, sums, known_sums)
+        graph_intel = with_betweenness(graph_intel, await local(scale_betweenness, CG, raw, pivots, strategy))
+        return graph_intel if known_sums is None else {**graph_intel, "betweenness_sums": raw}
+
+    return work
+
+
+# -------------------------
+# ORCHESTRATION
+# -------------------------
+async def run_analysis(
+    df: pd.DataFrame,
+    start_time: float = None,
+    progress: Callable[[str, str], None] = None,
+    timings: List[Dict] = None,
+    artifact_key: str = None
+) -> dict:
+    """
+    Full /analyze pipeline. Stages that only depend on df / the graph run
+    concurrently in the process pool and join for risk scoring. When the
+    graph falls apart into several weakly connected components, betweenness,
+    cycles and shell chains run per batch of components (trivial ones are
+    skipped) and are merged back in whole-graph order.
+    progress(stage, state) is called as each stage starts, completes or fails.
+    Each completed stage's timing (wall / CPU time, peak RSS growth, input
+    sizes) is exported to the metrics and appended to timings if given.
+    Artifacts several stages read (account aggregates, the pattern map)
+    are built once in an AnalysisContext; each stage gets only its share.
+    With artifact_key, the score components are saved for /rescore under
+    it, and the analysis is written to the store for drill-down queries.
+    """
+    start_time = start_time or time.time()
+    staged, run_stage = stage_runners(progress, timings)
+
+    rows = len(df)
+
+    # 1. GRAPH FOUNDATION
+    # Independent subgraphs are then analysed in batches across the pool (plan is None: whole graph)
+    graph_stats = {"rows": rows}
+
+    async def foundation(run, local):
+        (built,) = await run([(build_foundation, (df,), {})])
+        plan = await local(plan_components, built.graph, ANALYZE_WORKERS)
+        if plan is not None:
+            graph_stats.update(plan.stats)
+        return built.add(df=df), plan
+
+    ctx, plan = await staged("graph", foundation, sizes=graph_stats)
+    CG, index = ctx.graph, ctx.index
+    graph_sizes = {"nodes": CG.n_nodes, "edges": CG.n_edges}
+    split_sizes = {**graph_sizes, **({"batches": len(plan.batches)} if plan is not None else {})}
+
+    def cycles(scc):
+        async def work(run, local):
+            if plan is None:
+                (rings,) = await run([(detect_cycles, (CG,), {"scc": scc, "index": index})])
+                return rings
+            parts = await local(scc_batches, CG, plan, scc)
+            found = await run([
+                (batch_cycles, (batch, part), {})
+                for batch, part in zip(plan.batches, parts) if part
+            ])
+            return await local(merge_cycle_batches, found)
+        return work
+
+    shell_sizes = {"rows": rows, **split_sizes}
+
+    async def shells(run, local):
+        if plan is None:
+            (rings,) = await run([
+                (detect_shell_networks, (CG, None), {"stats": {}, "context": ctx.only("account_features")})
+            ])
+            return rings
+        mules = await local(find_pass_through_accounts, CG, None, ctx)
+        shell_sizes["pass_through_accounts"] = int(mules.sum())
+        found = await run([
+            (batch_shell_candidates, (batch, mules[batch.codes]), {"stats": {}}) for batch in plan.batches
+        ])
+        return await local(merge_shell_batches, CG, found)
+
+    # 2. ADVANCED GRAPH INTELLIGENCE + 3. PATTERN DETECTION + 4. ML ANOMALY DETECTION
+    async def intelligence_then_cycles():
+        graph_intel = await staged("intelligence", intelligence_work(CG, plan), sizes=split_sizes)
+        # Cycles reuse the SCCs found by the intelligence stage
+        scc = graph_intel["scc"]
+        cycle_rings = await staged(
+            "cycles", cycles(scc),
+            sizes={**split_sizes, "scc_count": len(scc), "scc_nodes": sum(len(c) for c in scc)}
+        )
+        return graph_intel, cycle_rings
+
+    tasks = [
+        asyncio.ensure_future(intelligence_then_cycles()),
+        asyncio.ensure_future(run_stage("smurfing", detect_smurfing, df, index=index, sizes={"rows": rows})),
+        asyncio.ensure_future(staged("shell", shells, sizes=shell_sizes)),
+        asyncio.ensure_future(run_stage(
+            "anomaly", detect_anomalies, context=ctx.only("graph", "account_features"),
+            sizes={"rows": rows, **graph_sizes}
+        ))
+    ]
+    try:
+        (graph_intel, cycle_rings), smurf_rings, shell_rings, anomaly_results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    all_rings = cycle_rings + smurf_rings + shell_rings
+    ctx.add(rings=all_rings)
+
+    # 5. RISK CALIBRATION (WEIGHTED MODEL) + RING CONSOLIDATION
+    accounts = CG.ids[CG.node_order].tolist()
+    ring_sizes = {"accounts": len(accounts), "rings": len(all_rings)}
+    tasks = [
+        asyncio.ensure_future(run_stage(
+            "scoring", build_score_table, accounts, graph_intel, anomaly_results, all_rings, df, index=index,
+            context=ctx.only("pattern_map"), sizes=ring_sizes
+        )),
+        # Overlapping rings merge into cases; their risk is added once the scores are in
+        asyncio.ensure_future(run_stage(
+            "consolidation", consolidate_rings, all_rings, hubs=graph_intel["hubs"], sizes={"rings": len(all_rings)}
+        ))
+    ]
+    try:
+        score_table, cases = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    # 6. EXPLANATIONS + 7. RESPONSE FORMATTING
+    # (the drill-down store written alongside also needs the transactions)
+    report_context = ctx.only("pattern_map", "df") if artifact_key is not None else ctx.only("pattern_map")
+    result = await run_stage(
+        "report", finish_report, CG, graph_intel, anomaly_results, all_rings, score_table, start_time,
+        context=report_context, artifact_key=artifact_key, cases=cases, sizes=ring_sizes
+    )
+    ANALYSIS_SECONDS.observe(time.time() - start_time)
+    return result
@@ -0,0 +1,93 @@
+# backend/app/rescore.py
+
+import math
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from app.explanation_engine import EXPLAIN_SCORE_THRESHOLD
+from app.pipeline import ANOMALY_REPORT_THRESHOLD, SUSPICIOUS_SCORE_THRESHOLD, score_sections
+from app.ring_cases import score_rings
+from app.risk_engine import RISK_WEIGHTS, risk_records, weighted_score
+from app.score_artifacts import COMPONENT_COLUMNS, ScoreArtifacts
+
+
+class RescoreError(ValueError):
+    """Unknown risk component or invalid weight / threshold."""
+
+
+def scoring_parameters(
+    weights: Dict[str, float] = None,
+    suspicious_threshold: float = None,
+    explain_threshold: float = None,
+    anomaly_threshold: float = None
+) -> Dict:
+    """Complete rescoring parameters: the given overrides on top of the defaults /analyze uses."""
+    weights = weights or {}
+    unknown = sorted(set(weights) - set(RISK_WEIGHTS))
+    if unknown:
+        raise RescoreError(f"Unknown risk component: {', '.join(unknown)} (expected {', '.join(RISK_WEIGHTS)})")
+    if any(not math.isfinite(weight) or weight < 0 for weight in weights.values()):
+        raise RescoreError("Weights must be finite and non-negative")
+
+    thresholds = {
+        "suspicious_threshold": SUSPICIOUS_SCORE_THRESHOLD if suspicious_threshold is None else suspicious_threshold,
+        "explain_threshold": EXPLAIN_SCORE_THRESHOLD if explain_threshold is None else explain_threshold,
+        "anomaly_threshold": ANOMALY_REPORT_THRESHOLD if anomaly_threshold is None else anomaly_threshold
+    }
+    if any(not math.isfinite(value) for value in thresholds.values()):
+        raise RescoreError("Thresholds must be finite")
+    return {"weights": {**RISK_WEIGHTS, **weights}, **thresholds}
+
+
+def rescore(result: Dict, artifacts: ScoreArtifacts, parameters: Dict) -> Dict:
+    """
+    result (a cached /analyze payload) with its suspicious accounts,
+    anomaly list, explanations, ring risk and summary counts recomputed
+    from the saved score components under new weights / thresholds. The
+    graph, rings and clusters are reused as they are.
+    """
+    arrays = artifacts.arrays
+
+    # 1. New raw scores for every account, as one weighted sum over the mapped columns
+    raw_score = weighted_score(arrays, parameters["weights"])
+
+    # 2. Records only for the accounts that can clear a threshold
+    # (rounding to 2 decimals moves a 0-100 score by at most 0.005)
+    cutoff = min(parameters["suspicious_threshold"], parameters["explain_threshold"])
+    candidates = np.flatnonzero(raw_score * 100 > cutoff - 0.01)
+    accounts = artifacts.accounts(candidates)
+    table = pd.DataFrame(
+        {"raw_score": raw_score[candidates], **{column: arrays[column][candidates] for column in COMPONENT_COLUMNS}},
+        index=pd.Index(accounts, dtype=object)
+    )
+    account = dict(zip(candidates.tolist(), accounts))
+    account_patterns = {account[pos]: patterns for pos, patterns in artifacts.patterns(candidates).items()}
+    hubs = {acc for acc, is_hub in zip(accounts, arrays["is_hub"][candidates].tolist()) if is_hub}
+
+    # 3. Anomaly list, in the anomaly table's order
+    order = arrays["anomaly_order"]
+    scores = arrays["anomaly_score"][order]
+    listed = scores > parameters["anomaly_threshold"]
+    anomaly_scores = pd.Series(scores[listed], index=pd.Index(artifacts.accounts(order[listed]), dtype=object))
+
+    # 4. Ring risk from the new scores of the ring members (exactly the accounts with patterns)
+    ptr = arrays["pattern_ptr"]
+    members = np.flatnonzero(ptr[1:] > ptr[:-1])
+    member_scores = dict(zip(
+        artifacts.accounts(members), (round(score * 100, 2) for score in raw_score[members].tolist())
+    ))
+
+    sections = score_sections(
+        risk_records(table), account_patterns, {"hubs": hubs}, anomaly_scores,
+        parameters["suspicious_threshold"], parameters["explain_threshold"], parameters["anomaly_threshold"]
+    )
+    return {
+        **result,
+        "suspicious_accounts": sections["suspicious_accounts"],
+        "anomaly_scores": sections["anomaly_scores"],
+        "explanations": sections["explanations"],
+        "fraud_rings": score_rings(result["fraud_rings"], member_scores),
+        "summary": {**result["summary"], **sections["summary"], "scoring": parameters}
+    }
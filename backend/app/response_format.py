@@ -0,0 +1,248 @@
+# backend/app/response_format.py
+
+import gzip
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+FORMATS = ("records", "columnar")     # records: one object per node / edge / score (the default schema)
+ENCODINGS = ("json", "msgpack", "arrow")
+DETAILS = ("full", "suspicious")      # suspicious: flagged accounts plus k-hop context only
+MAX_HOPS = 3
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", 100_000))
+
+# Paginated tables and their columns
+TABLES = {
+    "nodes": ["id", "community"],
+    "edges": ["source", "target", "amount"],
+    "anomaly_scores": ["account_id", "score"]
+}
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "msgpack": "application/x-msgpack",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+
+
+# Content codings for msgpack bodies, in order of preference
+COMPRESSIONS = ("zstd", "gzip")
+
+
+class FormatError(ValueError):
+    """Unsupported response format, encoding or level of detail."""
+
+
+def check_options(fmt: str = "records", encoding: str = "json", detail: str = "full", hops: int = 1, paged: bool = False):
+    """Raises FormatError for unsupported options; arrow is only offered for paginated tables."""
+    if fmt not in FORMATS:
+        raise FormatError(f"Unknown format: {fmt} (expected one of {', '.join(FORMATS)})")
+    if encoding not in ENCODINGS:
+        raise FormatError(f"Unknown encoding: {encoding} (expected one of {', '.join(ENCODINGS)})")
+    if encoding == "arrow" and not paged:
+        raise FormatError("The arrow encoding is only available for the paginated /analyses/{id}/... tables")
+    if detail not in DETAILS:
+        raise FormatError(f"Unknown detail level: {detail} (expected one of {', '.join(DETAILS)})")
+    if not 0 <= hops <= MAX_HOPS:
+        raise FormatError(f"hops must be between 0 and {MAX_HOPS}")
+
+
+def to_columns(rows: List[Dict], columns: List[str]) -> Dict[str, List]:
+    return {column: [row[column] for row in rows] for column in columns}
+
+
+# -------------------------
+# LEVEL OF DETAIL
+# -------------------------
+def suspicious_subgraph(graph: Dict, seeds: List[str], hops: int) -> Dict:
+    """
+    The subgraph induced by the seed accounts and everything within hops
+    edges of them (either direction), in the original node / edge order.
+    """
+    nodes, edges = graph["nodes"], graph["edges"]
+    ids = pd.Index([node["id"] for node in nodes])
+    src = ids.get_indexer([edge["source"] for edge in edges])
+    dst = ids.get_indexer([edge["target"] for edge in edges])
+
+    keep = np.zeros(len(ids), dtype=bool)
+    seed_codes = ids.get_indexer(seeds)
+    keep[seed_codes[seed_codes >= 0]] = True
+
+    # One vectorized frontier expansion per hop
+    for _ in range(hops):
+        touching = keep[src] | keep[dst]
+        grown = keep.copy()
+        grown[src[touching]] = True
+        grown[dst[touching]] = True
+        if (grown == keep).all():
+            break
+        keep = grown
+
+    kept_edges = keep[src] & keep[dst]
+    return {
+        "nodes": [node for node, k in zip(nodes, keep.tolist()) if k],
+        "edges": [edge for edge, k in zip(edges, kept_edges.tolist()) if k]
+    }
+
+
+def select_graph(result: Dict, detail: str = "full", hops: int = 1) -> Dict:
+    if detail == "full":
+        return result["graph"]
+    seeds = [acc["account_id"] for acc in result["suspicious_accounts"]]
+    return suspicious_subgraph(result["graph"], seeds, hops)
+
+
+# -------------------------
+# RESPONSE SHAPING
+# -------------------------
+def shape_result(
+    result: Dict,
+    analysis_id: str,
+    fmt: str = "records",
+    detail: str = "full",
+    hops: int = 1,
+    edge_limit: Optional[int] = None
+) -> Dict:
+    """
+    The /analyze payload in the requested shape. The default arguments
+    return result unchanged. Other options:
+    - "columnar" turns graph nodes / edges and anomaly_scores into one
+      array per field
+    - detail="suspicious" keeps only the flagged accounts' k-hop
+      neighbourhood
+    - edge_limit returns the first page of edges, with a link to the
+      paginated /analyses/{analysis_id}/edges endpoint
+    """
+    if fmt == "records" and detail == "full" and edge_limit is None:
+        return result
+
+    graph = select_graph(result, detail, hops)
+    total_edges = len(graph["edges"])
+    shaped_graph = {"nodes": graph["nodes"], "edges": graph["edges"]}
+
+    if detail != "full":
+        shaped_graph["detail"] = {
+            "level": detail,
+            "hops": hops,
+            "total_nodes": len(result["graph"]["nodes"]),
+            "total_edges": len(result["graph"]["edges"])
+        }
+    if edge_limit is not None and total_edges > edge_limit:
+        shaped_graph["edges"] = graph["edges"][:edge_limit]
+        shaped_graph["edge_page"] = {
+            "offset": 0,
+            "limit": edge_limit,
+            "total": total_edges,
+            "next": f"/analyses/{analysis_id}/edges?offset={edge_limit}&limit={edge_limit}"
+                    f"&detail={detail}&hops={hops}&format={fmt}"
+        }
+
+    anomaly_scores = result["anomaly_scores"]
+    if fmt == "columnar":
+        shaped_graph["nodes"] = to_columns(shaped_graph["nodes"], TABLES["nodes"])
+        shaped_graph["edges"] = to_columns(shaped_graph["edges"], TABLES["edges"])
+        anomaly_scores = to_columns(anomaly_scores, TABLES["anomaly_scores"])
+
+    return {**result, "graph": shaped_graph, "anomaly_scores": anomaly_scores, "format": fmt}
+
+
+def page(
+    result: Dict,
+    analysis_id: str,
+    table: str,
+    offset: int = 0,
+    limit: int = 10_000,
+    fmt: str = "records",
+    detail: str = "full",
+    hops: int = 1
+) -> Dict:
+    """One page of a stored analysis' nodes, edges or anomaly scores."""
+    if table == "anomaly_scores":
+        rows = result["anomaly_scores"]
+    else:
+        rows = select_graph(result, detail, hops)[table]
+
+    limit = min(limit, MAX_PAGE_SIZE)
+    items = rows[offset:offset + limit]
+    next_offset = offset + limit if offset + limit < len(rows) else None
+    return {
+        "analysis_id": analysis_id,
+        "table": table,
+        "offset": offset,
+        "limit": limit,
+        "total": len(rows),
+        "next_offset": next_offset,
+        "format": fmt,
+        table: to_columns(items, TABLES[table]) if fmt == "columnar" else items
+    }
+
+
+# -------------------------
+# ENCODINGS
+# -------------------------
+def encode(payload: Dict, encoding: str = "json") -> Tuple[bytes, str]:
+    """(body, media type) for a JSON-native payload."""
+    if encoding == "json":
+        body = json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+    elif encoding == "msgpack":
+        try:
+            import msgpack
+        except ImportError:
+            raise FormatError("The msgpack encoding needs the msgpack package")
+        body = msgpack.packb(payload, use_bin_type=True)
+    else:
+        raise FormatError(f"Unsupported encoding for this payload: {encoding}")
+    return body, MEDIA_TYPES[encoding]
+
+
+def accepted_compression(accept_encoding: Optional[str]) -> Optional[str]:
+    """The preferred content coding the client accepts (q=0 excluded), or None."""
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            accepted.add(coding.lower())
+    return next((coding for coding in COMPRESSIONS if coding in accepted), None)
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        import zstandard
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=6)
+
+
+def encode_page(page_payload: Dict, encoding: str = "json") -> Tuple[bytes, str]:
+    """
+    A page() payload. Arrow returns a zstd-compressed IPC stream of the
+    page's table, with the paging fields in the schema metadata.
+    """
+    if encoding != "arrow":
+        return encode(page_payload, encoding)
+
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise FormatError("The arrow encoding needs the pyarrow package")
+
+    table_name = page_payload["table"]
+    rows = page_payload[table_name]
+    columns = rows if isinstance(rows, dict) else to_columns(rows, TABLES[table_name])
+    meta = {key: value for key, value in page_payload.items() if key != table_name}
+    table = pa.table(columns).replace_schema_metadata({"fintrace": json.dumps(meta)})
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema, options=pa.ipc.IpcWriteOptions(compression="zstd")) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes(), MEDIA_TYPES["arrow"]
@@ -0,0 +1,240 @@
+# backend/app/result_cache.py
+
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import BinaryIO, Callable, Dict, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app import (
+    anomaly_engine, cycle_detector, explanation_engine, graph_engine, pipeline, ring_cases, risk_engine,
+    shell_detector, smurf_detector, validator
+)
+from app.analysis_store import remove_analyses, store_bytes
+from app.score_artifacts import artifact_bytes, remove_artifacts
+from app.validator import with_validation
+
+# Bump when the response or the detectors change in ways the parameters don't capture
+CACHE_VERSION = 6
+
+RESULT_CACHE_ENTRIES = int(os.getenv("RESULT_CACHE_ENTRIES", 32))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fintrace-cache"))
+RESULT_CACHE_DISK_MB = float(os.getenv("RESULT_CACHE_DISK_MB", 512))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", 24 * 3600))
+
+HASH_BLOCK_BYTES = 1 << 20
+
+# key -> (time the result was stored, result); the TTL runs from the store time, like its artifacts
+_memory: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def detector_parameters() -> Dict:
+    """Every setting that changes the /analyze output for the same upload."""
+    return {
+        "version": CACHE_VERSION,
+        "cycles": [cycle_detector.MIN_CYCLE_LENGTH, cycle_detector.MAX_CYCLE_LENGTH,
+                   cycle_detector.MAX_CYCLE_RINGS, cycle_detector.REQUIRE_TIME_ORDER,
+                   cycle_detector.CYCLE_WINDOW_SECONDS, cycle_detector.CYCLE_MIN_PASS_THROUGH],
+        "smurfing": [smurf_detector.WINDOW_HOURS, smurf_detector.MIN_UNIQUE_ACCOUNTS,
+                     smurf_detector.MIN_TOTAL_AMOUNT, smurf_detector.MAX_AMOUNT_STD],
+        "shell": [shell_detector.MIN_HOPS, shell_detector.MAX_HOPS, shell_detector.MAX_PATHS_PER_SOURCE,
+                  shell_detector.CHAIN_WINDOW_SECONDS, shell_detector.MIN_PASS_THROUGH_RATIO,
+                  shell_detector.MAX_RETENTION_RATIO],
+        "centrality": [graph_engine.CENTRALITY_STRATEGY, graph_engine.EXACT_MAX_NODES,
+                       graph_engine.PARALLEL_EXACT_MAX_NODES, graph_engine.BETWEENNESS_PIVOTS,
+                       graph_engine.BETWEENNESS_SEED],
+        "anomaly": [anomaly_engine.ANOMALY_MODE, anomaly_engine.MODEL_VERSION, anomaly_engine.CONTAMINATION,
+                    anomaly_engine.FIT_SAMPLE_SIZE, _model_mtime()],
+        "risk": [risk_engine.SHELL_SEVERITY, risk_engine.CYCLE_SEVERITY, risk_engine.FAN_SEVERITY,
+                 risk_engine.OTHER_PATTERN_SEVERITY, risk_engine.RISK_WEIGHTS, pipeline.SUSPICIOUS_SCORE_THRESHOLD,
+                 pipeline.ANOMALY_REPORT_THRESHOLD, explanation_engine.EXPLAIN_SCORE_THRESHOLD],
+        "rings": [ring_cases.RING_CONSOLIDATION, ring_cases.RING_CASE_MIN_OVERLAP, ring_cases.RING_CASE_MAX_ACCOUNTS],
+        "validation": [validator.MAX_REPORTED_ROWS]
+    }
+
+
+def _model_mtime():
+    # A retrained persistent model invalidates results scored with the old one
+    if anomaly_engine.ANOMALY_MODE != "persistent":
+        return None
+    try:
+        return os.path.getmtime(anomaly_engine.ANOMALY_MODEL_PATH)
+    except OSError:
+        return None
+
+
+def cache_key(source: BinaryIO, on_invalid: str = None) -> str:
+    """SHA-256 over the raw upload bytes, the detector parameters and the invalid-row mode."""
+    parameters = {**detector_parameters(), "invalid_rows": validator.invalid_row_mode(on_invalid)}
+    digest = hashlib.sha256(json.dumps(parameters, sort_keys=True).encode())
+    source.seek(0)
+    for block in iter(lambda: source.read(HASH_BLOCK_BYTES), b""):
+        digest.update(block)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+def _disk_path(key: str) -> str:
+    return os.path.join(RESULT_CACHE_DIR, f"{key}.json.gz")
+
+
+def _remember(key: str, result: Dict, stored_at: float):
+    with _lock:
+        _memory[key] = (stored_at, result)
+        _memory.move_to_end(key)
+        while len(_memory) > RESULT_CACHE_ENTRIES:
+            _memory.popitem(last=False)
+
+
+def _forget(keys):
+    with _lock:
+        for key in keys:
+            _memory.pop(key, None)
+
+
+def get_cached(key: str) -> Optional[Dict]:
+    now = time.time()
+    with _lock:
+        entry = _memory.get(key)
+        if entry is not None:
+            if now - entry[0] <= RESULT_CACHE_TTL_SECONDS:
+                _memory.move_to_end(key)
+                return entry[1]
+            # Expired: its artifacts and drill-down store are swept at the same age
+            del _memory[key]
+
+    # Fall back to the disk store. mtime is when the result was stored, atime when it was last used
+    path = _disk_path(key)
+    try:
+        stored_at = os.path.getmtime(path)
+        if now - stored_at > RESULT_CACHE_TTL_SECONDS:
+            os.remove(path)
+            _remove_extras(key)
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            result = json.load(f)
+        os.utime(path, (now, stored_at)) # Recently used entries are evicted last
+    except (OSError, ValueError):
+        return None
+
+    _remember(key, result, stored_at)
+    return result
+
+
+def put_cached(key: str, result: Dict) -> Dict:
+    result = jsonable_encoder(result)
+    _remember(key, result, time.time())
+
+    try:
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=RESULT_CACHE_DIR, suffix=".tmp")
+        with gzip.open(os.fdopen(fd, "wb"), "wt", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, _disk_path(key))
+        _evict_disk()
+    except OSError:
+        pass # The disk store is best-effort; the memory entry still serves hits
+
+    return result
+
+
+def _extras_bytes(key: str) -> int:
+    return artifact_bytes(key) + store_bytes(key)
+
+
+def _remove_extras(key: Optional[str] = None, older_than: float = None):
+    # What an entry keeps beside its result: /rescore artifacts and the drill-down store
+    remove_artifacts(key, older_than=older_than)
+    remove_analyses(key, older_than=older_than)
+
+
+def _evict_disk():
+    """
+    Drops expired entries, then least recently used ones above the size cap.
+    An entry's /rescore artifacts and stored analysis count towards its
+    size and go with it, and so does its memory copy.
+    """
+    now = time.time()
+    entries = []
+    for name in os.listdir(RESULT_CACHE_DIR):
+        if not name.endswith(".json.gz"):
+            continue
+        path = os.path.join(RESULT_CACHE_DIR, name)
+        key = name[:-len(".json.gz")]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        if now - stat.st_mtime > RESULT_CACHE_TTL_SECONDS:
+            os.remove(path)
+            _remove_extras(key)
+            _forget([key])
+        else:
+            entries.append((stat.st_atime, stat.st_size + _extras_bytes(key), path, key))
+
+    entries.sort()
+    total = sum(size for _, size, _, _ in entries)
+    for _, size, path, key in entries:
+        if total <= RESULT_CACHE_DISK_MB * 1024 * 1024:
+            break
+        os.remove(path)
+        _remove_extras(key)
+        _forget([key])
+        total -= size
+
+    # Extras whose result never reached the disk store
+    _remove_extras(older_than=RESULT_CACHE_TTL_SECONDS)
+
+
+def invalidate(key: Optional[str] = None) -> int:
+    """Removes one entry (or everything when key is None); returns the entries removed."""
+    with _lock:
+        keys = [key] if key is not None else list(_memory)
+        removed = {k for k in keys if _memory.pop(k, None) is not None}
+
+    _remove_extras(key)
+    if os.path.isdir(RESULT_CACHE_DIR):
+        names = [f"{key}.json.gz"] if key is not None else os.listdir(RESULT_CACHE_DIR)
+        for name in names:
+            if name.endswith(".json.gz"):
+                try:
+                    os.remove(os.path.join(RESULT_CACHE_DIR, name))
+                    removed.add(name[:-len(".json.gz")])
+                except OSError:
+                    pass
+
+    return len(removed)
+
+
+def with_cache_status(result: Dict, key: str, hit: bool) -> Dict:
+    """Shallow copy of a (possibly shared) result tagged with its cache status."""
+    return {**result, "summary": {**result["summary"], "cache_hit": hit, "cache_key": key}}
+
+
+async def analyze_and_cache(
+    df,
+    key: str,
+    validation: Optional[Dict] = None,
+    start_time: float = None,
+    progress: Callable[[str, str], None] = None,
+    timings: List[Dict] = None
+) -> Dict:
+    """
+    Analyses an upload that missed the cache (shared by /analyze and
+    /jobs). The score artifacts and drill-down store are kept under key,
+    the validation report is added, and the result is cached and tagged
+    as a miss.
+    """
+    result = await pipeline.run_analysis(df, start_time, progress=progress, timings=timings, artifact_key=key)
+    result = with_validation(result, validation)
+    # Timings describe this run only, so they are never cached
+    result = await asyncio.to_thread(put_cached, key, result)
+    return with_cache_status(result, key, hit=False)
@@ -0,0 +1,169 @@
+# backend/app/ring_cases.py
+
+import os
+from typing import Dict, Iterable, List, Mapping
+
+import numpy as np
+import pandas as pd
+
+from app.risk_engine import pattern_severity
+
+# "cases" merges rings that share members into one finding; "off" reports every detector ring as-is
+RING_CONSOLIDATION = os.getenv("RING_CONSOLIDATION", "cases").lower()
+RING_CONSOLIDATION_MODES = ("cases", "off")
+# A ring joins a case when this share of the smaller side's (non-hub) accounts is shared...
+RING_CASE_MIN_OVERLAP = float(os.getenv("RING_CASE_MIN_OVERLAP", 0.2))
+# ...and the case stays within this many accounts; rings that fail either start their own case
+RING_CASE_MAX_ACCOUNTS = int(os.getenv("RING_CASE_MAX_ACCOUNTS", 50))
+
+
+def _case_labels(rings: List[Dict], hubs: set, min_overlap: float, max_accounts: int) -> np.ndarray:
+    """
+    The case of every ring, labelled by the case's first ring. Rings are
+    taken in order; each joins the earliest case it overlaps enough with
+    and still fits, and then pulls in any other such case that fits too.
+    Merging stays local, so a dense block of background cycles splits
+    into bounded cases instead of chaining into one.
+    """
+    cases_of: Dict[str, set] = {}   # linking account -> open cases it is in
+    members: Dict[int, set] = {}    # open case -> all its accounts (hubs included)
+    n_linking: Dict[int, int] = {}  # open case -> how many of them are not hubs
+    parent = list(range(len(rings)))
+
+    def find(case: int) -> int:
+        while parent[case] != case:
+            parent[case] = parent[parent[case]]
+            case = parent[case]
+        return case
+
+    def absorb(case: int, accounts: set):
+        added = accounts - members[case]
+        members[case] |= added
+        n_linking[case] += len(added - hubs)
+
+    for i, ring in enumerate(rings):
+        accounts = set(ring["member_accounts"])
+        linking = accounts - hubs
+        # Linking accounts shared with every case the ring touches
+        shared: Dict[int, int] = {}
+        for acc in linking:
+            for case in cases_of.get(acc, ()):
+                shared[case] = shared.get(case, 0) + 1
+        ring_hubs = accounts - linking
+
+        target = None
+        for case in sorted(shared):
+            common = shared[case] + (len(ring_hubs & members[case]) if ring_hubs else 0)
+            if len(members[case]) + len(accounts) - common > max_accounts:
+                continue
+            if shared[case] < min_overlap * min(len(linking), n_linking[case]):
+                continue
+            if target is None:
+                target = case
+                absorb(target, accounts)
+            elif len(members[target]) + len(members[case] - members[target]) <= max_accounts:
+                parent[case] = target
+                absorbed = members.pop(case)
+                del n_linking[case]
+                for acc in absorbed - hubs:
+                    cases_of[acc].discard(case)
+                    cases_of[acc].add(target)
+                absorb(target, absorbed)
+        if target is None:
+            target = i
+            members[target], n_linking[target] = accounts, len(linking)
+        parent[i] = target
+        for acc in linking:
+            cases_of.setdefault(acc, set()).add(target)
+
+    return np.array([find(i) for i in range(len(rings))], dtype=np.int64)
+
+
+def consolidate_rings(
+    rings: List[Dict],
+    mode: str = None,
+    hubs: Iterable[str] = (),
+    min_overlap: float = None,
+    max_accounts: int = None
+) -> List[Dict]:
+    """
+    Cases from the cycle / smurfing / shell rings: a ring joins a case it
+    shares at least min_overlap of the smaller side's accounts with, as
+    long as the case stays within max_accounts; otherwise it starts its
+    own case. Hub accounts (see graph_engine.find_hubs) sit on many
+    unrelated flows, so sharing a hub does not merge rings; a hub is
+    listed in every case one of its rings ends up in. Each case lists its
+    accounts in first-seen order, keeps its source rings (ring_id,
+    pattern_type, members) and counts them per pattern type; its
+    pattern_type is the most severe of them. Cases are numbered in the
+    order of their first ring.
+    """
+    mode = mode or RING_CONSOLIDATION
+    if mode not in RING_CONSOLIDATION_MODES:
+        raise ValueError(f"Unknown ring consolidation mode: {mode} (expected one of {', '.join(RING_CONSOLIDATION_MODES)})")
+    if mode == "off" or not rings:
+        return [dict(ring) for ring in rings]
+    min_overlap = RING_CASE_MIN_OVERLAP if min_overlap is None else min_overlap
+    max_accounts = RING_CASE_MAX_ACCOUNTS if max_accounts is None else max_accounts
+
+    # 1. Case per ring, labelled by its first ring
+    n_rings = len(rings)
+    sizes = np.fromiter((len(ring["member_accounts"]) for ring in rings), dtype=np.int64, count=n_rings)
+    codes, accounts = pd.factorize(
+        np.fromiter((acc for ring in rings for acc in ring["member_accounts"]), dtype=object, count=int(sizes.sum()))
+    )
+    accounts = np.asarray(accounts, dtype=object)
+    pair_ring = np.repeat(np.arange(n_rings), sizes)
+    labels = _case_labels(rings, set(hubs), min_overlap, max_accounts)
+    first_rings, ring_case = np.unique(labels, return_inverse=True)
+
+    # 2. Members per case in first-seen order: the first pair of every (case, account)
+    pair_case = ring_case[pair_ring]
+    _, first = np.unique(pair_case * len(accounts) + codes, return_index=True)
+    first = np.sort(first)
+    order = first[np.argsort(pair_case[first], kind="stable")]
+    bounds = np.cumsum(np.bincount(pair_case[order], minlength=len(first_rings)))[:-1]
+    members = np.split(accounts[codes[order]], bounds)
+
+    # 3. Source rings and pattern counts per case, in the order the rings were found
+    sources = [[] for _ in range(len(first_rings))]
+    patterns = [{} for _ in range(len(first_rings))]
+    for case, ring in zip(ring_case.tolist(), rings):
+        sources[case].append({key: ring[key] for key in ("ring_id", "pattern_type", "member_accounts")})
+        found = patterns[case]
+        found[ring["pattern_type"]] = found.get(ring["pattern_type"], 0) + 1
+
+    return [
+        {
+            "ring_id": f"CASE_{case + 1:03d}",
+            # Ties go to the pattern with more rings, then to the one found first
+            "pattern_type": max(found, key=lambda pattern: (pattern_severity(pattern), found[pattern])),
+            "member_accounts": case_members.tolist(),
+            "patterns": found,
+            "ring_count": sum(found.values()),
+            "rings": case_rings
+        }
+        for case, (case_members, found, case_rings) in enumerate(zip(members, patterns, sources))
+    ]
+
+
+def _risk_score(members: List[str], scores: Mapping[str, float]) -> float:
+    return round(sum(scores.get(acc, 0.0) for acc in members) / len(members) / 100, 3) if members else 0.0
+
+
+def score_rings(rings: List[Dict], scores: Mapping[str, float]) -> List[Dict]:
+    """
+    Rings / cases with their risk_score: the members' mean suspicion score
+    (0-100, as reported) on a 0-1 scale. A case's source rings get their
+    own. One hash lookup per member.
+    """
+    return [
+        {
+            **ring,
+            "risk_score": _risk_score(ring["member_accounts"], scores),
+            **({"rings": [
+                {**source, "risk_score": _risk_score(source["member_accounts"], scores)} for source in ring["rings"]
+            ]} if "rings" in ring else {})
+        }
+        for ring in rings
+    ]
@@ -1,77 +1,134 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+from typing import Dict, List, Union
 
-def calculate_final_scores(
+from app.context import AnalysisContext
+from app.transaction_index import TransactionIndex
+
+# Pattern severity (0-1); the most severe pattern an account is part of wins
+SHELL_SEVERITY = 0.9
+CYCLE_SEVERITY = 0.7
+FAN_SEVERITY = 0.6
+OTHER_PATTERN_SEVERITY = 0.4
+
+# Weighted risk model: component -> weight
+RISK_WEIGHTS = {
+    "graph_risk": 0.4,
+    "anomaly_score": 0.3,
+    "pattern_risk": 0.2,
+    "velocity_risk": 0.1
+}
+
+SCORE_COLUMNS = ["score", "confidence", "graph_risk", "anomaly_score", "pattern_risk", "velocity_risk"]
+
+
+def pattern_severity(pattern_type: str) -> float:
+    if pattern_type == "layered_shell": return SHELL_SEVERITY
+    if "cycle" in pattern_type: return CYCLE_SEVERITY
+    if "fan" in pattern_type: return FAN_SEVERITY
+    return OTHER_PATTERN_SEVERITY
+
+
+def _lookup(values, accounts: pd.Index) -> np.ndarray:
+    """Align an account-keyed mapping / Series onto the account table (missing -> 0)."""
+    series = values if isinstance(values, pd.Series) else pd.Series(values, dtype=float)
+    if series.empty:
+        return np.zeros(len(accounts))
+    return series.reindex(accounts).fillna(0).to_numpy(dtype=float)
+
+
+def weighted_score(components, weights: Dict[str, float] = None) -> np.ndarray:
+    """Raw (0-1 scale) score from the component columns of a score table or a mapping of arrays."""
+    weights = {**RISK_WEIGHTS, **(weights or {})}
+    raw_score = 0
+    for component, weight in weights.items():
+        raw_score = raw_score + np.asarray(components[component]) * weight
+    return raw_score
+
+
+def build_score_table(
     accounts: List[str],
     graph_intelligence: Dict,
     anomaly_results: pd.DataFrame,
     pattern_rings: List[Dict],
-    df: pd.DataFrame
-) -> Dict:
+    df: pd.DataFrame,
+    index: TransactionIndex = None,
+    txn_counts: pd.Series = None,
+    context: AnalysisContext = None
+) -> pd.DataFrame:
     """
-    Weighted Risk Model:
-    40% Graph Structure | 30% Anomaly Score | 20% Pattern Severity | 10% Velocity
+    Columnar version of the weighted risk model: one row per account,
+    every component computed as a vector over the account table.
+    Precomputed per-account transaction counts can stand in for the index.
+    The pattern map (and index, when not passed) come from the context.
     """
-    final_scores = {}
-    
-    # Pre-parse patterns for lookup
-    account_patterns = {}
-    for ring in pattern_rings:
-        for acc in ring["member_accounts"]:
-            if acc not in account_patterns:
-                account_patterns[acc] = []
-            account_patterns[acc].append(ring["pattern_type"])
-
-    # Graph metrics
-    bt = graph_intelligence["centrality"]["betweenness"]
-    pr = graph_intelligence["centrality"]["pagerank"]
-    hubs = set(graph_intelligence["hubs"])
-    
-    # Velocity calculation (spike in last 24h of data)
+    context = (context or AnalysisContext()).setdefault(df=df, rings=pattern_rings)
+    if index is None and txn_counts is None:
+        index = context.index
+
+    acc_index = pd.Index(accounts)
+
+    # 1. Graph Structure Risk (0-1)
+    # Combination of centrality and hub status
+    bt = _lookup(graph_intelligence["centrality"]["betweenness"], acc_index)
+    pr = _lookup(graph_intelligence["centrality"]["pagerank"], acc_index)
+    g_risk = bt * 0.5 + pr * 0.5
+    is_hub = acc_index.isin(graph_intelligence["hubs"])
+    g_risk = np.where(is_hub, np.maximum(g_risk, 0.8), g_risk)
+    g_risk = np.minimum(g_risk * 10, 1.0) # Scale up
+
+    # 2. Anomaly Score (0-1)
+    a_risk = _lookup(anomaly_results["anomaly_score"], acc_index)
+
+    # 3. Pattern Severity (0-1)
+    severity = {}
+    worst = {}
+    for acc, patterns in context.pattern_map.items():
+        for pattern_type in patterns:
+            if pattern_type not in severity:
+                severity[pattern_type] = pattern_severity(pattern_type)
+        worst[acc] = max(severity[pattern_type] for pattern_type in patterns)
+    p_risk = _lookup(worst, acc_index)
+
+    # 4. Velocity Spike (0-1)
+    # Spike in last 24h of data
     max_time = df["timestamp"].max()
     spike_window = df[df["timestamp"] > (max_time - pd.Timedelta(hours=24))]
-    spikes = spike_window.groupby("sender_id").size().to_dict()
-
-    for acc in accounts:
-        # 1. Graph Structure Risk (0-1)
-        # Combination of centrality and hub status
-        g_risk = (bt.get(acc, 0) * 0.5 + pr.get(acc, 0) * 0.5)
-        if acc in hubs: g_risk = max(g_risk, 0.8)
-        g_risk = min(g_risk * 10, 1.0) # Scale up
-        
-        # 2. Anomaly Score (0-1)
-        a_risk = anomaly_results.loc[acc, "anomaly_score"] if acc in anomaly_results.index else 0
-        
-        # 3. Pattern Severity (0-1)
-        patterns = account_patterns.get(acc, [])
-        p_risk = 0
-        if "layered_shell" in patterns: p_risk = 0.9
-        elif any("cycle" in p for p in patterns): p_risk = 0.7
-        elif any("fan" in p for p in patterns): p_risk = 0.6
-        elif patterns: p_risk = 0.4
-        
-        # 4. Velocity Spike (0-1)
-        v_count = spikes.get(acc, 0)
-        v_risk = min(v_count / 20, 1.0) # 20+ txns in 24h is high risk
-        
-        # WEIGHTED CALCULATION
-        raw_score = (
-            (g_risk * 0.4) +
-            (a_risk * 0.3) +
-            (p_risk * 0.2) +
-            (v_risk * 0.1)
-        )
-        
-        # Normalize to 0-100
-        final_score = round(raw_score * 100, 2)
-        
-        # Confidence score (How much data do we have for this account?)
-        total_txns = len(df[(df["sender_id"] == acc) | (df["receiver_id"] == acc)])
-        confidence = min(total_txns / 5, 1.0) # Need 5+ txns for high confidence
-        
+    spikes = spike_window.groupby("sender_id", observed=True).size()
+    v_risk = np.minimum(_lookup(spikes, acc_index) / 20, 1.0) # 20+ txns in 24h is high risk
+
+    # Confidence score (How much data do we have for this account?)
+    counts = _lookup(txn_counts, acc_index) if txn_counts is not None else index.txn_counts(acc_index)
+    confidence = np.minimum(counts / 5, 1.0) # Need 5+ txns for high confidence
+
+    table = pd.DataFrame({
+        "confidence": confidence,
+        "graph_risk": g_risk,
+        "anomaly_score": a_risk,
+        "pattern_risk": p_risk,
+        "velocity_risk": v_risk
+    }, index=acc_index)
+
+    # WEIGHTED CALCULATION
+    table.insert(0, "raw_score", weighted_score(table))
+    return table
+
+
+def risk_records(table: pd.DataFrame) -> Dict:
+    """Per-account score dicts (0-100 score, rounded breakdown) from a score table, in its order."""
+    final_scores = {}
+    rows = zip(
+        table.index,
+        table["raw_score"].tolist(),
+        table["confidence"].tolist(),
+        table["graph_risk"].tolist(),
+        table["anomaly_score"].tolist(),
+        table["pattern_risk"].tolist(),
+        table["velocity_risk"].tolist()
+    )
+    for acc, raw_score, confidence, g_risk, a_risk, p_risk, v_risk in rows:
         final_scores[acc] = {
-            "score": final_score,
+            "score": round(raw_score * 100, 2), # Normalize to 0-100
             "confidence": round(confidence, 2),
             "breakdown": {
                 "graph_risk": round(g_risk, 2),
@@ -80,5 +137,36 @@ def calculate_final_scores(
                 "velocity_risk": round(v_risk, 2)
             }
         }
-        
     return final_scores
+
+
+def calculate_final_scores(
+    accounts: List[str],
+    graph_intelligence: Dict,
+    anomaly_results: pd.DataFrame,
+    pattern_rings: List[Dict],
+    df: pd.DataFrame,
+    index: TransactionIndex = None,
+    as_table: bool = False,
+    txn_counts: pd.Series = None,
+    context: AnalysisContext = None
+) -> Union[Dict, pd.DataFrame]:
+    """
+    Weighted Risk Model:
+    40% Graph Structure | 30% Anomaly Score | 20% Pattern Severity | 10% Velocity
+
+    With as_table=True the scores are returned as an account-indexed
+    DataFrame (SCORE_COLUMNS, normalized to 0-100 and rounded) instead of
+    per-account dicts.
+    """
+    table = build_score_table(
+        accounts, graph_intelligence, anomaly_results, pattern_rings, df, index=index, txn_counts=txn_counts,
+        context=context
+    )
+
+    if as_table:
+        scored = table.drop(columns="raw_score").round(2)
+        scored.insert(0, "score", (table["raw_score"] * 100).round(2))
+        return scored[SCORE_COLUMNS]
+
+    return risk_records(table)
@@ -0,0 +1,34 @@
+# backend/app/schemas.py
+
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class SummarizeRequest(BaseModel):
+    total_accounts: int = 0
+    fraud_rings: int = 0
+    suspicious_accounts: int = 0
+    avg_risk_score: float = 0.0
+    processing_time: float = 0.0
+    rings_detail: str = ""
+    top_flagged_reasons: str = ""
+    graph_hubs: str = ""
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ChatRequest(BaseModel):
+    messages: list[ChatMessage]
+    context: dict
+
+
+class RescoreRequest(BaseModel):
+    analysis_id: str
+    weights: Optional[Dict[str, float]] = None
+    suspicious_threshold: Optional[float] = None
+    explain_threshold: Optional[float] = None
+    anomaly_threshold: Optional[float] = None
@@ -0,0 +1,167 @@
+# backend/app/score_artifacts.py
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Where /rescore inputs are kept: one directory of .npy files per analysis ID (the result-cache key)
+SCORE_ARTIFACT_DIR = os.getenv("SCORE_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "fintrace-artifacts"))
+ARTIFACT_VERSION = 1 # Bump when the saved layout changes
+
+# Unrounded per-account score components (see risk_engine.build_score_table)
+COMPONENT_COLUMNS = ["confidence", "graph_risk", "anomaly_score", "pattern_risk", "velocity_risk"]
+
+META_FILE = "meta.json"
+
+
+def _artifact_path(key: str, directory: str = None) -> str:
+    return os.path.join(directory or SCORE_ARTIFACT_DIR, key)
+
+
+def _string_column(values: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """Arrow-style string column: int64 offsets into one UTF-8 byte buffer."""
+    encoded = [str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class ScoreArtifacts:
+    """
+    One analysis' rescoring inputs, memory-mapped read-only. Per account
+    (graph node order): the score components, a hub flag, its ID and its
+    pattern types (CSR, codes into meta["patterns"]); plus the node
+    positions of the anomaly table in its original order.
+    """
+
+    def __init__(self, directory: str, meta: Dict):
+        self.meta = meta
+        # Plain ndarray views of the maps: np.memmap indexing is far slower per call
+        self.arrays = {
+            name[:-len(".npy")]: np.asarray(np.load(os.path.join(directory, name), mmap_mode="r"))
+            for name in os.listdir(directory) if name.endswith(".npy")
+        }
+
+    def __len__(self) -> int:
+        return self.meta["accounts"]
+
+    def accounts(self, positions: np.ndarray) -> List[str]:
+        offsets, data = self.arrays["account_offsets"], memoryview(self.arrays["account_bytes"])
+        starts, ends = offsets[positions].tolist(), offsets[positions + 1].tolist()
+        return [str(data[start:end], "utf-8") for start, end in zip(starts, ends)]
+
+    def patterns(self, positions: np.ndarray) -> Dict[int, List[str]]:
+        """Pattern types of the given accounts that have any, by position."""
+        ptr, codes = self.arrays["pattern_ptr"], self.arrays["pattern_codes"]
+        names = self.meta["patterns"]
+        starts, ends = ptr[positions], ptr[positions + 1]
+        has = ends > starts
+        return {
+            pos: [names[code] for code in codes[start:end].tolist()]
+            for pos, start, end in zip(positions[has].tolist(), starts[has].tolist(), ends[has].tolist())
+        }
+
+
+def save_artifacts(
+    key: str,
+    table: pd.DataFrame,
+    anomaly_results: pd.DataFrame,
+    pattern_map: Dict[str, List[str]],
+    hubs: Iterable,
+    directory: str = None
+):
+    """
+    Writes what /rescore needs from a finished analysis: the score table
+    (one row per account, COMPONENT_COLUMNS), the anomaly table's order,
+    the pattern map and the hubs. Replaces any earlier copy.
+    """
+    accounts = table.index
+    arrays = {column: table[column].to_numpy(dtype=float) for column in COMPONENT_COLUMNS}
+    arrays["is_hub"] = accounts.isin(list(hubs))
+    arrays["account_offsets"], arrays["account_bytes"] = _string_column(accounts)
+
+    # Pattern types per account, in ring order
+    names = sorted({pattern for patterns in pattern_map.values() for pattern in patterns})
+    codes = {name: i for i, name in enumerate(names)}
+    members = [
+        (pos, patterns) for pos, patterns in zip(accounts.get_indexer(list(pattern_map)).tolist(), pattern_map.values())
+        if pos >= 0
+    ]
+    counts = np.zeros(len(accounts), dtype=np.int64)
+    for pos, patterns in members:
+        counts[pos] = len(patterns)
+    ptr = np.zeros(len(accounts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=ptr[1:])
+    pattern_codes = np.empty(ptr[-1], dtype=np.int32)
+    for pos, patterns in members:
+        pattern_codes[ptr[pos]:ptr[pos + 1]] = [codes[pattern] for pattern in patterns]
+    arrays["pattern_ptr"], arrays["pattern_codes"] = ptr, pattern_codes
+
+    # The anomaly list keeps the anomaly table's own (sorted) account order
+    order = accounts.get_indexer(anomaly_results.index)
+    arrays["anomaly_order"] = order[order >= 0].astype(np.int64)
+
+    meta = {"version": ARTIFACT_VERSION, "accounts": len(accounts), "patterns": names}
+
+    # Written aside, then moved in place, so readers never see a partial set
+    directory = directory or SCORE_ARTIFACT_DIR
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=directory, suffix=".tmp")
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp_path, f"{name}.npy"), np.ascontiguousarray(values))
+    with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    path = _artifact_path(key, directory)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+
+
+def load_artifacts(key: str, directory: str = None) -> Optional[ScoreArtifacts]:
+    """The saved artifacts, or None if missing or written with another layout version."""
+    path = _artifact_path(key, directory)
+    try:
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != ARTIFACT_VERSION:
+            return None
+        return ScoreArtifacts(path, meta)
+    except (OSError, ValueError):
+        return None
+
+
+def artifact_bytes(key: str, directory: str = None) -> int:
+    path = _artifact_path(key, directory)
+    try:
+        return sum(entry.stat().st_size for entry in os.scandir(path))
+    except OSError:
+        return 0
+
+
+def remove_artifacts(key: Optional[str] = None, older_than: float = None, directory: str = None) -> int:
+    """
+    Removes one analysis' artifacts, or (key None) every set, optionally
+    only those last written more than older_than seconds ago. Returns the
+    sets removed.
+    """
+    directory = directory or SCORE_ARTIFACT_DIR
+    if not os.path.isdir(directory):
+        return 0
+    names = [key] if key is not None else os.listdir(directory)
+    now = time.time()
+    removed = 0
+    for name in names:
+        path = _artifact_path(name, directory)
+        try:
+            if not os.path.isdir(path) or (older_than is not None and now - os.path.getmtime(path) <= older_than):
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
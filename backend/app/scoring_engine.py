@@ -1,13 +1,27 @@
 import networkx as nx
 import numpy as np
 
+from app.context import AnalysisContext
+from app.transaction_index import TransactionIndex, NS_PER_SECOND
 
-def compute_suspicion_scores(G, df, rings):
 
+def compute_suspicion_scores(G, df, rings, index: TransactionIndex = None, context: AnalysisContext = None):
+    """
+    Per-member ring scores. Centrality and the transaction index come
+    from the context when it holds them (e.g. the graph intelligence
+    stage's PageRank / betweenness) instead of being recomputed.
+    """
     scores = {}
 
-    pagerank = nx.pagerank(G)
-    betweenness = nx.betweenness_centrality(G)
+    context = (context or AnalysisContext()).setdefault(df=df, index=index)
+    index = context.index
+
+    if context.has("centrality") or context.has("graph_intel"):
+        pagerank = context.centrality["pagerank"]
+        betweenness = context.centrality["betweenness"]
+    else:
+        pagerank = nx.pagerank(G)
+        betweenness = nx.betweenness_centrality(G)
 
     for ring in rings:
 
@@ -23,18 +37,16 @@ def compute_suspicion_scores(G, df, rings):
         else:
             base_weight = 20
 
-        sub_df = df[
-            (df["sender_id"].isin(members)) &
-            (df["receiver_id"].isin(members))
-        ]
+        # Intra-ring transactions, already time sorted
+        positions = index.positions_among(members)
 
-        avg_amount = sub_df["amount"].mean()
+        avg_amount = index.amounts[positions].mean() if len(positions) else np.nan
         amount_score = min(avg_amount / 200, 20)
 
-        timestamps = sub_df["timestamp"].sort_values()
+        timestamps = index.times[positions]
         if len(timestamps) > 1:
             duration_hours = (
-                (timestamps.iloc[-1] - timestamps.iloc[0]).total_seconds()
+                (timestamps[-1] - timestamps[0]) / NS_PER_SECOND
                 / 3600
             )
             velocity_score = max(0, 15 - duration_hours)
@@ -1,85 +1,96 @@
+import os
+
+import numpy as np
 import pandas as pd
 import networkx as nx
-from typing import List, Dict
+from typing import List, Dict, Tuple, Union
+
+from app.compact_graph import CompactGraph, as_compact
+from app.context import AnalysisContext
+from app.temporal_graph import TemporalEdges, TemporalSearch
+from app.transaction_index import TransactionIndex, NS_PER_SECOND
+
+MIN_HOPS = 3                   # A -> B -> C -> D
+MAX_HOPS = 4                   # AML standard depth limit
+MAX_PATHS_PER_SOURCE = 500     # Cap on validated chains explored from one source
+CHAIN_WINDOW_SECONDS = 48 * 3600
+# Each hop must forward at least this share of what the previous hop brought in
+MIN_PASS_THROUGH_RATIO = float(os.getenv("SHELL_MIN_PASS_THROUGH", 0.5))
+MAX_RETENTION_RATIO = 0.15
 
-def detect_shell_networks(G: nx.DiGraph, df: pd.DataFrame) -> List[Dict]:
+
+def find_pass_through_accounts(cg: CompactGraph, df: pd.DataFrame = None, context: AnalysisContext = None) -> np.ndarray:
     """
-    Detects multi-hop laundering patterns (A -> B -> C -> D).
-    Focuses on 'pass-through' accounts with low retention and high velocity.
+    Pass-through accounts receive and forward almost everything they get.
+    Returns a boolean mask over the compact graph's account codes. The
+    in / out sums come from the context's account features when given.
+    """
+    features = (context or AnalysisContext()).setdefault(df=df).account_features.reindex(cg.ids)
+    received = features["in_sum"].to_numpy(dtype=float)
+    sent = features["out_sum"].to_numpy(dtype=float)
+    both_sides = (features["in_count"].to_numpy() > 0) & (features["out_count"].to_numpy() > 0)
+
+    # If retention is low (sent ~ received)
+    retention_ratio = np.abs(received - sent) / np.maximum(received, 1)
+    return both_sides & (retention_ratio < MAX_RETENTION_RATIO)
+
+
+def chain_search(cg: CompactGraph, df: pd.DataFrame = None, index: TransactionIndex = None) -> TemporalSearch:
+    """
+    Time-respecting chain search over a CompactGraph: its own transactions
+    when it carries them, otherwise df's (or the index's).
+    """
+    temporal = cg.temporal
+    if temporal is None:
+        temporal = TemporalEdges.from_index(cg, index) if index is not None else TemporalEdges.from_frame(cg, df)
+    return TemporalSearch(cg, CHAIN_WINDOW_SECONDS * NS_PER_SECOND, MIN_PASS_THROUGH_RATIO, temporal=temporal)
+
+
+def shell_candidates(
+    cg: CompactGraph,
+    potential_mules: List[bool],
+    search: TemporalSearch,
+    max_depth: int = MAX_HOPS,
+    max_paths_per_source: int = MAX_PATHS_PER_SOURCE
+) -> List[Tuple[int, List[List[int]]]]:
+    """
+    Validated chains as (source code, code paths): sources in node order,
+    each source's paths ordered by target (the old pairwise search order).
+    """
+    # One bounded walk per source through the mule subgraph. Each hop is a
+    # transaction no earlier than the previous one, inside the 48h window,
+    # forwarding at least MIN_PASS_THROUGH_RATIO of what came in; anything
+    # else is pruned while walking.
+    rank = np.empty(cg.n_nodes, dtype=np.int64)
+    rank[cg.node_order] = np.arange(cg.n_nodes)
+    rank = rank.tolist()
+    candidates = []
+    for source in cg.node_order.tolist():
+        paths = search.paths(source, max_depth, MIN_HOPS, relay=potential_mules, max_paths=max_paths_per_source)
+        if paths:
+            paths.sort(key=lambda p: rank[p[-1]])
+            candidates.append((source, paths))
+    return candidates
+
+
+def number_shell_rings(paths) -> Tuple[List[Dict], int]:
+    """
+    Numbers candidate paths (account lists, in candidate order) as
+    RING_SHELL_### rings and keeps the longest non-overlapping ones.
+    Returns (rings, candidate count).
     """
     shell_rings = []
     ring_counter = 1
-    
-    # 1. Identify potential pass-through nodes
-    # Criteria: In-degree > 0 AND Out-degree > 0 AND low retention
-    potential_mules = []
-    
-    # Pre-calculate in/out sums for performance
-    in_sums = df.groupby("receiver_id")["amount"].sum()
-    out_sums = df.groupby("sender_id")["amount"].sum()
-    
-    for node in G.nodes():
-        if node in in_sums and node in out_sums:
-            received = in_sums[node]
-            sent = out_sums[node]
-            
-            # If retention is low (sent ~ received) and count is high
-            retention_ratio = abs(received - sent) / max(received, 1)
-            if retention_ratio < 0.15: # Retains less than 15%
-                potential_mules.append(node)
-    
-    # 2. Find paths through these mules
-    # We look for simple paths in the graph where intermediate nodes are in potential_mules
-    paths = []
-    for source in G.nodes():
-        # Limit search depth for performance (max 4 hops as per AML standards)
-        for target in G.nodes():
-            if source == target: continue
-            
-            # Find paths of length 3+
-            for path in nx.all_simple_paths(G, source, target, cutoff=4):
-                if len(path) >= 4:
-                    # Check if intermediate nodes are 'mules'
-                    intermediates = path[1:-1]
-                    if all(m in potential_mules for m in intermediates):
-                        paths.append(path)
-
-    # 3. Time Window Analysis on paths
-    # Laundering often happens quickly
     for path in paths:
-        # Check if timestamps are cascading
-        path_txns = []
-        valid_path = True
-        
-        last_time = None
-        for i in range(len(path)-1):
-            u, v = path[i], path[i+1]
-            # Get earliest transaction between u and v
-            tx = df[(df["sender_id"] == u) & (df["receiver_id"] == v)].sort_values("timestamp").iloc[0]
-            
-            if last_time and tx["timestamp"] < last_time:
-                valid_path = False
-                break
-            
-            # Check elapsed time (should be within 48h for entire chain)
-            if last_time and (tx["timestamp"] - first_time).total_seconds() > 172800:
-                valid_path = False
-                break
-                
-            if i == 0:
-                first_time = tx["timestamp"]
-            last_time = tx["timestamp"]
-            
-        if valid_path:
-            shell_rings.append({
-                "ring_id": f"RING_SHELL_{ring_counter:03d}",
-                "pattern_type": "layered_shell",
-                "member_accounts": path,
-                "layering_depth": len(path) - 1,
-                "risk_score": 0.85 # Base risk for validated shell path
-            })
-            ring_counter += 1
-            
+        shell_rings.append({
+            "ring_id": f"RING_SHELL_{ring_counter:03d}",
+            "pattern_type": "layered_shell",
+            "member_accounts": path,
+            "layering_depth": len(path) - 1,
+            "risk_score": 0.85 # Base risk for validated shell path
+        })
+        ring_counter += 1
+
     # Deduplicate paths (keep longest)
     unique_rings = []
     sorted_shells = sorted(shell_rings, key=lambda x: len(x["member_accounts"]), reverse=True)
@@ -89,5 +100,78 @@ def detect_shell_networks(G: nx.DiGraph, df: pd.DataFrame) -> List[Dict]:
         if not (members & seen_nodes):
             unique_rings.append(ring)
             seen_nodes.update(members)
-            
+
+    return unique_rings, len(shell_rings)
+
+
+def detect_shell_networks(
+    G: Union[nx.DiGraph, CompactGraph],
+    df: pd.DataFrame,
+    max_depth: int = MAX_HOPS,
+    max_paths_per_source: int = MAX_PATHS_PER_SOURCE,
+    index: TransactionIndex = None,
+    stats: Dict = None,
+    context: AnalysisContext = None
+) -> List[Dict]:
+    """
+    Detects multi-hop laundering patterns (A -> B -> C -> D).
+    Focuses on 'pass-through' accounts with low retention and high velocity.
+    If a stats dict is passed, the pass-through account and candidate path
+    counts are written to it.
+    """
+    cg = as_compact(G)
+
+    # 1. Identify potential pass-through nodes
+    # Criteria: In-degree > 0 AND Out-degree > 0 AND low retention
+    potential_mules = find_pass_through_accounts(cg, df, context=context).tolist()
+
+    # 2. Bounded time-respecting walks through the mule subgraph
+    search = chain_search(cg, df, index)
+    candidates = shell_candidates(cg, potential_mules, search, max_depth, max_paths_per_source)
+    unique_rings, n_candidates = number_shell_rings(
+        cg.ids[codes].tolist() for _, paths in candidates for codes in paths
+    )
+
+    if stats is not None:
+        stats["pass_through_accounts"] = sum(potential_mules)
+        stats["candidate_paths"] = n_candidates
+
+    return unique_rings
+
+
+# -------------------------
+# PER-COMPONENT BATCHES
+# -------------------------
+def batch_shell_candidates(
+    batch,
+    potential_mules: np.ndarray,
+    max_depth: int = MAX_HOPS,
+    max_paths_per_source: int = MAX_PATHS_PER_SOURCE,
+    stats: Dict = None
+) -> List[Tuple[int, List[List[int]]]]:
+    """
+    shell_candidates for one ComponentBatch, in the whole graph's codes.
+    potential_mules is the batch's slice of the pass-through mask.
+    """
+    cg = batch.graph
+    if cg.temporal is None:
+        raise ValueError("Per-component shell detection needs a compact graph with its transactions")
+
+    local = shell_candidates(cg, potential_mules.tolist(), chain_search(cg), max_depth, max_paths_per_source)
+    codes = batch.codes
+    candidates = [
+        (int(codes[source]), [codes[path].tolist() for path in paths])
+        for source, paths in local
+    ]
+    if stats is not None:
+        stats["candidate_paths"] = sum(len(paths) for _, paths in candidates)
+    return candidates
+
+
+def merge_shell_batches(cg: CompactGraph, results: List[List[Tuple[int, List[List[int]]]]]) -> List[Dict]:
+    """Shell rings numbered and deduplicated exactly as in a whole-graph run."""
+    rank = np.empty(cg.n_nodes, dtype=np.int64)
+    rank[cg.node_order] = np.arange(cg.n_nodes)
+    candidates = sorted((entry for found in results for entry in found), key=lambda entry: rank[entry[0]])
+    unique_rings, _ = number_shell_rings(cg.ids[codes].tolist() for _, paths in candidates for codes in paths)
     return unique_rings
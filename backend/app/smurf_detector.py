@@ -1,108 +1,181 @@
 # backend/app/smurf_detector.py
 
-from datetime import timedelta
 import numpy as np
+import pandas as pd
+
+from app.transaction_index import TransactionIndex, NS_PER_SECOND
 
 WINDOW_HOURS = 72
 MIN_UNIQUE_ACCOUNTS = 10
 MIN_TOTAL_AMOUNT = 5000
 MAX_AMOUNT_STD = 5000
 
-
-def detect_smurfing(df):
+# Slack for the prefix-sum prefilter; candidates are re-checked exactly
+_PREFILTER_RTOL = 1e-6
+
+
+def _first_bursts(
+    accounts,
+    counterparties,
+    times,
+    amounts,
+    window_hours,
+    min_unique_accounts,
+    min_total_amount,
+    max_amount_std,
+    eligible=None
+):
+    """
+    Sliding-window burst scan over all accounts in one grouped pass.
+
+    Rows are sorted by (account, time). For every row the window start, the
+    running amount sum / variance and the number of distinct counterparties
+    are derived from prefix arrays, so no window is ever materialized.
+    Returns [(account, counterparties in first-seen order)] for the first
+    qualifying window of each account, in account order.
+    """
+    acc_codes, acc_values = pd.factorize(accounts, sort=True)
+    cp_codes, cp_values = pd.factorize(counterparties)
+    cp_values = np.asarray(cp_values, dtype=object)
+
+    n = len(acc_codes)
+    if n == 0:
+        return []
+
+    # Dense time ranks keep every sort key a single int64
+    uniq_t, t_rank = np.unique(times, return_inverse=True)
+    span = len(uniq_t) + 1
+
+    key = acc_codes.astype(np.int64) * span + t_rank
+    order = np.argsort(key, kind="stable")  # account, then time
+    key = key[order]
+    g = acc_codes[order].astype(np.int64)
+    t_rank = t_rank[order]
+    a = amounts[order]
+    c = cp_codes[order].astype(np.int64)
+
+    rows = np.arange(n)
+    group_start = np.searchsorted(g, g, side="left")
+
+    # 1. Window start per row: first row of the same account within the window
+    window_ns = window_hours * 3600 * NS_PER_SECOND
+    by_time = np.argsort(t_rank, kind="stable")
+    lower_rank = np.empty(n, dtype=np.int64)
+    lower_rank[by_time] = np.searchsorted(uniq_t, uniq_t[t_rank[by_time]] - window_ns, side="left")
+    start = np.searchsorted(key, g * span + lower_rank, side="left")
+    size = rows - start + 1
+
+    # 2. Running sum and variance (centered per account for stability)
+    centered = a - a[group_start]
+    s0 = np.concatenate(([0.0], np.cumsum(a)))
+    s1 = np.concatenate(([0.0], np.cumsum(centered)))
+    s2 = np.concatenate(([0.0], np.cumsum(centered * centered)))
+    total = s0[rows + 1] - s0[start]
+    w1 = s1[rows + 1] - s1[start]
+    w2 = s2[rows + 1] - s2[start]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = np.where(size > 1, (w2 - w1 * w1 / size) / (size - 1), np.nan)
+    std = np.sqrt(np.maximum(var, 0))
+
+    # 3. Running distinct counterparties.
+    # Row j adds one distinct counterparty to every window end e >= j whose
+    # start lies in (prev[j], j], prev[j] being the account's previous row
+    # with the same counterparty. Window starts are non-decreasing, so that
+    # is a contiguous range of ends and a difference array counts them all.
+    pair_order = np.argsort(g * len(cp_values) + c, kind="stable")
+    same_pair = (g[pair_order][1:] == g[pair_order][:-1]) & (c[pair_order][1:] == c[pair_order][:-1])
+    prev = group_start - 1
+    prev[pair_order[1:][same_pair]] = pair_order[:-1][same_pair]
+
+    lo = np.maximum(rows, np.searchsorted(start, prev, side="right"))
+    hi = np.searchsorted(start, rows, side="right") - 1
+    live = lo <= hi
+    delta = (
+        np.bincount(lo[live], minlength=n + 1)
+        - np.bincount(hi[live] + 1, minlength=n + 1)
+    )
+    distinct = np.cumsum(delta[:n])
+
+    # 4. Candidate windows, then exact confirmation of the first per account
+    candidate = (
+        (distinct >= min_unique_accounts)
+        & (total >= min_total_amount - _PREFILTER_RTOL * abs(min_total_amount))
+        & (std < max_amount_std * (1 + _PREFILTER_RTOL))
+    )
+    if eligible is not None:
+        candidate &= np.asarray(eligible, dtype=bool)[g]
+
+    bursts = []
+    hits = np.flatnonzero(candidate)
+    for group_hits in np.split(hits, np.flatnonzero(np.diff(g[hits])) + 1):
+        for end in group_hits:
+            window = a[start[end]:end + 1]
+            if window.sum() >= min_total_amount and window.std(ddof=1) < max_amount_std:
+                members = pd.unique(cp_values[c[start[end]:end + 1]])
+                bursts.append((acc_values[g[end]], list(members)))
+                break
+
+    return bursts
+
+
+def detect_smurfing(
+    df,
+    index: TransactionIndex = None,
+    window_hours=WINDOW_HOURS,
+    min_unique_accounts=MIN_UNIQUE_ACCOUNTS,
+    min_total_amount=MIN_TOTAL_AMOUNT,
+    max_amount_std=MAX_AMOUNT_STD
+):
+    if index is None:
+        index = TransactionIndex(df)
+
+    senders = df["sender_id"].to_numpy()
+    receivers = df["receiver_id"].to_numpy()
+    times = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    amounts = df["amount"].to_numpy(dtype=float)
+    thresholds = (window_hours, min_unique_accounts, min_total_amount, max_amount_std)
+
+    # Receiver must redistribute funds (true mule behavior)
+    receiver_values = pd.factorize(receivers, sort=True)[1]
+    redistributes = [index.out_count(acc) > 0 for acc in receiver_values]
+
+    fan_in = _first_bursts(receivers, senders, times, amounts, *thresholds, eligible=redistributes)
+    fan_out = _first_bursts(senders, receivers, times, amounts, *thresholds)
+
+    return smurf_rings(fan_in, fan_out)
+
+
+def smurf_rings(fan_in, fan_out):
+    """Numbers (account, counterparties) bursts as fan-in / fan-out rings."""
     rings = []
     ring_counter = 1
 
-    df_sorted = df.sort_values("timestamp")
-
     # -------------------------
     # FAN-IN (Many -> One)
     # -------------------------
-    grouped_receiver = df_sorted.groupby("receiver_id")
-
-    for receiver, group in grouped_receiver:
-        group = group.sort_values("timestamp").reset_index(drop=True)
-
-        start = 0
-        for end in range(len(group)):
-
-            # Sliding 72h window
-            while (
-                group.loc[end, "timestamp"]
-                - group.loc[start, "timestamp"]
-            ).total_seconds() > WINDOW_HOURS * 3600:
-                start += 1
-
-            window = group.loc[start:end]
-            unique_senders = window["sender_id"].unique()
-
-            if len(unique_senders) >= MIN_UNIQUE_ACCOUNTS:
-
-                # ✅ Additional Intelligence Checks
-
-                total_amount = window["amount"].sum()
-                amount_std = window["amount"].std()
-
-                # Check if receiver redistributes funds (true mule behavior)
-                outgoing_txns = df_sorted[df_sorted["sender_id"] == receiver]
-                outgoing_count = len(outgoing_txns)
+    for receiver, unique_senders in fan_in:
+        ring_id = f"RING_SMURF_IN_{ring_counter:03d}"
 
-                if (
-                    total_amount >= MIN_TOTAL_AMOUNT and
-                    outgoing_count > 0 and
-                    (amount_std is not None and amount_std < MAX_AMOUNT_STD)
-                ):
+        rings.append({
+            "ring_id": ring_id,
+            "pattern_type": "fan_in_72h",
+            "member_accounts": unique_senders + [receiver]
+        })
 
-                    ring_id = f"RING_SMURF_IN_{ring_counter:03d}"
-
-                    rings.append({
-                        "ring_id": ring_id,
-                        "pattern_type": "fan_in_72h",
-                        "member_accounts": list(unique_senders) + [receiver]
-                    })
-
-                    ring_counter += 1
-                    break  # avoid duplicates for same receiver
+        ring_counter += 1
 
     # -------------------------
     # FAN-OUT (One -> Many)
     # -------------------------
-    grouped_sender = df_sorted.groupby("sender_id")
-
-    for sender, group in grouped_sender:
-        group = group.sort_values("timestamp").reset_index(drop=True)
-
-        start = 0
-        for end in range(len(group)):
-
-            while (
-                group.loc[end, "timestamp"]
-                - group.loc[start, "timestamp"]
-            ).total_seconds() > WINDOW_HOURS * 3600:
-                start += 1
-
-            window = group.loc[start:end]
-            unique_receivers = window["receiver_id"].unique()
-
-            if len(unique_receivers) >= MIN_UNIQUE_ACCOUNTS:
-
-                total_amount = window["amount"].sum()
-                amount_std = window["amount"].std()
-
-                if (
-                    total_amount >= MIN_TOTAL_AMOUNT and
-                    (amount_std is not None and amount_std < MAX_AMOUNT_STD)
-                ):
-
-                    ring_id = f"RING_SMURF_OUT_{ring_counter:03d}"
+    for sender, unique_receivers in fan_out:
+        ring_id = f"RING_SMURF_OUT_{ring_counter:03d}"
 
-                    rings.append({
-                        "ring_id": ring_id,
-                        "pattern_type": "fan_out_72h",
-                        "member_accounts": [sender] + list(unique_receivers)
-                    })
+        rings.append({
+            "ring_id": ring_id,
+            "pattern_type": "fan_out_72h",
+            "member_accounts": [sender] + unique_receivers
+        })
 
-                    ring_counter += 1
-                    break
+        ring_counter += 1
 
     return rings
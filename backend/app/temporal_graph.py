@@ -0,0 +1,241 @@
+# backend/app/temporal_graph.py
+
+from bisect import bisect_left
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+class TemporalEdges:
+    """
+    Transactions per aggregated edge, aligned with a CompactGraph's CSR
+    edges: edge e's transactions are times[ptr[e]:ptr[e + 1]] (ns,
+    ascending) with the matching amounts.
+    """
+
+    def __init__(self, ptr, times, amounts):
+        self.ptr = np.asarray(ptr, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.int64)
+        self.amounts = np.asarray(amounts, dtype=float)
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.ptr) - 1
+
+    @classmethod
+    def from_edge_ids(cls, edge_of_txn, times, amounts, n_edges: int) -> "TemporalEdges":
+        """Groups transactions by their CSR edge id, oldest first inside every edge."""
+        edge_of_txn = np.asarray(edge_of_txn, dtype=np.int64)
+        order = np.lexsort((times, edge_of_txn))
+        ptr = np.zeros(n_edges + 1, dtype=np.int64)
+        np.cumsum(np.bincount(edge_of_txn, minlength=n_edges), out=ptr[1:])
+        return cls(ptr, np.asarray(times)[order], np.asarray(amounts)[order])
+
+    @classmethod
+    def from_frame(cls, cg, df) -> "TemporalEdges":
+        """
+        For graphs built without one (e.g. from networkx): df's transactions
+        per CSR edge. Every transaction's (sender, receiver) must be an edge.
+        """
+        n = cg.n_nodes
+        keys = cg.edge_sources().astype(np.int64) * n + cg.out_dst
+        order = np.argsort(keys, kind="stable")
+        txn_keys = cg.codes(df["sender_id"]).astype(np.int64) * n + cg.codes(df["receiver_id"])
+        edge_of_txn = order[np.searchsorted(keys[order], txn_keys)]
+        return cls.from_edge_ids(
+            edge_of_txn,
+            df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64),
+            df["amount"].to_numpy(dtype=float),
+            cg.n_edges
+        )
+
+    @classmethod
+    def from_index(cls, cg, index) -> "TemporalEdges":
+        """Like from_frame, from a TransactionIndex; pairs the index lacks get no transactions."""
+        ptr, positions = index.edge_buckets(cg.ids[cg.edge_sources()], cg.ids[cg.out_dst])
+        return cls(ptr, index.times[positions], index.amounts[positions])
+
+    def take(self, edges) -> "TemporalEdges":
+        """The store for a subset of edges (e.g. a subgraph's), in that order."""
+        edges = np.asarray(edges, dtype=np.int64)
+        ptr, positions = gather_segments(self.ptr[edges], self.ptr[edges + 1] - self.ptr[edges])
+        return TemporalEdges(ptr, self.times[positions], self.amounts[positions])
+
+    def first_times(self) -> np.ndarray:
+        return self.times[self.ptr[:-1]]
+
+
+def gather_segments(starts: np.ndarray, lengths: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Concatenates the ranges [start, start + length) of a flat array: returns
+    their CSR offsets and the flat positions, in the order given.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.asarray(lengths, dtype=np.int64)
+    new_ptr = np.zeros(len(starts) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=new_ptr[1:])
+    positions = np.repeat(starts - new_ptr[:-1], lengths) + np.arange(new_ptr[-1], dtype=np.int64)
+    return new_ptr, positions
+
+
+class TemporalSearch:
+    """
+    Time-respecting walks over a CompactGraph. A walk is a sequence of
+    transactions, each at or after the previous one, all within window_ns
+    of the first, and each moving at least min_ratio of the amount the
+    previous hop brought in. Hops that break any of these are never
+    expanded, so impossible paths are cut while searching.
+    """
+
+    def __init__(self, cg, window_ns: Optional[int] = None, min_ratio: float = 0.0, temporal: TemporalEdges = None):
+        temporal = temporal if temporal is not None else cg.temporal
+        if temporal is None:
+            raise ValueError("Temporal search needs a compact graph with a temporal edge store")
+
+        self.adjacency = cg.adjacency()
+        ptr = cg.out_ptr.tolist()
+        self.edge_ids = [range(ptr[u], ptr[u + 1]) for u in range(cg.n_nodes)]
+        src, in_ptr = cg.in_src.tolist(), cg.in_ptr.tolist()
+        self.predecessors = [src[in_ptr[u]:in_ptr[u + 1]] for u in range(cg.n_nodes)]
+        self.temporal = temporal
+        self._ptr = temporal.ptr.tolist()
+        self._txns = {}  # edge -> (times, amounts) lists, filled as the search reaches it
+        self.window = window_ns
+        self.min_ratio = min_ratio
+
+    def hops(self, edge: int, start, last_time, last_amount) -> Iterator[Tuple[int, float]]:
+        """
+        The (time, amount) transactions on edge that can extend a walk. On the
+        first hop every transaction opens its own window. Later hops skip
+        transactions dominated by an earlier candidate (a later one only
+        helps if it moves less money, i.e. asks less of the next hop).
+        Without a ratio the earliest candidate dominates all the others.
+        """
+        txns = self._txns.get(edge)
+        if txns is None:
+            lo, hi = self._ptr[edge], self._ptr[edge + 1]
+            txns = self._txns[edge] = (self.temporal.times[lo:hi].tolist(), self.temporal.amounts[lo:hi].tolist())
+        times, amounts = txns
+
+        if last_time is None:
+            if self.window is None and self.min_ratio <= 0:
+                times, amounts = times[:1], amounts[:1]
+            yield from zip(times, amounts)
+            return
+
+        end = None if self.window is None else start + self.window
+        floor = self.min_ratio * last_amount
+        smallest = float("inf")
+        for i in range(bisect_left(times, last_time), len(times)):
+            t = times[i]
+            if end is not None and t > end:
+                break
+            amount = amounts[i]
+            if floor <= amount < smallest:
+                smallest = amount
+                yield t, amount
+                if floor <= 0:
+                    return
+
+    def paths(
+        self,
+        source: int,
+        max_hops: int,
+        min_hops: int = 1,
+        relay=None,
+        max_paths: int = None
+    ) -> List[List[int]]:
+        """
+        Simple paths (code lists) from source with min_hops..max_hops hops
+        that some time-respecting walk follows, in depth-first order, each
+        once. Intermediate accounts must satisfy relay[code] when given.
+        """
+        adjacency, edge_ids = self.adjacency, self.edge_ids
+        found = []
+        seen = set()
+        path = [source]
+        on_path = {source}
+
+        def extend(node, start, last_time, last_amount):
+            length = len(path)  # hops once nxt is appended
+            for nxt, edge in zip(adjacency[node], edge_ids[node]):
+                if nxt in on_path:
+                    continue
+                record = length >= min_hops
+                deeper = length < max_hops and (relay is None or relay[nxt])
+                if not (record or deeper):
+                    continue
+
+                for t, amount in self.hops(edge, start, last_time, last_amount):
+                    path.append(nxt)
+                    if record:
+                        key = tuple(path)
+                        if key not in seen:
+                            seen.add(key)
+                            found.append(list(path))
+                            if max_paths is not None and len(found) >= max_paths:
+                                path.pop()
+                                return True
+
+                    if not deeper:
+                        # A dead end: one transaction is enough to record it
+                        path.pop()
+                        break
+                    on_path.add(nxt)
+                    stop = extend(nxt, t if start is None else start, t, amount)
+                    on_path.discard(nxt)
+                    path.pop()
+                    if stop:
+                        return True
+            return False
+
+        extend(source, None, None, None)
+        return found
+
+    def cycles(self, component, max_length: int, min_length: int = 2) -> Iterator[List[int]]:
+        """
+        Simple cycles of min_length..max_length hops inside one strongly
+        connected component that some time-respecting walk goes round,
+        starting from any member. Each is yielded once, rotated to start
+        at its smallest code.
+        """
+        members = sorted(int(c) for c in component)
+        in_component = set(members)
+        adjacency, edge_ids, predecessors = self.adjacency, self.edge_ids, self.predecessors
+        seen = set()
+
+        for root in members:
+            # Only accounts paying root directly can take the closing hop;
+            # time order, window and ratio prune everything else
+            closers = in_component.intersection(predecessors[root])
+            path = [root]
+            on_path = {root}
+            found = []
+
+            def extend(node, start, last_time, last_amount):
+                hops = len(path) + 1  # cycle length if the next account closes it
+                for w, edge in zip(adjacency[node], edge_ids[node]):
+                    if w == root:
+                        if len(path) < min_length:
+                            continue
+                    elif w in on_path or w not in in_component or hops > max_length:
+                        continue
+                    elif hops == max_length and w not in closers:
+                        continue
+                    for t, amount in self.hops(edge, start, last_time, last_amount):
+                        if w == root:
+                            found.append(list(path))
+                            break
+                        path.append(w)
+                        on_path.add(w)
+                        extend(w, t if start is None else start, t, amount)
+                        on_path.discard(w)
+                        path.pop()
+
+            extend(root, None, None, None)
+            for cycle in found:
+                low = cycle.index(min(cycle))
+                key = tuple(cycle[low:] + cycle[:low])
+                if key not in seen:
+                    seen.add(key)
+                    yield list(key)
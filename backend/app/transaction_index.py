@@ -0,0 +1,190 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+
+from app.temporal_graph import gather_segments
+
+NS_PER_SECOND = 1_000_000_000
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+
+def to_ns(ts) -> int:
+    """Convert a timestamp-like value to int64 nanoseconds since the epoch."""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    return pd.Timestamp(ts).value
+
+
+class TransactionIndex:
+    """
+    Time-sorted transaction arrays with per-edge and per-account position lists.
+    Built once per analysis so detectors can answer "which transactions did
+    A send to B after t" with a binary search instead of a full-frame scan.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        order = np.argsort(df["timestamp"].to_numpy(dtype="datetime64[ns]"), kind="stable")
+
+        self.times = df["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)[order]
+        self.amounts = df["amount"].to_numpy(dtype=float)[order]
+
+        n = len(order)
+        codes, accounts = pd.factorize(np.concatenate([
+            df["sender_id"].to_numpy(dtype=object)[order],
+            df["receiver_id"].to_numpy(dtype=object)[order]
+        ]))
+        senders, receivers = codes[:n].astype(np.int64), codes[n:].astype(np.int64)
+
+        self.accounts = np.asarray(accounts, dtype=object)
+        self._code = {acc: i for i, acc in enumerate(self.accounts)}
+        n_acc = len(self.accounts)
+
+        # CSR-style position lists. Stable sorts keep positions (and so
+        # timestamps) ascending inside every edge and account bucket.
+        self._n_acc = n_acc
+        edge_keys = senders * n_acc + receivers
+        self._edge_keys, edge_ids = np.unique(edge_keys, return_inverse=True)
+        self._edge_order, self._edge_ptr = _buckets(edge_ids, len(self._edge_keys))
+        self._sent_order, self._sent_ptr = _buckets(senders, n_acc)
+        self._recv_order, self._recv_ptr = _buckets(receivers, n_acc)
+
+        # Edge keys are sorted by sender, so each account's successors are contiguous
+        self._succ_ptr = np.searchsorted(self._edge_keys, np.arange(n_acc + 1, dtype=np.int64) * n_acc)
+
+    def _edge_id(self, u, v) -> Optional[int]:
+        cu, cv = self._code.get(u), self._code.get(v)
+        if cu is None or cv is None:
+            return None
+        key = cu * self._n_acc + cv
+        i = np.searchsorted(self._edge_keys, key)
+        if i < len(self._edge_keys) and self._edge_keys[i] == key:
+            return int(i)
+        return None
+
+    # -------------------------
+    # EDGE LOOKUPS
+    # -------------------------
+    def edge_positions(self, u, v) -> np.ndarray:
+        e = self._edge_id(u, v)
+        if e is None:
+            return _EMPTY
+        return self._edge_order[self._edge_ptr[e]:self._edge_ptr[e + 1]]
+
+    def edge_times(self, u, v) -> np.ndarray:
+        return self.times[self.edge_positions(u, v)]
+
+    def edge_amounts(self, u, v) -> np.ndarray:
+        return self.amounts[self.edge_positions(u, v)]
+
+    def first_on_edge(self, u, v) -> Optional[int]:
+        """Earliest transaction time (ns) on u -> v, or None if there is no edge."""
+        e = self._edge_id(u, v)
+        if e is None:
+            return None
+        return int(self.times[self._edge_order[self._edge_ptr[e]]])
+
+    def first_on_edge_after(self, u, v, t, strict: bool = False) -> Optional[int]:
+        """
+        Position (into the sorted arrays) of the first u -> v transaction at or
+        after t (strictly after when strict=True), or None.
+        """
+        pos = self.edge_positions(u, v)
+        if len(pos) == 0:
+            return None
+        i = np.searchsorted(self.times[pos], to_ns(t), side="right" if strict else "left")
+        return int(pos[i]) if i < len(pos) else None
+
+    def edge_buckets(self, senders, receivers) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Vectorized edge_positions for aligned sender / receiver sequences:
+        CSR offsets (one bucket per pair, empty for unknown pairs) and the
+        concatenated time-sorted positions.
+        """
+        cu = np.array([self._code.get(acc, -1) for acc in senders], dtype=np.int64)
+        cv = np.array([self._code.get(acc, -1) for acc in receivers], dtype=np.int64)
+        keys = cu * self._n_acc + cv
+        known = (cu >= 0) & (cv >= 0)
+
+        starts = lengths = np.zeros(len(keys), dtype=np.int64)
+        if len(self._edge_keys):
+            e = np.searchsorted(self._edge_keys, keys).clip(max=len(self._edge_keys) - 1)
+            known &= self._edge_keys[e] == keys
+            starts = self._edge_ptr[e]
+            lengths = np.where(known, self._edge_ptr[e + 1] - starts, 0)
+        ptr, slots = gather_segments(starts, lengths)
+        return ptr, self._edge_order[slots]
+
+    def successors(self, u) -> List[str]:
+        cu = self._code.get(u)
+        if cu is None:
+            return []
+        keys = self._edge_keys[self._succ_ptr[cu]:self._succ_ptr[cu + 1]]
+        return list(self.accounts[keys % self._n_acc])
+
+    # -------------------------
+    # ACCOUNT LOOKUPS
+    # -------------------------
+    def _bucket(self, order, ptr, acc) -> np.ndarray:
+        cu = self._code.get(acc)
+        if cu is None:
+            return _EMPTY
+        return order[ptr[cu]:ptr[cu + 1]]
+
+    def sent_positions(self, acc) -> np.ndarray:
+        return self._bucket(self._sent_order, self._sent_ptr, acc)
+
+    def received_positions(self, acc) -> np.ndarray:
+        return self._bucket(self._recv_order, self._recv_ptr, acc)
+
+    def out_count(self, acc) -> int:
+        return len(self.sent_positions(acc))
+
+    def in_count(self, acc) -> int:
+        return len(self.received_positions(acc))
+
+    def txn_count(self, acc) -> int:
+        """Transactions touching acc on either side (self-transfers counted once)."""
+        sent, received = self.sent_positions(acc), self.received_positions(acc)
+        if len(sent) == 0 or len(received) == 0:
+            return len(sent) + len(received)
+        return len(np.union1d(sent, received))
+
+    def txn_counts(self, accounts) -> np.ndarray:
+        """Vectorized txn_count for a sequence of accounts (0 for unknown ones)."""
+        codes = np.array([self._code.get(acc, -1) for acc in accounts], dtype=np.int64)
+        known = codes >= 0
+
+        # Self-transfers sit in both the sent and received buckets
+        self_keys = np.arange(self._n_acc, dtype=np.int64) * (self._n_acc + 1)
+        self_ids = np.searchsorted(self._edge_keys, self_keys)
+        has_self = self_ids < len(self._edge_keys)
+        has_self[has_self] = self._edge_keys[self_ids[has_self]] == self_keys[has_self]
+        self_counts = np.zeros(self._n_acc, dtype=np.int64)
+        self_counts[has_self] = np.diff(self._edge_ptr)[self_ids[has_self]]
+
+        per_code = np.diff(self._sent_ptr) + np.diff(self._recv_ptr) - self_counts
+        counts = np.zeros(len(codes), dtype=np.int64)
+        counts[known] = per_code[codes[known]]
+        return counts
+
+    def positions_among(self, members) -> np.ndarray:
+        """Time-sorted positions of transactions whose sender and receiver are both in members."""
+        members = set(members)
+        chunks = [
+            self.edge_positions(u, v)
+            for u in members
+            for v in self.successors(u)
+            if v in members
+        ]
+        if not chunks:
+            return _EMPTY
+        return np.sort(np.concatenate(chunks))
+
+
+def _buckets(keys: np.ndarray, n_buckets: int):
+    """Group positions by integer key: returns (positions, offsets) in CSR layout."""
+    order = np.argsort(keys, kind="stable")
+    ptr = np.zeros(n_buckets + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n_buckets), out=ptr[1:])
+    return order, ptr
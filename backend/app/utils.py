@@ -0,0 +1,25 @@
+# backend/app/utils.py
+
+import os
+import stat
+
+# Files the app loads back with pickle / joblib live here, never in the shared temp dir
+APP_STATE_DIR = os.getenv(
+    "APP_STATE_DIR",
+    os.path.join(os.getenv("XDG_STATE_HOME") or os.path.join(os.path.expanduser("~"), ".local", "state"), "fintrace")
+)
+
+
+def private_dir(path: str) -> str:
+    """
+    Creates path (mode 0700) if missing and makes sure no other user can
+    write to it. A directory owned by someone else is refused: anything
+    unpickled from it could run code in the server.
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"State directory {path} is not owned by the server's user")
+    if info.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        os.chmod(path, stat.S_IMODE(info.st_mode) & ~(stat.S_IWGRP | stat.S_IWOTH))
+    return path
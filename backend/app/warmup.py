@@ -0,0 +1,56 @@
+# backend/app/warmup.py
+
+import asyncio
+import importlib
+import os
+import sys
+import time
+from types import ModuleType
+from typing import Dict, Optional
+
+from app.metrics import record_import
+
+# Engines and the libraries behind them. main imports none of these at
+# startup; each loads on first use, or early through warm-up.
+ENGINE_MODULES = (
+    "numpy",
+    "pandas",
+    "networkx",
+    "community",
+    "sklearn.ensemble",
+    "joblib",
+    "app.ingest",
+    "app.response_format",
+    "app.pipeline",
+    "app.result_cache",
+    "app.jobs",
+    "app.incremental"
+)
+
+# Preload the engines in the background once the server is up
+WARMUP = os.getenv("WARMUP", "false").lower() in ("1", "true", "yes")
+WARMUP_DELAY_SECONDS = float(os.getenv("WARMUP_DELAY_SECONDS", 0.5))
+
+
+def loaded(name: str) -> Optional[ModuleType]:
+    """The module if something has imported it already, without importing it."""
+    return sys.modules.get(name)
+
+
+def preload(modules=ENGINE_MODULES) -> Dict[str, float]:
+    """Imports modules in order; returns the seconds each one added."""
+    seconds = {}
+    for name in modules:
+        if name in sys.modules:
+            continue
+        started = time.perf_counter()
+        importlib.import_module(name)
+        seconds[name] = time.perf_counter() - started
+        record_import(name, seconds[name])
+    return seconds
+
+
+async def warm_up(delay: float = WARMUP_DELAY_SECONDS) -> Dict[str, float]:
+    # Let the server start accepting requests first; imports run off the event loop
+    await asyncio.sleep(delay)
+    return await asyncio.to_thread(preload)
@@ -0,0 +1,272 @@
+# backend/benchmarks/generate.py
+
+"""
+Synthetic transaction generator with planted fraud patterns.
+
+    python -m benchmarks.generate --rows 1000000 --out data/tx_1m.csv [--seed 7] [--rate cycle=20 ...]
+
+Writes the CSV in the /analyze upload format plus <out>.truth.json
+listing every planted pattern and its accounts.
+"""
+
+import argparse
+import json
+import os
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.validator import REQUIRED_COLUMNS, TIMESTAMP_FORMAT
+
+START = pd.Timestamp("2026-01-01")
+SPAN_DAYS = 30
+ROWS_PER_ACCOUNT = 20
+
+# Planted patterns per 100k rows (at least one of each when the rate is > 0)
+DEFAULT_RATES = {"cycle": 10, "shell": 10, "fan_in": 5, "fan_out": 5, "outlier": 10}
+
+# Background mix: purchases, payroll, peer-to-peer, refunds
+BACKGROUND_KINDS = {"purchase": 0.80, "payroll": 0.12, "p2p": 0.05, "refund": 0.03}
+AMOUNT_MEDIANS = {"purchase": 60, "payroll": 2500, "p2p": 100, "refund": 50}
+AMOUNT_SIGMAS = {"purchase": 1.0, "payroll": 0.3, "p2p": 1.0, "refund": 0.8}
+
+HOUR = 3600
+
+
+class _Planter:
+    """Collects planted transactions; every pattern gets fresh accounts."""
+
+    def __init__(self, rng: np.random.Generator, first_account: int, span_seconds: int, merchants: np.ndarray):
+        self.rng = rng
+        self.next_account = first_account
+        self.span = span_seconds
+        self.merchants = merchants
+        self.rows: List[Tuple[int, int, float, float]] = []
+        self.truth: List[Dict] = []
+
+    def accounts(self, n: int) -> List[int]:
+        start = self.next_account
+        self.next_account += n
+        return list(range(start, start + n))
+
+    def start_time(self, duration: float) -> float:
+        return self.rng.uniform(0, max(self.span - duration, 1))
+
+    def add(self, pattern_type: str, members: List[int], rows):
+        self.rows.extend(rows)
+        self.truth.append({"pattern_type": pattern_type, "accounts": members})
+
+    def cycle(self):
+        # A -> B -> ... -> A, each hop a few hours after the last, minus a small fee
+        length = int(self.rng.integers(3, 6))
+        members = self.accounts(length)
+        t = self.start_time(length * 6 * HOUR)
+        amount = self.rng.lognormal(np.log(4000), 0.5)
+        rows = []
+        for u, v in zip(members, members[1:] + members[:1]):
+            rows.append((u, v, amount, t))
+            t += self.rng.uniform(1, 6) * HOUR
+            amount *= self.rng.uniform(0.97, 0.995)
+        self.add("cycle", members, rows)
+
+    def shell(self):
+        # source -> mule -> ... -> sink inside 48h; mules forward almost everything
+        hops = int(self.rng.integers(3, 5))
+        members = self.accounts(hops + 1)
+        t = self.start_time(hops * 8 * HOUR)
+        amount = self.rng.lognormal(np.log(9000), 0.4)
+        rows = []
+        for u, v in zip(members, members[1:]):
+            rows.append((u, v, amount, t))
+            t += self.rng.uniform(1, 8) * HOUR
+            amount *= self.rng.uniform(0.92, 0.98)
+        self.add("shell", members, rows)
+
+    def fan_in(self):
+        # Many senders -> one hub within 48h; the hub then moves the money on
+        senders = self.accounts(int(self.rng.integers(12, 21)))
+        hub, collector = self.accounts(2)
+        t0 = self.start_time(72 * HOUR)
+        amounts = np.clip(self.rng.normal(700, 150, len(senders)), 50, None)
+        times = np.sort(t0 + self.rng.uniform(0, 48 * HOUR, len(senders)))
+        rows = [(s, hub, a, t) for s, a, t in zip(senders, amounts, times)]
+        rows.append((hub, collector, amounts.sum() * 0.9, times[-1] + self.rng.uniform(1, 12) * HOUR))
+        self.add("fan_in", senders + [hub], rows)
+
+    def fan_out(self):
+        # A funded hub pays many receivers within 48h
+        hub, funder = self.accounts(2)
+        receivers = self.accounts(int(self.rng.integers(12, 21)))
+        t0 = self.start_time(72 * HOUR)
+        amounts = np.clip(self.rng.normal(700, 150, len(receivers)), 50, None)
+        times = np.sort(t0 + 12 * HOUR + self.rng.uniform(0, 48 * HOUR, len(receivers)))
+        rows = [(funder, hub, amounts.sum() * 1.05, t0)]
+        rows.extend((hub, r, a, t) for r, a, t in zip(receivers, amounts, times))
+        self.add("fan_out", [hub] + receivers, rows)
+
+    def outlier(self):
+        # A handful of purchases two orders of magnitude above normal
+        (account,) = self.accounts(1)
+        n = int(self.rng.integers(3, 7))
+        merchants = self.rng.choice(self.merchants, n)
+        amounts = self.rng.lognormal(np.log(AMOUNT_MEDIANS["purchase"]), 0.5, n) * self.rng.uniform(100, 300)
+        times = self.rng.uniform(0, self.span, n)
+        self.add("outlier", [account], [(account, m, a, t) for m, a, t in zip(merchants, amounts, times)])
+
+
+def _popularity(rng: np.random.Generator, n: int) -> np.ndarray:
+    # Heavy-tailed activity: a few accounts transact far more than the rest
+    weights = 1.0 / np.arange(1, n + 1) ** 0.8
+    return rng.permutation(weights / weights.sum())
+
+
+def _account_roles(n_accounts: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Background account codes: (customers, merchants, employers)."""
+    n_merchants = max(n_accounts // 12, 10)
+    n_employers = max(n_accounts // 50, 3)
+    n_customers = max(n_accounts - n_merchants - n_employers, 10)
+    return (
+        np.arange(n_customers),
+        n_customers + np.arange(n_merchants),
+        n_customers + n_merchants + np.arange(n_employers)
+    )
+
+
+def _background(rng: np.random.Generator, rows: int, roles, span_seconds: int):
+    customers, merchants, employers = roles
+    customer_p = _popularity(rng, len(customers))
+    merchant_p = _popularity(rng, len(merchants))
+
+    names = list(BACKGROUND_KINDS)
+    kinds = rng.choice(len(names), rows, p=list(BACKGROUND_KINDS.values()))
+    senders = np.empty(rows, dtype=np.int64)
+    receivers = np.empty(rows, dtype=np.int64)
+    amounts = np.empty(rows)
+
+    for k, name in enumerate(names):
+        mask = kinds == k
+        n = int(mask.sum())
+        if name == "purchase":
+            senders[mask] = rng.choice(customers, n, p=customer_p)
+            receivers[mask] = rng.choice(merchants, n, p=merchant_p)
+        elif name == "payroll":
+            senders[mask] = rng.choice(employers, n)
+            receivers[mask] = rng.choice(customers, n, p=customer_p)
+        elif name == "p2p":
+            senders[mask] = rng.choice(customers, n, p=customer_p)
+            receivers[mask] = rng.choice(customers, n, p=customer_p)
+        else:
+            senders[mask] = rng.choice(merchants, n, p=merchant_p)
+            receivers[mask] = rng.choice(customers, n, p=customer_p)
+        amounts[mask] = rng.lognormal(np.log(AMOUNT_MEDIANS[name]), AMOUNT_SIGMAS[name], n)
+
+    # No self-transfers
+    same = senders == receivers
+    receivers[same] = rng.choice(merchants, int(same.sum()))
+
+    times = rng.uniform(0, span_seconds, rows)
+    return senders, receivers, amounts, times
+
+
+def pattern_counts(rows: int, rates: Dict[str, float] = None) -> Dict[str, int]:
+    rates = {**DEFAULT_RATES, **(rates or {})}
+    return {
+        name: max(1, int(round(rate * rows / 100_000))) if rate > 0 else 0
+        for name, rate in rates.items()
+    }
+
+
+def generate_transactions(rows: int, seed: int = 42, rates: Dict[str, float] = None) -> Tuple[pd.DataFrame, Dict]:
+    """
+    rows transactions in the upload format (background activity plus planted
+    patterns) and the ground truth: {"rows", "seed", "counts", "patterns"}.
+    Planted patterns use their own accounts and account for part of rows.
+    """
+    rng = np.random.default_rng(seed)
+    span_seconds = SPAN_DAYS * 24 * HOUR
+    counts = pattern_counts(rows, rates)
+
+    # 1. Planted patterns first, so the background fills the remaining rows
+    roles = _account_roles(max(rows // ROWS_PER_ACCOUNT, 100))
+    planter = _Planter(rng, int(roles[2][-1]) + 1, span_seconds, roles[1])
+    for name, count in counts.items():
+        for _ in range(count):
+            getattr(planter, name)()
+    if len(planter.rows) > rows:
+        raise ValueError(f"{rows} rows cannot hold the {len(planter.rows)} planted transactions; lower the rates")
+
+    # 2. Background activity
+    senders, receivers, amounts, times = _background(rng, rows - len(planter.rows), roles, span_seconds)
+    planted = np.array(planter.rows, dtype=float).reshape(-1, 4)
+    senders = np.concatenate([senders, planted[:, 0].astype(np.int64)])
+    receivers = np.concatenate([receivers, planted[:, 1].astype(np.int64)])
+    amounts = np.round(np.concatenate([amounts, planted[:, 2]]), 2)
+    times = np.concatenate([times, planted[:, 3]])
+
+    # 3. Shuffled account numbering, so planted accounts don't stand out by ID
+    n_total = planter.next_account
+    width = len(str(n_total - 1))
+    numbers = rng.permutation(n_total)
+    labels = np.array([f"ACC{i:0{width}d}" for i in numbers], dtype=object)
+
+    order = np.argsort(times, kind="stable")
+    df = pd.DataFrame({
+        "transaction_id": [f"T{i}" for i in range(rows)],
+        "sender_id": labels[senders[order]],
+        "receiver_id": labels[receivers[order]],
+        "amount": amounts[order],
+        "timestamp": START + pd.to_timedelta(np.floor(times[order]), unit="s")
+    })[REQUIRED_COLUMNS]
+
+    truth = {
+        "rows": rows,
+        "seed": seed,
+        "counts": counts,
+        "patterns": [
+            {"pattern_type": p["pattern_type"], "accounts": labels[p["accounts"]].tolist()}
+            for p in planter.truth
+        ]
+    }
+    return df, truth
+
+
+def truth_path(csv_path: str) -> str:
+    base = csv_path[:-len(".csv")] if csv_path.endswith(".csv") else csv_path
+    return base + ".truth.json"
+
+
+def write_dataset(df: pd.DataFrame, truth: Dict, csv_path: str):
+    directory = os.path.dirname(csv_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    df.to_csv(csv_path, index=False, float_format="%.2f", date_format=TIMESTAMP_FORMAT)
+    with open(truth_path(csv_path), "w") as f:
+        json.dump(truth, f, indent=1)
+
+
+def parse_rates(values: List[str]) -> Dict[str, float]:
+    rates = {}
+    for value in values or []:
+        name, _, rate = value.partition("=")
+        if name not in DEFAULT_RATES or not rate:
+            raise argparse.ArgumentTypeError(f"Expected one of {list(DEFAULT_RATES)}=<per 100k rows>, got {value!r}")
+        rates[name] = float(rate)
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic transaction CSV with planted fraud patterns.")
+    parser.add_argument("--rows", type=int, required=True)
+    parser.add_argument("--out", required=True, help="CSV path; the ground truth goes next to it (.truth.json)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", action="append", metavar="PATTERN=N", help=f"Patterns per 100k rows (default {DEFAULT_RATES})")
+    args = parser.parse_args()
+
+    df, truth = generate_transactions(args.rows, args.seed, parse_rates(args.rate))
+    write_dataset(df, truth, args.out)
+    print(f"Wrote {len(df)} rows to {args.out} ({', '.join(f'{k}={v}' for k, v in truth['counts'].items())})")
+
+
+if __name__ == "__main__":
+    main()
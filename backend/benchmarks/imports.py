@@ -0,0 +1,134 @@
+# backend/benchmarks/imports.py
+
+"""
+Cold-start import benchmark.
+
+    python -m benchmarks.imports [--repeat 5] [--top 15] [--update-baseline]
+
+Imports every module in a fresh interpreter and reports how long that took,
+dependencies included. It also checks that importing app.main leaves the
+analysis engines unloaded. Results are compared with the "imports"
+section of benchmarks/baseline.json; the run exits non-zero on a
+regression.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List
+
+from app.warmup import ENGINE_MODULES
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Shared with benchmarks.run (not imported from there: it loads every engine)
+BASELINE_PATH = os.path.join(BACKEND_DIR, "benchmarks", "baseline.json")
+
+# app.main first: it is what a worker imports before it can answer /chat
+MODULES = ["app.main", "app.llm_engine", "fastapi", "httpx"] + list(ENGINE_MODULES)
+
+# Regression thresholds against the baseline; imports are noisier than the engines
+TIME_TOLERANCE = 1.5
+TIME_SLACK_SECONDS = 0.1
+
+_CHILD = """
+import importlib, json, sys, time
+started = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter() - started
+print(json.dumps({"seconds": seconds, "loaded": [m for m in sys.argv[2:] if m in sys.modules]}))
+"""
+
+
+def _run_child(module: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run(
+        [sys.executable, *flags, "-c", _CHILD, module, *ENGINE_MODULES],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+
+
+def cold_import(module: str, repeat: int = 3) -> Dict:
+    """Best of repeat fresh-interpreter imports, plus the engine modules it pulled in."""
+    runs = [json.loads(_run_child(module).stdout) for _ in range(max(repeat, 1))]
+    return {
+        "seconds": round(min(run["seconds"] for run in runs), 4),
+        "engines_loaded": [name for name in runs[0]["loaded"] if name != module]
+    }
+
+
+def slowest_imports(module: str, top: int) -> List[Dict]:
+    """The top modules by cumulative import time when module is imported (python -X importtime)."""
+    entries = []
+    for line in _run_child(module, importtime=True).stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        entries.append({"module": name.strip(), "seconds": int(cumulative) / 1e6})
+    entries.sort(key=lambda entry: entry["seconds"], reverse=True)
+    return entries[:top]
+
+
+def compare(results: Dict, baseline: Dict) -> List[str]:
+    failures = []
+    engines = results.get("app.main", {}).get("engines_loaded")
+    if engines:
+        failures.append(f"app.main loads engine modules at import: {', '.join(engines)}")
+
+    reference = baseline.get("imports", {})
+    for module, stats in results.items():
+        ref = reference.get(module)
+        if ref is None:
+            continue
+        limit = ref * TIME_TOLERANCE + TIME_SLACK_SECONDS
+        if stats["seconds"] > limit:
+            failures.append(f"import {module}: {stats['seconds']}s > {limit:.3f}s (baseline {ref}s)")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time per module.")
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="Fresh interpreters per module; the fastest counts")
+    parser.add_argument("--top", type=int, default=10, help="Show the slowest imports under app.main")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new import baseline")
+    args = parser.parse_args()
+
+    results = {}
+    for module in args.modules:
+        results[module] = cold_import(module, args.repeat)
+        engines = results[module]["engines_loaded"]
+        note = f"  loads {', '.join(engines)}" if module == "app.main" and engines else ""
+        print(f"  {module:<24}{results[module]['seconds']:>8.3f} s{note}")
+
+    if args.top > 0:
+        print("\nSlowest imports under app.main (cumulative):")
+        for entry in slowest_imports("app.main", args.top):
+            print(f"  {entry['module']:<40}{entry['seconds']:>8.3f} s")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        # Merge, so the engine sizes are kept
+        baseline.setdefault("imports", {}).update({module: stats["seconds"] for module, stats in results.items()})
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1)
+        print(f"\nImport baseline written to {args.baseline}")
+        return
+
+    failures = compare(results, baseline)
+    if failures:
+        print("\nRegressions:")
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo import regressions" + ("" if "imports" in baseline else " (no import baseline yet; run with --update-baseline)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# backend/benchmarks/incremental.py
+
+"""
+Equivalence check for incremental datasets.
+
+    python -m benchmarks.incremental [--rows 20000] [--appends 3] [--base-share 0.8] [--components 1]
+
+A synthetic dataset is split into a base upload and --appends deltas.
+The base creates a dataset, the deltas are appended one by one, and the
+final response is compared with /analyze of the whole dataset. Both
+score against the same saved anomaly model ("persistent" mode), which is
+what the dataset freezes at creation. Louvain communities (and the
+clusters / explanations built on them) vary between runs and are not
+compared; risk scores may differ by PageRank's convergence tolerance.
+With --components N the rows come from N generated datasets with
+disjoint accounts and only the first one's rows are held back, so the
+appends leave the other components' betweenness sums reusable.
+Exits non-zero on a mismatch.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import pandas as pd
+
+from benchmarks.generate import generate_transactions, parse_rates, write_dataset
+
+SCORE_TOLERANCE = 0.1       # Suspicion score points (0-100 scale)
+RING_SCORE_TOLERANCE = SCORE_TOLERANCE / 100 + 0.001  # Ring risk_score: mean score / 100, rounded to 3 places
+AMOUNT_TOLERANCE = 1e-6     # Relative, per aggregated edge
+
+
+def _rings(result: Dict) -> List:
+    return [
+        (case["ring_id"], case["pattern_type"], case["member_accounts"],
+         [ring["member_accounts"] for ring in case.get("rings", [])])
+        for case in result["fraud_rings"]
+    ]
+
+
+def compare(incremental: Dict, full: Dict) -> List[str]:
+    """Differences between the appended dataset's response and /analyze of all uploads."""
+    failures = []
+    if _rings(incremental) != _rings(full):
+        failures.append("fraud_rings differ")
+    else:
+        for case, full_case in zip(incremental["fraud_rings"], full["fraud_rings"]):
+            if abs(case["risk_score"] - full_case["risk_score"]) > RING_SCORE_TOLERANCE:
+                failures.append(f"{case['ring_id']}: risk_score {case['risk_score']} vs {full_case['risk_score']}")
+
+    appended = {acc["account_id"]: acc for acc in incremental["suspicious_accounts"]}
+    whole = {acc["account_id"]: acc for acc in full["suspicious_accounts"]}
+    if appended.keys() != whole.keys():
+        failures.append(f"suspicious accounts differ: {len(appended.keys() ^ whole.keys())} not in both")
+    for acc in appended.keys() & whole.keys():
+        if abs(appended[acc]["suspicion_score"] - whole[acc]["suspicion_score"]) > SCORE_TOLERANCE:
+            failures.append(f"{acc}: score {appended[acc]['suspicion_score']} vs {whole[acc]['suspicion_score']}")
+        if appended[acc]["detected_patterns"] != whole[acc]["detected_patterns"]:
+            failures.append(f"{acc}: patterns differ")
+
+    if incremental["anomaly_scores"] != full["anomaly_scores"]:
+        failures.append("anomaly_scores differ")
+
+    if [node["id"] for node in incremental["graph"]["nodes"]] != [node["id"] for node in full["graph"]["nodes"]]:
+        failures.append("graph nodes differ")
+    edges, full_edges = incremental["graph"]["edges"], full["graph"]["edges"]
+    if [(e["source"], e["target"]) for e in edges] != [(e["source"], e["target"]) for e in full_edges]:
+        failures.append("graph edges differ")
+    elif any(abs(a["amount"] - b["amount"]) > AMOUNT_TOLERANCE * max(abs(b["amount"]), 1) for a, b in zip(edges, full_edges)):
+        failures.append("edge amounts differ")
+
+    summary = {k: v for k, v in incremental["summary"].items() if k not in ("processing_time_seconds", "dataset_id")}
+    full_summary = {k: v for k, v in full["summary"].items() if k != "processing_time_seconds"}
+    if summary != full_summary:
+        failures.append(f"summary differs: {summary} vs {full_summary}")
+    return failures
+
+
+def generate_components(rows: int, seed: int, rates, components: int):
+    """rows split over components generated datasets, account and transaction IDs prefixed apart, in time order."""
+    frames, truth = [], {"patterns": [], "counts": {}}
+    for k in range(components):
+        part, part_truth = generate_transactions(rows // components, seed + k, rates)
+        if components > 1:
+            for col in ("transaction_id", "sender_id", "receiver_id"):
+                part[col] = f"C{k}_" + part[col].astype(str)
+        part["component"] = k
+        frames.append(part)
+        truth["patterns"] += part_truth["patterns"]
+        for pattern, count in part_truth["counts"].items():
+            truth["counts"][pattern] = truth["counts"].get(pattern, 0) + count
+    df = pd.concat(frames, ignore_index=True).sort_values("timestamp", kind="stable", ignore_index=True)
+    return df.drop(columns="component"), truth, df["component"].to_numpy()
+
+
+async def _run(df, appended, appends: int, base_share: float) -> Dict:
+    from app.incremental import append_to_dataset, create_dataset
+    from app.pipeline import run_analysis
+
+    # The last (1 - base_share) of the appended rows, in --appends deltas
+    rows = appended.nonzero()[0]
+    held = rows[int(len(rows) * base_share):]
+    step = -(-len(held) // appends)
+    deltas = [held[i:i + step] for i in range(0, len(held), step)]
+    base = df.drop(index=held).reset_index(drop=True)
+    seconds = {}
+
+    start = time.perf_counter()
+    result = await create_dataset(base)
+    seconds["create"] = round(time.perf_counter() - start, 3)
+    dataset_id = result["summary"]["dataset_id"]
+    for i, rows in enumerate(deltas):
+        start = time.perf_counter()
+        result = await append_to_dataset(dataset_id, df.iloc[rows].reset_index(drop=True))
+        seconds[f"append_{i + 1}"] = round(time.perf_counter() - start, 3)
+
+    start = time.perf_counter()
+    full = await run_analysis(df)
+    seconds["full"] = round(time.perf_counter() - start, 3)
+    return {"incremental": result, "full": full, "seconds": seconds}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check appended datasets against a full analysis.")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", action="append", metavar="PATTERN=N", help="Planted patterns per 100k rows")
+    parser.add_argument("--appends", type=int, default=3)
+    parser.add_argument("--base-share", type=float, default=0.8, help="Share of the rows in the creating upload")
+    parser.add_argument("--components", type=int, default=1, help="Independent account groups (appends touch one)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="fintrace-incremental-") as workdir:
+        # Set before the app is imported: its settings (and the pool workers') come from the environment
+        os.environ["ANOMALY_MODE"] = "persistent"
+        os.environ["ANOMALY_MODEL_PATH"] = os.path.join(workdir, "model.joblib")
+        os.environ["DATASET_STATE_DIR"] = os.path.join(workdir, "datasets")
+        from app.ingest import read_transactions
+        from app.pipeline import shutdown_executor
+
+        components = max(args.components, 1)
+        df, truth, component = generate_components(args.rows, args.seed, parse_rates(args.rate), components)
+        path = os.path.join(workdir, "transactions.csv")
+        write_dataset(df, truth, path)
+        with open(path, "rb") as f:
+            df = read_transactions(f)
+
+        try:
+            run = asyncio.run(_run(df, component == 0, max(args.appends, 1), args.base_share))
+        finally:
+            shutdown_executor()
+
+    print(f"{args.rows:,} rows, {args.components} components, {args.appends} appends")
+    for name, seconds in run["seconds"].items():
+        print(f"  {name:<12}{seconds:>9.3f} s")
+
+    failures = compare(run["incremental"], run["full"])
+    if failures:
+        print("\nIncremental result differs from the full analysis:")
+        for line in failures[:20]:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nIncremental result matches the full analysis")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# backend/benchmarks/run.py
+
+"""
+Scaling benchmark for the detection engines.
+
+    python -m benchmarks.run [--sizes 10000 100000 1000000] [--update-baseline]
+
+For every size a synthetic dataset with planted patterns is generated and
+run through the same stages as /analyze. Time, peak traced memory and
+recall of the planted patterns are recorded per stage and compared with
+benchmarks/baseline.json; the run exits non-zero on a regression.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+from app.anomaly_engine import detect_anomalies
+from app.cycle_detector import detect_cycles
+from app.ingest import read_transactions
+from app.pipeline import SUSPICIOUS_SCORE_THRESHOLD, build_foundation, graph_intelligence
+from app.ring_cases import consolidate_rings, score_rings
+from app.risk_engine import calculate_final_scores
+from app.shell_detector import detect_shell_networks
+from app.smurf_detector import detect_smurfing
+from benchmarks.generate import generate_transactions, parse_rates, write_dataset
+
+DEFAULT_SIZES = [10_000, 100_000]
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# A planted ring counts as found when one detected ring of its type covers this share of its accounts
+RECALL_OVERLAP = 0.5
+ANOMALY_FLAG_SCORE = 0.5  # Same cut-off as the anomaly_scores list in the response
+
+# Regression thresholds against the baseline
+TIME_TOLERANCE = 1.5          # x baseline seconds
+TIME_SLACK_SECONDS = 0.05     # Absolute slack so millisecond stages don't flap
+MEMORY_TOLERANCE = 1.25       # x baseline peak MB
+MEMORY_SLACK_MB = 2.0
+RECALL_TOLERANCE = 0.02       # Absolute drop allowed
+
+RING_TYPES = {
+    "cycle": lambda pattern_type: pattern_type.startswith("cycle"),
+    "shell": lambda pattern_type: pattern_type == "layered_shell",
+    "fan_in": lambda pattern_type: pattern_type == "fan_in_72h",
+    "fan_out": lambda pattern_type: pattern_type == "fan_out_72h"
+}
+
+
+def _measure(fn, *args, memory: bool = True, **kwargs):
+    """
+    Runs fn once for the wall time and, with memory=True, once more under
+    tracemalloc for the peak (tracing would skew the timed run).
+    Memory allocated in worker processes is not traced.
+    """
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    stats = {"seconds": round(time.perf_counter() - start, 4), "peak_mb": None}
+
+    if memory:
+        tracemalloc.start()
+        try:
+            fn(*args, **kwargs)
+            stats["peak_mb"] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        finally:
+            tracemalloc.stop()
+
+    return result, stats
+
+
+def ring_recall(patterns: List[Dict], rings: List[Dict], kind: str) -> float:
+    """Share of planted patterns of one kind matched by a detected ring of that kind."""
+    planted = [set(p["accounts"]) for p in patterns if p["pattern_type"] == kind]
+    if not planted:
+        return None
+
+    is_kind = RING_TYPES[kind]
+    rings_by_account: Dict[str, List[int]] = {}
+    members = []
+    for ring in rings:
+        if is_kind(ring["pattern_type"]):
+            members.append(set(ring["member_accounts"]))
+            for acc in ring["member_accounts"]:
+                rings_by_account.setdefault(acc, []).append(len(members) - 1)
+
+    found = 0
+    for accounts in planted:
+        candidates = {i for acc in accounts for i in rings_by_account.get(acc, [])}
+        if any(len(accounts & members[i]) >= RECALL_OVERLAP * len(accounts) for i in candidates):
+            found += 1
+    return round(found / len(planted), 4)
+
+
+def account_recall(accounts: List[str], flagged) -> float:
+    if not accounts:
+        return None
+    return round(sum(1 for acc in accounts if acc in flagged) / len(accounts), 4)
+
+
+def run_size(rows: int, seed: int, rates: Dict[str, float], memory: bool, workdir: str) -> Dict:
+    """Generates one dataset and runs every stage on it."""
+    df, truth = generate_transactions(rows, seed, rates)
+    path = os.path.join(workdir, f"transactions_{rows}.csv")
+    write_dataset(df, truth, path)
+    del df
+
+    stages = {}
+
+    def stage(name, fn, *args, **kwargs):
+        result, stages[name] = _measure(fn, *args, memory=memory, **kwargs)
+        return result
+
+    def ingest():
+        with open(path, "rb") as f:
+            return read_transactions(f)
+
+    # Same stage order and inputs as pipeline.run_analysis
+    df = stage("ingest", ingest)
+    ctx = stage("build_foundation", build_foundation, df).add(df=df)
+    CG, index = ctx.graph, ctx.index
+    graph_intel = stage("analyze_graph_intelligence", graph_intelligence, CG)
+    cycle_rings = stage("detect_cycles", detect_cycles, CG, scc=graph_intel["scc"], index=index)
+    smurf_rings = stage("detect_smurfing", detect_smurfing, df, index=index)
+    shell_rings = stage("detect_shell_networks", detect_shell_networks, CG, df, index=index, context=ctx)
+    anomaly_results = stage("detect_anomalies", detect_anomalies, mode="fit", context=ctx)
+    all_rings = cycle_rings + smurf_rings + shell_rings
+    ctx.add(rings=all_rings)
+    accounts = CG.ids[CG.node_order].tolist()
+    risk_results = stage(
+        "calculate_final_scores", calculate_final_scores, accounts, graph_intel, anomaly_results, all_rings, df,
+        index=index, context=ctx
+    )
+    stage(
+        "consolidate_rings",
+        lambda: score_rings(consolidate_rings(all_rings), {acc: data["score"] for acc, data in risk_results.items()})
+    )
+
+    # Recall of the planted patterns
+    patterns = truth["patterns"]
+    anomalous = set(anomaly_results.index[anomaly_results["anomaly_score"] > ANOMALY_FLAG_SCORE])
+    suspicious = {acc for acc, data in risk_results.items() if data["score"] > SUSPICIOUS_SCORE_THRESHOLD}
+    recall = {kind: ring_recall(patterns, all_rings, kind) for kind in RING_TYPES}
+    recall["outlier"] = account_recall(
+        [acc for p in patterns if p["pattern_type"] == "outlier" for acc in p["accounts"]], anomalous
+    )
+    recall["flagged"] = account_recall(sorted({acc for p in patterns for acc in p["accounts"]}), suspicious)
+
+    return {
+        "rows": rows,
+        "nodes": CG.n_nodes,
+        "edges": CG.n_edges,
+        "planted": truth["counts"],
+        "rings": {kind: sum(1 for r in all_rings if is_kind(r["pattern_type"])) for kind, is_kind in RING_TYPES.items()},
+        "stages": stages,
+        "recall": recall
+    }
+
+
+def compare(results: Dict, baseline: Dict) -> List[str]:
+    """Regressions of results against baseline, as readable lines."""
+    failures = []
+    for size, current in results["sizes"].items():
+        reference = baseline.get("sizes", {}).get(size)
+        if reference is None:
+            continue
+
+        for name, stats in current["stages"].items():
+            ref = reference["stages"].get(name)
+            if ref is None:
+                continue
+            limit = ref["seconds"] * TIME_TOLERANCE + TIME_SLACK_SECONDS
+            if stats["seconds"] > limit:
+                failures.append(f"{size} rows / {name}: {stats['seconds']}s > {limit:.3f}s (baseline {ref['seconds']}s)")
+            if stats["peak_mb"] is not None and ref.get("peak_mb") is not None:
+                limit = ref["peak_mb"] * MEMORY_TOLERANCE + MEMORY_SLACK_MB
+                if stats["peak_mb"] > limit:
+                    failures.append(f"{size} rows / {name}: {stats['peak_mb']} MB > {limit:.1f} MB (baseline {ref['peak_mb']} MB)")
+
+        for kind, value in current["recall"].items():
+            ref = reference["recall"].get(kind)
+            if value is not None and ref is not None and value < ref - RECALL_TOLERANCE:
+                failures.append(f"{size} rows / recall {kind}: {value} < baseline {ref}")
+
+    return failures
+
+
+def _print_size(result: Dict):
+    print(f"\n{result['rows']} rows, {result['nodes']} accounts, {result['edges']} edges")
+    for name, stats in result["stages"].items():
+        memory = f"{stats['peak_mb']:>9.1f} MB" if stats["peak_mb"] is not None else ""
+        print(f"  {name:<28}{stats['seconds']:>9.3f} s{memory}")
+    print("  recall: " + ", ".join(f"{k}={v}" for k, v in result["recall"].items() if v is not None))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the detection engines on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--rate", action="append", metavar="PATTERN=N", help="Planted patterns per 100k rows")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--output", help="Also write the results JSON here")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced-memory pass")
+    args = parser.parse_args()
+
+    rates = parse_rates(args.rate)
+    results = {"seed": args.seed, "rates": rates, "sizes": {}}
+    with tempfile.TemporaryDirectory(prefix="fintrace-bench-") as workdir:
+        for rows in args.sizes:
+            result = run_size(rows, args.seed, rates, not args.no_memory, workdir)
+            results["sizes"][str(rows)] = result
+            _print_size(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+
+    if args.update_baseline:
+        # Merge, so refreshing one size keeps the others
+        baseline = {"sizes": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update({"seed": args.seed, "rates": rates})
+        baseline["sizes"].update(results["sizes"])
+        with open(args.baseline, "w") as f:
+            json.dump(baseline, f, indent=1)
+        print(f"\nBaseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("seed") != args.seed or baseline.get("rates", {}) != rates:
+        print("\nBaseline was recorded with another seed / rates; comparing anyway")
+
+    failures = compare(results, baseline)
+    if failures:
+        print("\nRegressions against the baseline:")
+        for line in failures:
+            print(f"  {line}")
+        sys.exit(1)
+    print("\nNo regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()